@@ -0,0 +1,148 @@
+import os
+import uuid
+
+
+class QuestionAllocator:
+    """Picks the folder and uuid of every fetched question, from the manifest.
+
+    Copies of a question bank question with the same `shared` key
+    ((assessment_question_id, content digest), see create_quiz_bank.py) are
+    written to one folder. A changed copy whose folder is shared with other
+    copies waits until those copies are seen (or the fetch ends):
+    - if a copy is unchanged, the folder keeps its contents and the changed
+      copies move to folders of their own;
+    - if every copy changed, the first new contents are written to the
+      folder in place, keeping its name and uuid.
+    So the folders are decided before anything is written, whatever the
+    order of the quizzes, and no folder written in a run is removed again.
+
+    Only used from the fetch stage, so it needs no lock.
+    """
+
+    def __init__(self, manifest, folder_names, questions_dir):
+        self.manifest = manifest
+        self.folder_names = folder_names
+        self.questions_dir = questions_dir
+        # folder -> manifest keys written to it when the run started
+        self.owners = {}
+        for key, entry in manifest.questions.items():
+            self.owners.setdefault(entry["folder"], []).append(key)
+        # shared key -> (folder, uuid) holding those contents in this run
+        self.placed = {}
+        # shared folder -> changed copies waiting for the other copies
+        self.waiting = {}
+        # shared folder -> keys of the copies that left it
+        self.left = {}
+
+    def place(self, key, question, name, updated_at, shared=None):
+        """Jobs (dicts) to write for this question, once it is decided.
+
+        `name` is the folder name to start from for a new folder, `shared`
+        the key of the copies that can share a folder (None for no sharing).
+        """
+        copy = {
+            "manifest_key": key,
+            "question": question,
+            "name": name,
+            "updated_at": updated_at,
+            "shared": shared,
+            "entry": self.manifest.get(key, self.questions_dir),
+        }
+        entry = copy["entry"]
+        if entry and entry["hash"] == question.digest:
+            print(f"Question {question.id} is unchanged, skipping")
+            self.manifest.counts["unchanged"] += 1
+            if shared is not None:
+                self.placed.setdefault(shared, (entry["folder"], entry["uuid"]))
+            # the folder keeps its contents for this copy
+            return self._resolve(entry["folder"], keep=True)
+        if entry and len(self.owners.get(entry["folder"], [])) > 1:
+            folder = entry["folder"]
+            if shared in self.placed:
+                self.left.setdefault(folder, set()).add(key)
+                self._join(copy, *self.placed[shared])
+            else:
+                self.waiting.setdefault(folder, []).append(copy)
+            seen = len(self.waiting.get(folder, [])) + len(self.left.get(folder, ()))
+            if seen == len(self.owners[folder]):
+                # every copy changed
+                return self._resolve(folder, keep=False)
+            return []
+        if entry:
+            # the only question in its folder: update it in place
+            return [self._write(copy, entry["folder"], entry["uuid"])]
+        if shared in self.placed:
+            self._join(copy, *self.placed[shared])
+            return []
+        return [self._write(copy)]
+
+    def finish(self):
+        """Jobs of the copies still waiting once every question was fetched.
+
+        The copies not fetched in this run still use their folder, so it keeps
+        its contents.
+        """
+        jobs = []
+        for folder in list(self.waiting):
+            jobs += self._resolve(folder, keep=True)
+        return jobs
+
+    def _resolve(self, folder, keep):
+        groups = {}
+        for copy in self.waiting.pop(folder, []):
+            group = copy["shared"]
+            if group is None:
+                group = ("copy", copy["manifest_key"])
+            groups.setdefault(group, []).append(copy)
+        jobs = []
+        for group, copies in groups.items():
+            (first, rest) = (copies[0], copies[1:])
+            shared = first["shared"]
+            if shared in self.placed:
+                rest = copies
+            elif not keep:
+                jobs.append(self._write(first, folder, first["entry"]["uuid"]))
+                # the other contents move out of it
+                keep = True
+            else:
+                print(
+                    "Question {} no longer matches {}".format(first["question"].id, folder)
+                )
+                jobs.append(self._write(first))
+            for copy in rest:
+                self._join(copy, *self.placed[shared])
+        return jobs
+
+    def _join(self, copy, folder, question_uuid):
+        """Point the manifest entry of `copy` at a folder written for another copy"""
+        print(f'Question {copy["question"].id} is shared with {folder}, skipping')
+        self.manifest.record(
+            copy["manifest_key"],
+            folder,
+            copy["question"].digest,
+            question_uuid,
+            copy["updated_at"],
+        )
+        self.manifest.counts["shared"] += 1
+
+    def _write(self, copy, folder=None, question_uuid=None):
+        question = copy["question"]
+        print(f"Handling question {question.id}...")
+        print(question.text)
+        print()
+        if folder is None:
+            folder = self.folder_names.allocate(self.questions_dir, copy["name"])
+            os.makedirs(os.path.join(self.questions_dir, folder))
+            question_uuid = str(uuid.uuid4())
+        self.manifest.counts["updated" if copy["entry"] else "new"] += 1
+        if copy["shared"] is not None:
+            self.placed.setdefault(copy["shared"], (folder, question_uuid))
+        return {
+            "manifest_key": copy["manifest_key"],
+            "folder": folder,
+            "dir": os.path.join(self.questions_dir, folder),
+            "uuid": question_uuid,
+            "hash": question.digest,
+            "updated_at": copy["updated_at"],
+            "question": question,
+        }
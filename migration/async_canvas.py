@@ -0,0 +1,348 @@
+import asyncio
+import aiohttp
+import requests
+from canvas import (
+    order_quiz_questions,
+    collect_new_quiz_questions,
+    map_quiz_kinds,
+    new_quiz_bank_ids,
+    print_group_prefetch,
+    remaining_page_urls,
+    select_quizzes,
+)
+from canvas_session import CanvasResponse, ConnectionStats, DEFAULT_POOL_SIZE
+from canvas_throttle import RequestScheduler
+
+
+class AsyncCanvas:
+    """asyncio variant of canvas.Canvas built on aiohttp.
+
+    At most `concurrency` requests are in flight at any time, no matter how
+    many courses and quizzes are being fetched, and fewer when the
+    RequestScheduler sees the Canvas rate limit running low. Use as an async context
+    manager so the aiohttp session is opened and closed inside the loop.
+    """
+
+    def __init__(
+        self,
+        token,
+        api_url,
+        concurrency=DEFAULT_POOL_SIZE,
+        debug=False,
+        stats=None,
+        cache=None,
+        recorder=None,
+    ):
+        self.token = token
+        self.api_url = api_url
+        self.concurrency = concurrency
+        self.debug = debug
+        self.token_header = {"Authorization": f"Bearer {self.token}"}
+        self.url_prefix = "v1"
+        self.new_url_prefix = "quiz/v1"
+        self.session = None
+        self.scheduler = RequestScheduler(concurrency)
+        self.stats = stats if stats is not None else ConnectionStats()
+        # optional canvas_cache.ResponseCache, shared with the sync session
+        self.cache = cache
+        # optional canvas_replay.Cassette that every GET is recorded into
+        self.recorder = recorder
+
+    async def _on_connection_create(self, session, context, params):
+        self.stats.add_connection()
+
+    async def __aenter__(self):
+        trace_config = aiohttp.TraceConfig()
+        trace_config.on_connection_create_end.append(self._on_connection_create)
+        self.session = aiohttp.ClientSession(
+            headers=self.token_header,
+            connector=aiohttp.TCPConnector(limit=self.concurrency),
+            auto_decompress=True,
+            trace_configs=[trace_config],
+        )
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.session.close()
+
+    async def _send(self, url, headers=None):
+        self.stats.add_request()
+        async with self.session.get(url, headers=headers) as response:
+            return CanvasResponse(
+                response.status,
+                response.headers,
+                await response.read(),
+                str(response.url),
+                response.reason,
+            )
+
+    async def _get(self, url, headers=None):
+        return await self.scheduler.acall(lambda: self._send(url, headers))
+
+    async def get(self, url):
+        """GET one url and return a CanvasResponse"""
+        response = await self._cached_get(url)
+        if self.recorder is not None:
+            self.recorder.record(url, response)
+        return response
+
+    async def _cached_get(self, url):
+        # the cache reads and writes files, so it runs in threads to keep
+        # the event loop serving the other requests
+        if self.cache is None:
+            return await self._get(url)
+        cached = await asyncio.to_thread(self.cache.get, url)
+        response = await self._get(url, self.cache.validators(cached))
+        if response.status_code == 304 and cached is not None:
+            await asyncio.to_thread(self.cache.hit, url)
+            return cached
+        await asyncio.to_thread(self.cache.store, url, response)
+        return response
+
+    def _page_json(self, response):
+        response.raise_for_status()
+        if self.debug:
+            print(response.text)
+        return response.json()
+
+    async def request(self, request, stop_at_first=False):
+        """docstring"""
+        response = await self.get(self.api_url + request)
+        retval = [self._page_json(response)]
+        page_urls = None if stop_at_first else remaining_page_urls(response)
+        if page_urls:
+            # Numbered pages: fetch the rest concurrently, gather keeps them in order
+            responses = await asyncio.gather(*(self.get(url) for url in page_urls))
+            retval.extend(self._page_json(response) for response in responses)
+            return retval
+        # Otherwise (e.g. opaque bookmark cursors) walk the `next` links one by one
+        while not stop_at_first and "next" in response.links:
+            response = await self.get(response.links["next"]["url"])
+            retval.append(self._page_json(response))
+        return retval
+
+    async def course(self, course_id):
+        """docstring"""
+        if course_id:
+            for course in await self.request(
+                f"{self.url_prefix}/courses/{course_id}?include[]=term"
+            ):
+                return AsyncCourse(self, course)
+        return None
+
+
+class AsyncCourse:
+    """Course"""
+
+    def __init__(self, canvas, course_data):
+        self.canvas = canvas
+        self.data = course_data
+        self.id = course_data["id"]
+        self.course_url_prefix = f"{canvas.url_prefix}/courses/{self.id}"
+        self.new_course_url_prefix = f"{canvas.new_url_prefix}/courses/{self.id}"
+        # item bank id -> task fetching its entries, so New Quizzes fetched
+        # concurrently share one request per bank
+        self.banks = {}
+        # task listing the quizzes, see quiz_kinds
+        self.kinds = None
+
+    def __getitem__(self, index):
+        return self.data[index]
+
+    async def item_bank(self, bank_id):
+        """Entries of a New Quizzes item bank, see canvas.Course.item_bank"""
+        try:
+            pages = await self.canvas.request(
+                f"{self.canvas.new_url_prefix}/banks/{bank_id}/bank_entries?per_page=100"
+            )
+        except requests.exceptions.HTTPError:
+            print(f"[Warning] Item bank {bank_id} not found, its questions are skipped.")
+            return None
+        return [entry for page in pages for entry in page]
+
+    async def item_banks(self, bank_ids):
+        """Fetch the given item banks concurrently, each only once per course"""
+        bank_ids = list(dict.fromkeys(bank_ids))
+        missing = [bank_id for bank_id in bank_ids if bank_id not in self.banks]
+        for bank_id in missing:
+            self.banks[bank_id] = asyncio.ensure_future(self.item_bank(bank_id))
+        print_group_prefetch(len(missing), self.canvas.concurrency, "item banks")
+        entries = await asyncio.gather(*(self.banks[bank_id] for bank_id in bank_ids))
+        return dict(zip(bank_ids, entries))
+
+    async def _list_quizzes(self, prefix):
+        try:
+            return await self.canvas.request(f"{prefix}/quizzes?per_page=100")
+        except requests.exceptions.HTTPError:
+            return []
+
+    async def _quiz_kinds(self):
+        (classic, new) = await asyncio.gather(
+            self._list_quizzes(self.course_url_prefix),
+            self._list_quizzes(self.new_course_url_prefix),
+        )
+        return map_quiz_kinds({"classic": classic, "new": new})
+
+    async def quiz_kinds(self):
+        """See canvas.Course.quiz_kinds; both listings are sent together, once"""
+        if self.kinds is None:
+            self.kinds = asyncio.ensure_future(self._quiz_kinds())
+        return await self.kinds
+
+    async def quiz_ids(self, title=None, updated_since=None):
+        """Ids of the quizzes of the course, see canvas.select_quizzes"""
+        return select_quizzes(await self.quiz_kinds(), title, updated_since)
+
+    async def quiz(self, assignment_id):
+        """See canvas.Course.quiz"""
+        if assignment_id:
+            listed = self.kinds and (await self.kinds).get(str(assignment_id))
+            if listed:
+                (kind, quiz) = listed
+                if kind == "classic":
+                    return AsyncQuiz(self, quiz)
+                return AsyncNewQuiz(self, quiz)
+            try:
+                for quiz in await self.canvas.request(
+                    f"{self.course_url_prefix}/quizzes/{assignment_id}"
+                ):
+                    return AsyncQuiz(self, quiz)
+            except requests.exceptions.HTTPError:
+                print("[Warning] Quiz not found. Try new course API.")
+                return await self.new_quiz(assignment_id)
+        return None
+
+    async def new_quiz(self, assignment_id):
+        if assignment_id:
+            for quiz in await self.canvas.request(
+                f"{self.new_course_url_prefix}/quizzes/{assignment_id}"
+            ):
+                return AsyncNewQuiz(self, quiz)
+        return None
+
+
+class AsyncQuiz:
+    """Quiz"""
+
+    kind = "classic"
+
+    def __init__(self, course, quiz_data):
+        self.canvas = course.canvas
+        self.course = course
+        self.data = quiz_data
+        self.id = quiz_data["id"]
+        self.object_url_prefix = f"{course.course_url_prefix}/quizzes/{self.id}"
+        # quiz_group_id -> group, filled by question_groups
+        self.groups = {}
+
+    def __getitem__(self, index):
+        return self.data[index]
+
+    async def question_group(self, group_id):
+        """docstring"""
+        if group_id is None:
+            return None
+        for group in await self.canvas.request(
+            f"{self.object_url_prefix}/groups/{group_id}"
+        ):
+            return group
+        return None
+
+    async def question_groups(self, group_ids):
+        """Fetch the given quiz groups concurrently and cache them on the quiz"""
+        missing = [
+            group_id
+            for group_id in dict.fromkeys(group_ids)
+            if group_id is not None and group_id not in self.groups
+        ]
+        groups = await asyncio.gather(*(self.question_group(g) for g in missing))
+        self.groups.update(zip(missing, groups))
+        print_group_prefetch(len(missing), self.canvas.concurrency)
+        return self.groups
+
+    async def questions(self, qfilter=None):
+        """docstring"""
+        pages = await self.canvas.request(
+            f"{self.object_url_prefix}/questions?per_page=100"
+        )
+        await self.question_groups(q["quiz_group_id"] for page in pages for q in page)
+        return order_quiz_questions(pages, self.groups.get, qfilter)
+
+    def has_time_limit(self):
+        return self.data["time_limit"]
+
+
+class AsyncNewQuiz(AsyncQuiz):
+    """Quiz"""
+
+    kind = "new"
+
+    def __init__(self, course, quiz_data):
+        super().__init__(course, quiz_data)
+        self.object_url_prefix = f"{course.new_course_url_prefix}/quizzes/{self.id}"
+
+    async def questions(self, qfilter=None):
+        """docstring"""
+        pages = await self.canvas.request(f"{self.object_url_prefix}/items?per_page=100")
+        banks = await self.course.item_banks(new_quiz_bank_ids(pages))
+        return collect_new_quiz_questions(pages, banks)
+
+    def has_time_limit(self):
+        return self.data["quiz_settings"]["has_time_limit"]
+
+
+async def _fetch_quiz(course, quiz_id):
+    quiz = await course.quiz(quiz_id)
+    (questions, groups) = await quiz.questions()
+    return quiz, questions, groups
+
+
+async def _fetch_course(canvas, course_id, quiz_id_list, select):
+    course = await canvas.course(course_id)
+    if select is not None:
+        quiz_id_list = await course.quiz_ids(*select)
+    quizzes = await asyncio.gather(
+        *(_fetch_quiz(course, quiz_id) for quiz_id in quiz_id_list)
+    )
+    return course, quizzes
+
+
+async def fetch_all(
+    token,
+    api_url,
+    course_dict,
+    concurrency,
+    debug=False,
+    stats=None,
+    cache=None,
+    recorder=None,
+    select=None,
+):
+    """Fetch every course and quiz in `course_dict` concurrently.
+
+    Returns [(course, quiz, questions, groups), ...] in the same order as
+    `course_dict` and its quiz id lists, regardless of completion order.
+    With `select` = (title, updated_since), every quiz of the courses that
+    matches them is fetched instead (see canvas.select_quizzes).
+    """
+    async with AsyncCanvas(
+        token, api_url, concurrency, debug, stats, cache, recorder
+    ) as canvas:
+        courses = await asyncio.gather(
+            *(
+                _fetch_course(canvas, course_id, quiz_id_list, select)
+                for course_id, quiz_id_list in course_dict.items()
+            )
+        )
+        throttle = canvas.scheduler.summary()
+    if throttle["retries"] or throttle["throttled_seconds"]:
+        print(
+            "Throttled by Canvas for {:.1f}s ({} retries)".format(
+                throttle["throttled_seconds"], throttle["retries"]
+            )
+        )
+    return [
+        (course, quiz, questions, groups)
+        for course, quizzes in courses
+        for quiz, questions, groups in quizzes
+    ]
@@ -0,0 +1,108 @@
+# Benchmark the Canvas fetch paths offline, against a cassette recorded with
+# `create_quiz_bank.py --record` and replayed by canvas_replay.py, and the
+# question renderers against a `create_quiz_bank.py --snapshot` file
+
+import os
+import json
+import time
+import asyncio
+import argparse
+import tempfile
+import threading
+from types import SimpleNamespace
+import canvas
+import async_canvas
+from canvas_replay import Cassette, make_server
+from renderers import render_question
+from snapshot import read_snapshot
+
+
+parser = argparse.ArgumentParser()
+parser.add_argument("--cassette", default=None, help="Recorded with --record")
+parser.add_argument("--snapshot", default=None, help="Saved with --snapshot")
+parser.add_argument("--latency", type=float, default=0.05, help="Seconds per request")
+parser.add_argument("--page_size", type=int, default=None)
+parser.add_argument("--bookmarks", action="store_true", help="Use bookmark paging")
+parser.add_argument("--pool_size", type=int, default=None)
+parser.add_argument(
+    "--concurrency", type=int, default=0, help="Also time the asyncio client"
+)
+args = parser.parse_args()
+if not args.cassette and not args.snapshot:
+    parser.error("give a --cassette, a --snapshot or both")
+
+if args.snapshot:
+    questions = [
+        question
+        for _, _, quiz_questions, _ in read_snapshot(args.snapshot)
+        for question in quiz_questions
+    ]
+    start = time.perf_counter()
+    for question in questions:
+        render_question(question, "00000000-0000-0000-0000-000000000000")
+    elapsed = time.perf_counter() - start
+    print(
+        f"rendered {len(questions)} questions in {elapsed:.3f}s"
+        f" ({len(questions) / elapsed:.1f} q/sec)"
+    )
+    if not args.cassette:
+        raise SystemExit
+
+cassette = Cassette.load(args.cassette)
+server = make_server(
+    cassette, latency=args.latency, page_size=args.page_size, bookmarks=args.bookmarks
+)
+threading.Thread(target=server.serve_forever, daemon=True).start()
+api_url = f"http://127.0.0.1:{server.server_port}/api/"
+
+with tempfile.NamedTemporaryFile("w", suffix=".json", delete=False) as f:
+    json.dump({"access_token": "replay", "api_url": api_url}, f)
+canvas_api = canvas.Canvas(
+    args=SimpleNamespace(config_file=f.name, pool_size=args.pool_size)
+)
+os.remove(f.name)
+
+# kind -> [quizzes, questions, seconds, requests]
+results = {}
+for course_id, quiz_id_list in cassette.course_id.items():
+    course = canvas_api.course(course_id)
+    for quiz_id in quiz_id_list:
+        requests_before = canvas_api.session.stats.requests
+        start = time.perf_counter()
+        quiz = course.quiz(quiz_id)
+        (questions, groups) = quiz.questions()
+        elapsed = time.perf_counter() - start
+        kind = "classic" if isinstance(quiz, canvas.Quiz) else "new"
+        result = results.setdefault(kind, [0, 0, 0.0, 0])
+        result[0] += 1
+        result[1] += len(questions)
+        result[2] += elapsed
+        result[3] += canvas_api.session.stats.requests - requests_before
+
+print(
+    "latency {}s, page size {}, {} paging".format(
+        args.latency,
+        args.page_size or "as requested",
+        "bookmark" if args.bookmarks else "numbered",
+    )
+)
+print(f"{'path':<10}{'quizzes':>8}{'questions':>10}{'q/sec':>10}{'req/q':>8}")
+for kind, (quizzes, questions, seconds, requests) in sorted(results.items()):
+    print(
+        f"{kind:<10}{quizzes:>8}{questions:>10}"
+        f"{questions / seconds:>10.1f}{requests / max(questions, 1):>8.2f}"
+    )
+
+if args.concurrency > 1:
+    requests_before = server.RequestHandlerClass.request_count
+    start = time.perf_counter()
+    fetched = asyncio.run(
+        async_canvas.fetch_all("replay", api_url, cassette.course_id, args.concurrency)
+    )
+    elapsed = time.perf_counter() - start
+    questions = sum(len(q) for _, _, q, _ in fetched)
+    requests = server.RequestHandlerClass.request_count - requests_before
+    print(
+        f"{'async':<10}{len(fetched):>8}{questions:>10}"
+        f"{questions / elapsed:>10.1f}{requests / max(questions, 1):>8.2f}"
+    )
@@ -1,7 +1,14 @@
 import os
-from collections import OrderedDict
+import re
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice
+from urllib.parse import urlparse, parse_qs, urlencode
 import requests
 import json
+from canvas_session import CanvasSession, DEFAULT_POOL_SIZE, iter_json_array
+from canvas_cache import ResponseCache, DEFAULT_MAX_BYTES
+from question_model import Question
 
 
 class Canvas:
@@ -25,35 +32,88 @@ class Canvas:
             self.__class__._api_url = getattr(self, 'config', {}).get("api_url", "https://canvas.ubc.ca/api/")
         # Now inherit it
         self.api_url = self.__class__._api_url
+        # One pooled keep-alive session is shared the same way, so Course, Quiz, ...
+        #   reuse the connections opened by the top-level Canvas object.
+        if not hasattr(self.__class__, "_session"):
+            config = getattr(self, "config", {})
+            cache_dir = getattr(args, "cache_dir", None) or config.get("cache_dir")
+            cache = None
+            if cache_dir and not getattr(args, "no_cache", False):
+                cache_size_mb = getattr(args, "cache_size_mb", None) or config.get(
+                    "cache_size_mb"
+                )
+                cache = ResponseCache(
+                    cache_dir,
+                    cache_size_mb * 1024 * 1024 if cache_size_mb else DEFAULT_MAX_BYTES,
+                    self.token,
+                )
+            self.__class__._session = CanvasSession(
+                headers=self.token_header,
+                pool_size=getattr(args, "pool_size", None)
+                or config.get("pool_size", DEFAULT_POOL_SIZE),
+                http2=getattr(args, "http2", False) or config.get("http2", False),
+                cache=cache,
+            )
+        self.session = self.__class__._session
         self.url_prefix = "v1"
         self.new_url_prefix = "quiz/v1"
 
     def request(self, request, stop_at_first=False):
         """docstring"""
-        retval = []
-        response = requests.get(self.api_url + request, headers=self.token_header)
-        while True:
+        return list(self.iter_pages(request, stop_at_first))
+
+    def _page_json(self, response):
+        response.raise_for_status()
+        if self.debug:
+            print(response.text)
+        return response.json()
+
+    def iter_pages(self, request, stop_at_first=False):
+        """Yield the JSON of each page of `request` as soon as it is available"""
+        response = self.session.get(self.api_url + request)
+        yield self._page_json(response)
+        if stop_at_first:
+            return
+        page_urls = remaining_page_urls(response)
+        if page_urls:
+            # Numbered pages: keep up to pool_size pages in flight, yield them in order
+            with ThreadPoolExecutor(max_workers=self.session.pool_size) as pool:
+                page_urls = iter(page_urls)
+                futures = deque(
+                    pool.submit(self.session.get, url)
+                    for url in islice(page_urls, self.session.pool_size)
+                )
+                while futures:
+                    response = futures.popleft().result()
+                    for url in islice(page_urls, 1):
+                        futures.append(pool.submit(self.session.get, url))
+                    yield self._page_json(response)
+            return
+        # Otherwise (e.g. opaque bookmark cursors) walk the `next` links one by one
+        while "next" in response.links:
+            response = self.session.get(response.links["next"]["url"])
+            yield self._page_json(response)
+
+    def iter_items(self, request, stream=False):
+        """Yield the items of a list endpoint one at a time.
+
+        With stream=True the pages are fetched one after another and each body
+        is parsed incrementally, so only one item is held in memory at a time.
+        """
+        if not stream:
+            for page in self.iter_pages(request):
+                yield from page
+            return
+        url = self.api_url + request
+        while url:
+            response = self.session.stream(url)
             response.raise_for_status()
-            if self.debug:
-                print(response.text)
-            retval.append(response.json())
-            if (
-                stop_at_first
-                or "current" not in response.links
-                or "last" not in response.links
-                or response.links["current"]["url"] == response.links["last"]["url"]
-            ):
-                break
-            response = requests.get(
-                response.links["next"]["url"], headers=self.token_header
-            )
-        return retval
+            yield from iter_json_array(response.iter_content())
+            url = response.links.get("next", {}).get("url")
 
     def put(self, url, data):
         """docstring"""
-        response = requests.put(
-            self.api_url + url, json=data, headers=self.token_header
-        )
+        response = self.session.request("PUT", self.api_url + url, json=data)
         response.raise_for_status()
         if response.status_code == 204:
             return None
@@ -61,9 +121,7 @@ class Canvas:
 
     def post(self, url, data):
         """docstring"""
-        response = requests.post(
-            self.api_url + url, json=data, headers=self.token_header
-        )
+        response = self.session.request("POST", self.api_url + url, json=data)
         response.raise_for_status()
         if response.status_code == 204:
             return None
@@ -71,12 +129,20 @@ class Canvas:
 
     def delete(self, url):
         """docstring"""
-        response = requests.delete(self.api_url + url, headers=self.token_header)
+        response = self.session.request("DELETE", self.api_url + url)
         response.raise_for_status()
         if response.status_code == 204:
             return None
         return response.json()
 
+    def connection_stats(self):
+        """Requests sent and connections opened/reused by the shared session"""
+        stats = self.session.stats.summary()
+        stats.update(self.session.scheduler.summary())
+        if self.session.cache is not None:
+            stats.update(self.session.cache.summary())
+        return stats
+
     def course(self, course_id, prompt_if_needed=False):
         """docstring"""
         if course_id:
@@ -88,7 +154,7 @@ class Canvas:
 
     def file(self, file_id):
         """docstring"""
-        for file in self.request(f"/files/{file_id}"):
+        for file in self.request(f"{self.url_prefix}/files/{file_id}"):
             return file
 
 
@@ -101,12 +167,88 @@ class Course(Canvas):
         self.id = course_data["id"]
         self.course_url_prefix = f"{self.url_prefix}/courses/{self.id}"
         self.new_course_url_prefix = f"{self.new_url_prefix}/courses/{self.id}"
+        # item bank id -> its entries (None if unavailable), shared by the
+        # New Quizzes of the course, filled by item_banks
+        self.banks = {}
+        # quiz id -> (kind, quiz data), filled by quiz_kinds
+        self.kinds = None
 
     def __getitem__(self, index):
         return self.data[index]
 
+    def quiz_kinds(self):
+        """Map the id of every quiz in the course to ("classic" or "new", quiz data).
+
+        Lists the classic quizzes and the New Quizzes once per course, for
+        quiz_ids. quiz() then goes straight to the right endpoint too.
+        """
+        if self.kinds is None:
+            listings = {}
+            for kind, prefix in [
+                ("classic", self.course_url_prefix),
+                ("new", self.new_course_url_prefix),
+            ]:
+                try:
+                    listings[kind] = self.request(f"{prefix}/quizzes?per_page=100")
+                except requests.exceptions.HTTPError:
+                    # e.g. New Quizzes not enabled in the course
+                    listings[kind] = []
+            self.kinds = map_quiz_kinds(listings)
+        return self.kinds
+
+    def quiz_ids(self, title=None, updated_since=None):
+        """Ids of the quizzes of the course, see select_quizzes"""
+        return select_quizzes(self.quiz_kinds(), title, updated_since)
+
+    def item_bank(self, bank_id):
+        """Entries of a New Quizzes item bank, shaped like the `entry` of a BankEntry item"""
+        try:
+            pages = self.request(
+                f"{self.new_url_prefix}/banks/{bank_id}/bank_entries?per_page=100"
+            )
+        except requests.exceptions.HTTPError:
+            print(f"[Warning] Item bank {bank_id} not found, its questions are skipped.")
+            return None
+        return [entry for page in pages for entry in page]
+
+    def item_banks(self, bank_ids):
+        """Fetch the given item banks in parallel, each only once per course"""
+        missing = [
+            bank_id
+            for bank_id in dict.fromkeys(bank_ids)
+            if bank_id not in self.banks
+        ]
+        with ThreadPoolExecutor(max_workers=self.session.pool_size) as pool:
+            for bank_id, entries in zip(missing, pool.map(self.item_bank, missing)):
+                self.banks[bank_id] = entries
+        print_group_prefetch(len(missing), self.session.pool_size, "item banks")
+        return self.banks
+
+    def new_quiz_questions(self, quizzes):
+        """questions() of several New Quizzes at once.
+
+        The /items listings are fetched concurrently first, so the item banks
+        drawn from by any of the quizzes are resolved together.
+        """
+        with ThreadPoolExecutor(max_workers=self.session.pool_size) as pool:
+            pages = list(pool.map(NewQuiz.items, quizzes))
+        self.item_banks(
+            bank_id for quiz_pages in pages for bank_id in new_quiz_bank_ids(quiz_pages)
+        )
+        return [collect_new_quiz_questions(quiz_pages, self.banks) for quiz_pages in pages]
+
     def quiz(self, assignment_id):
+        """The classic quiz or New Quiz with this id.
+
+        Uses the quiz listings if quiz_ids fetched them, and otherwise asks
+        the classic API first: listing every quiz of the course would cost
+        more requests than it saves for a few quiz ids.
+        """
         if assignment_id:
+            listed = self.kinds and self.kinds.get(str(assignment_id))
+            if listed:
+                (kind, quiz) = listed
+                return Quiz(self, quiz) if kind == "classic" else NewQuiz(self, quiz)
             try:
                 for quiz in self.request(
                     f"{self.course_url_prefix}/quizzes/{assignment_id}"
@@ -182,8 +324,12 @@ class CourseSubObject(Canvas):
 class Quiz(CourseSubObject):
     """Quiz"""
 
+    kind = "classic"
+
     def __init__(self, course, quiz_data):
         super().__init__(course, "quizzes", quiz_data)
+        # quiz_group_id -> group, filled by question_groups
+        self.groups = {}
 
     def question_group(self, group_id):
         """docstring"""
@@ -193,40 +339,55 @@ class Quiz(CourseSubObject):
             return group
         return None
 
+    def question_groups(self, group_ids):
+        """Fetch the given quiz groups in parallel and cache them on the quiz.
+
+        Canvas has no endpoint listing the groups of a quiz, so this sends
+        the per-group lookups concurrently instead of one at a time.
+        """
+        missing = [
+            group_id
+            for group_id in dict.fromkeys(group_ids)
+            if group_id is not None and group_id not in self.groups
+        ]
+        with ThreadPoolExecutor(max_workers=self.session.pool_size) as pool:
+            for group_id, group in zip(missing, pool.map(self.question_group, missing)):
+                self.groups[group_id] = group
+        print_group_prefetch(len(missing), self.session.pool_size)
+        return self.groups
+
+    def cached_group(self, group_id):
+        """question_group, but each group is only requested once per quiz"""
+        if group_id is not None and group_id not in self.groups:
+            self.groups[group_id] = self.question_group(group_id)
+        return self.groups.get(group_id)
+
+    def iter_questions(self, stream=False):
+        """Yield the questions page by page, in the order Canvas returns them.
+
+        Unlike questions(), the positions of ungrouped questions are not
+        renumbered and nothing is sorted, so memory stays bounded by a page
+        (or by one question with stream=True, see Canvas.iter_items).
+        """
+        request = f"{self.object_url_prefix}/questions?per_page=100"
+        if stream:
+            questions = iter_quiz_questions(
+                self.iter_items(request, stream), self.cached_group
+            )
+            return map(Question.from_canvas, questions)
+
+        def items():
+            for page in self.iter_pages(request):
+                self.question_groups(q["quiz_group_id"] for q in page)
+                yield from page
+
+        return map(Question.from_canvas, iter_quiz_questions(items(), self.cached_group))
+
     def questions(self, qfilter=None):
         """docstring"""
-        questions = {}
-        groups = {}
-        i = 1
-        for result in self.request(f"{self.object_url_prefix}/questions?per_page=100"):
-            for question in result:
-                if question["quiz_group_id"] in groups:
-                    group = groups[question["quiz_group_id"]]
-                else:
-                    group = self.question_group(question["quiz_group_id"])
-                    groups[question["quiz_group_id"]] = group
-
-                if group:
-                    question["points_possible"] = group["question_points"]
-                    question["position"] = group["position"]
-                else:
-                    question["position"] = i
-                    i += 1
-                if not qfilter or qfilter(question["id"]):
-                    questions[question["id"]] = question
-        if None in groups:
-            del groups[None]
-        for grp in groups.values():
-            for question in [
-                q
-                for q in questions.values()
-                if q["position"] >= grp["position"] and q["quiz_group_id"] is None
-            ]:
-                question["position"] += 1
-        return (
-            OrderedDict(sorted(questions.items(), key=lambda t: t[1]["position"])),
-            OrderedDict(sorted(groups.items(), key=lambda t: t[1]["position"])),
-        )
+        pages = self.request(f"{self.object_url_prefix}/questions?per_page=100")
+        self.question_groups(q["quiz_group_id"] for page in pages for q in page)
+        return order_quiz_questions(pages, self.groups.get, qfilter)
 
     def has_time_limit(self):
         return self.data["time_limit"]
@@ -235,87 +396,299 @@ class Quiz(CourseSubObject):
 class NewQuiz(CourseSubObject):
     """Quiz"""
 
+    kind = "new"
+
     def __init__(self, course, quiz_data):
         super().__init__(course, "quizzes", quiz_data)
         self.object_url_prefix = self.compute_url_prefix(new_quiz=True)
 
+    def items(self):
+        """Pages of the /items listing"""
+        return self.request(f"{self.object_url_prefix}/items?per_page=100")
+
     def questions(self, qfilter=None):
         """docstring"""
-        questions = {}
-        stimulus = {}
-        groups = {}
-        for result in self.request(f"{self.object_url_prefix}/items?per_page=100"):
-            for question in result:
-                new_question_dict = {}
-                for key in question.keys():
-                    new_question_dict[key] = question[key]
-
-                if question["entry_type"] == "Item":
-                    # Item
-                    new_question_dict["question_name"] = question["entry"]["title"]
-                    new_question_dict["question_text"] = question["entry"]["item_body"]
-                    new_question_dict["question_type"] = question["entry"][
-                        "interaction_type_slug"
-                    ]
-                    new_question_dict["interaction_data"] = question["entry"][
-                        "interaction_data"
-                    ]
-                    new_question_dict["answer_feedback"] = question["entry"][
-                        "answer_feedback"
-                    ]
-                    if (
-                        question["stimulus_quiz_entry_id"] != ""
-                        and question["stimulus_quiz_entry_id"] in stimulus.keys()
-                    ):
-                        # stimulus[question["stimulus_quiz_entry_id"]]
-                        new_question_dict["question_text"] = (
-                            "Context\n"
-                            + stimulus[question["stimulus_quiz_entry_id"]]
-                            + "End of Context\n\n"
-                            + new_question_dict["question_text"]
-                        )
-                elif question["entry_type"] == "Stimulus":
-                    # Item -> Stimulus
-                    stimulus[question["id"]] = question["entry"]["body"]
-                    continue
-                elif question["entry_type"] == "BankEntry":
-                    # BankEntry
-                    actual_question = question["entry"]
-                    if actual_question["entry_type"] == "Item":
-                        # BankEntry Item
-                        new_question_dict["entry"] = actual_question["entry"]
-                        new_question_dict["question_name"] = actual_question["entry"][
-                            "title"
-                        ]
-                        new_question_dict["question_text"] = actual_question["entry"][
-                            "item_body"
-                        ]
-                        new_question_dict["question_type"] = actual_question["entry"][
-                            "interaction_type_slug"
-                        ]
-                        new_question_dict["interaction_data"] = actual_question[
-                            "entry"
-                        ]["interaction_data"]
-                        new_question_dict["answer_feedback"] = actual_question["entry"][
-                            "answer_feedback"
-                        ]
-                    elif actual_question["entry_type"] == "Stimulus":
-                        # BankEntry Stimulus
-                        stimulus[question["id"]] = question["entry"]["entry"]["body"]
-                        continue
-                else:
-                    raise KeyError
-                questions[question["id"]] = new_question_dict
-
-        return (
-            OrderedDict(sorted(questions.items(), key=lambda t: t[1]["position"])),
-            OrderedDict(sorted(groups.items(), key=lambda t: t[1]["position"])),
+        pages = self.items()
+        banks = self.get_course().item_banks(new_quiz_bank_ids(pages))
+        return collect_new_quiz_questions(pages, banks)
+
+    def iter_questions(self, stream=False):
+        """Yield the questions as their items arrive, see Quiz.iter_questions"""
+        return iter_new_quiz_questions(
+            self.iter_items(f"{self.object_url_prefix}/items?per_page=100", stream)
         )
 
     def has_time_limit(self):
         return self.data["quiz_settings"]["has_time_limit"]
 
 
+def remaining_page_urls(response):
+    """URLs of the pages after `response`, read from its Link header.
+
+    Only works when Canvas numbers its pages (`page=3`) and sends a `last`
+    link. Returns None for bookmark cursors (`page=bookmark:...`) or when the
+    page count is unknown, in which case the caller has to follow `next`.
+    """
+    links = response.links
+    if "next" not in links or "last" not in links or "current" not in links:
+        return None
+    current_page = parse_qs(urlparse(links["current"]["url"]).query).get("page", ["1"])
+    last_url = urlparse(links["last"]["url"])
+    query = parse_qs(last_url.query, keep_blank_values=True)
+    last_page = query.get("page", [""])
+    if not (current_page[0].isdigit() and last_page[0].isdigit()):
+        return None
+    urls = []
+    for page in range(int(current_page[0]) + 1, int(last_page[0]) + 1):
+        query["page"] = [str(page)]
+        urls.append(last_url._replace(query=urlencode(query, doseq=True)).geturl())
+    return urls
+
+
+def map_quiz_kinds(listings):
+    """id -> (kind, quiz data) from the pages of the "classic" and "new" quiz listings.
+
+    A classic quiz wins if a New Quiz has the same id, as the classic
+    endpoint is the one tried first for ids that are not listed.
+    """
+    kinds = {}
+    for kind in ["classic", "new"]:
+        for page in listings[kind]:
+            for quiz in page:
+                kinds.setdefault(str(quiz["id"]), (kind, quiz))
+    return kinds
+
+
+def select_quizzes(kinds, title=None, updated_since=None):
+    """Ids of the quizzes in `kinds` (see map_quiz_kinds) whose title matches the
+    regular expression `title` and that were updated at or after `updated_since`.
+
+    `updated_since` is an ISO 8601 date or time, compared as a string with
+    Canvas timestamps. New Quizzes do not report updated_at, so they are
+    always kept.
+    """
+    ids = []
+    for quiz_id, (kind, quiz) in kinds.items():
+        if title and not re.search(title, quiz.get("title") or ""):
+            continue
+        updated_at = quiz.get("updated_at")
+        if updated_since and updated_at and updated_at < updated_since:
+            continue
+        ids.append(quiz_id)
+    return ids
+
+
+def print_group_prefetch(fetched, pool_size, what="quiz groups"):
+    """Report the serial group lookups saved by fetching them concurrently"""
+    if fetched:
+        round_trips = -(-fetched // pool_size)
+        print(
+            "Prefetched {} {} in {} round trips ({} serial requests saved)".format(
+                fetched, what, round_trips, fetched - round_trips
+            )
+        )
+
+
+def iter_quiz_questions(items, question_group):
+    """Fill in the points and position of a classic quiz's questions as they arrive.
+
+    `question_group` maps a quiz_group_id to the group data (or None). The
+    positions of ungrouped questions are only final once order_quiz_questions
+    has seen every group.
+    """
+    i = 1
+    for question in items:
+        group = question_group(question["quiz_group_id"])
+        if group:
+            if group["question_points"] is not None:
+                question["points_possible"] = group["question_points"]
+            question["position"] = group["position"]
+        else:
+            question["position"] = i
+            i += 1
+        yield question
+
+
+def order_quiz_questions(pages, question_group, qfilter=None):
+    """Number and sort the pages of a classic quiz's /questions listing.
+
+    `question_group` maps a quiz_group_id to the group data (or None). Shared
+    by Quiz and the asyncio client in async_canvas.py.
+    """
+    questions = {}
+    groups = {}
+
+    def cached_group(group_id):
+        if group_id not in groups:
+            groups[group_id] = question_group(group_id)
+        return groups[group_id]
+
+    items = (question for result in pages for question in result)
+    for question in iter_quiz_questions(items, cached_group):
+        if not qfilter or qfilter(question["id"]):
+            questions[question["id"]] = question
+    if None in groups:
+        del groups[None]
+    for grp in groups.values():
+        for question in [
+            q
+            for q in questions.values()
+            if q["position"] >= grp["position"] and q["quiz_group_id"] is None
+        ]:
+            question["position"] += 1
+    return (
+        OrderedDict(
+            (question_id, Question.from_canvas(question))
+            for question_id, question in sorted(
+                questions.items(), key=lambda t: t[1]["position"]
+            )
+        ),
+        OrderedDict(sorted(groups.items(), key=lambda t: t[1]["position"])),
+    )
+
+
+def new_quiz_bank_ids(pages):
+    """Ids of the item banks that the items of a New Quiz draw questions from"""
+    return [
+        item["entry"]["id"]
+        for page in pages
+        for item in page
+        if item["entry_type"] == "Bank"
+    ]
+
+
+def collect_new_quiz_questions(pages, banks=None):
+    """Turn the pages of a New Quiz's /items listing into questions.
+
+    Done in two passes over the listing: the first collects the stimuli, so
+    an item can come before the stimulus it refers to, and the second builds
+    the questions. `banks` maps an item bank id to its entries (see
+    Course.item_banks); the entries drawn from a bank become the questions
+    of a group at the position of the Bank item.
+    """
+    items = [item for page in pages for item in page]
+    stimulus = {}
+    for item in items:
+        if item["entry_type"] == "Stimulus":
+            stimulus[item["id"]] = item["entry"]["body"]
+        elif item["entry_type"] == "BankEntry" and item["entry"]["entry_type"] == "Stimulus":
+            stimulus[item["id"]] = item["entry"]["entry"]["body"]
+
+    groups = {}
+    expanded = []
+    for item in items:
+        if item["entry_type"] != "Bank":
+            expanded.append(item)
+            continue
+        entries = (banks or {}).get(item["entry"]["id"])
+        if entries is None:
+            print(f'[Warning] Item bank {item["entry"]["id"]} was not fetched, skipping item {item["id"]}.')
+            continue
+        groups[item["id"]] = {
+            "id": item["id"],
+            "name": item["entry"].get("title"),
+            "pick_count": item.get("properties", {}).get("sample_num"),
+            "position": item["position"],
+            "question_points": item.get("points_possible"),
+        }
+        for entry in entries:
+            expanded.append(
+                {
+                    "id": entry["id"],
+                    "position": item["position"],
+                    "entry_type": "BankEntry",
+                    "entry": entry,
+                    "stimulus_quiz_entry_id": "",
+                    "quiz_group_id": item["id"],
+                    "points_possible": item.get("points_possible"),
+                }
+            )
+
+    questions = {
+        question.id: question
+        for question in iter_new_quiz_questions(expanded, stimulus)
+    }
+    return (
+        OrderedDict(sorted(questions.items(), key=lambda t: t[1].position)),
+        OrderedDict(sorted(groups.items(), key=lambda t: t[1]["position"])),
+    )
+
+
+def iter_new_quiz_questions(items, stimulus=None):
+    """Turn New Quiz /items entries into questions as they arrive.
+
+    The item dicts are updated in place rather than copied. Unless the
+    stimuli are collected beforehand (see collect_new_quiz_questions), a
+    Stimulus only applies to the items that come after it. Bank items are
+    skipped, their entries are only listed by Course.item_banks.
+    """
+    if stimulus is None:
+        stimulus = {}
+    for question in items:
+        new_question_dict = question
+        if question["entry_type"] == "Item":
+            # Item
+            new_question_dict["question_name"] = question["entry"]["title"]
+            new_question_dict["question_text"] = question["entry"]["item_body"]
+            new_question_dict["question_type"] = question["entry"][
+                "interaction_type_slug"
+            ]
+            new_question_dict["interaction_data"] = question["entry"][
+                "interaction_data"
+            ]
+            new_question_dict["answer_feedback"] = question["entry"][
+                "answer_feedback"
+            ]
+            if (
+                question["stimulus_quiz_entry_id"] != ""
+                and question["stimulus_quiz_entry_id"] in stimulus.keys()
+            ):
+                # stimulus[question["stimulus_quiz_entry_id"]]
+                new_question_dict["question_text"] = (
+                    "Context\n"
+                    + stimulus[question["stimulus_quiz_entry_id"]]
+                    + "End of Context\n\n"
+                    + new_question_dict["question_text"]
+                )
+        elif question["entry_type"] == "Stimulus":
+            # Item -> Stimulus
+            stimulus[question["id"]] = question["entry"]["body"]
+            continue
+        elif question["entry_type"] == "BankEntry":
+            # BankEntry
+            actual_question = question["entry"]
+            if actual_question["entry_type"] == "Item":
+                # BankEntry Item
+                new_question_dict["entry"] = actual_question["entry"]
+                new_question_dict["question_name"] = actual_question["entry"][
+                    "title"
+                ]
+                new_question_dict["question_text"] = actual_question["entry"][
+                    "item_body"
+                ]
+                new_question_dict["question_type"] = actual_question["entry"][
+                    "interaction_type_slug"
+                ]
+                new_question_dict["interaction_data"] = actual_question[
+                    "entry"
+                ]["interaction_data"]
+                new_question_dict["answer_feedback"] = actual_question["entry"][
+                    "answer_feedback"
+                ]
+            elif actual_question["entry_type"] == "Stimulus":
+                # BankEntry Stimulus
+                stimulus[question["id"]] = question["entry"]["entry"]["body"]
+                continue
+        elif question["entry_type"] == "Bank":
+            print(
+                f'[Warning] Item {question["id"]} draws from item bank {question["entry"]["id"]}, which is not fetched here.'
+            )
+            continue
+        else:
+            raise KeyError
+        yield Question.from_canvas(new_question_dict, kind="new")
+
+
 # class QuizQuestion(CourseSubObject):
 #     # If the quiz is not supplied, fetches it via quiz_question_data['quiz_id'].
 #     def __init__(self, quiz_question_data, quiz=None):
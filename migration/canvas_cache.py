@@ -0,0 +1,119 @@
+import os
+import json
+import hashlib
+import threading
+from canvas_session import CanvasResponse
+
+
+DEFAULT_MAX_BYTES = 512 * 1024 * 1024
+
+# headers worth replaying from the cache; the body is stored decoded, so
+# Content-Encoding/Content-Length must not come back
+KEPT_HEADERS = ["Content-Type", "Link", "ETag", "Last-Modified"]
+
+
+class ResponseCache:
+    """Persistent cache of Canvas GET responses, revalidated with ETag/Last-Modified.
+
+    Each URL is stored as `<sha256>.json` (status, headers) plus `<sha256>.body`,
+    hashed together with a hash of the access `token`, so users sharing a
+    cache directory never get each other's responses. A hit touches both
+    files, and when the cache grows past `max_bytes` the least recently used
+    entries are deleted first.
+    """
+
+    def __init__(self, cache_dir, max_bytes=DEFAULT_MAX_BYTES, token=""):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.token_hash = hashlib.sha256(token.encode("utf-8")).hexdigest()
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        os.makedirs(cache_dir, exist_ok=True)
+        self.size = sum(
+            os.path.getsize(os.path.join(cache_dir, name))
+            for name in os.listdir(cache_dir)
+        )
+
+    def _paths(self, url):
+        key = hashlib.sha256(f"{self.token_hash} {url}".encode("utf-8")).hexdigest()
+        return (
+            os.path.join(self.cache_dir, key + ".json"),
+            os.path.join(self.cache_dir, key + ".body"),
+        )
+
+    def get(self, url):
+        """Return the cached CanvasResponse for `url`, or None"""
+        meta_path, body_path = self._paths(url)
+        try:
+            with open(meta_path) as f:
+                meta = json.load(f)
+            with open(body_path, "rb") as f:
+                content = f.read()
+        except (OSError, ValueError):
+            return None
+        return CanvasResponse(meta["status_code"], meta["headers"], content, url)
+
+    def validators(self, cached):
+        """Conditional request headers for a cached response"""
+        headers = {}
+        if cached is None:
+            return headers
+        if "ETag" in cached.headers:
+            headers["If-None-Match"] = cached.headers["ETag"]
+        if "Last-Modified" in cached.headers:
+            headers["If-Modified-Since"] = cached.headers["Last-Modified"]
+        return headers
+
+    def hit(self, url):
+        """Mark `url` as recently used after a 304"""
+        with self._lock:
+            self.hits += 1
+        for path in self._paths(url):
+            try:
+                os.utime(path)
+            except OSError:
+                pass
+
+    def store(self, url, response):
+        """Save a 200 response if it came with a validator"""
+        with self._lock:
+            self.misses += 1
+        if response.status_code != 200 or not (
+            "ETag" in response.headers or "Last-Modified" in response.headers
+        ):
+            return
+        headers = {k: response.headers[k] for k in KEPT_HEADERS if k in response.headers}
+        meta = json.dumps({"status_code": response.status_code, "headers": headers})
+        meta_path, body_path = self._paths(url)
+        with self._lock:
+            self.size -= self._file_sizes(meta_path, body_path)
+            with open(body_path, "wb") as f:
+                f.write(response.content)
+            with open(meta_path, "w") as f:
+                f.write(meta)
+            self.size += self._file_sizes(meta_path, body_path)
+            if self.size > self.max_bytes:
+                self._evict()
+
+    def _file_sizes(self, *paths):
+        return sum(os.path.getsize(p) for p in paths if os.path.exists(p))
+
+    def _evict(self):
+        """Delete least recently used entries until the cache fits in max_bytes"""
+        entries = {}
+        for name in os.listdir(self.cache_dir):
+            path = os.path.join(self.cache_dir, name)
+            key = os.path.splitext(name)[0]
+            mtime, size, paths = entries.get(key, (0, 0, []))
+            stat = os.stat(path)
+            entries[key] = (max(mtime, stat.st_mtime), size + stat.st_size, paths + [path])
+        for mtime, size, paths in sorted(entries.values()):
+            if self.size <= self.max_bytes:
+                break
+            for path in paths:
+                os.remove(path)
+            self.size -= size
+
+    def summary(self):
+        return {"cache_hits": self.hits, "cache_misses": self.misses}
@@ -0,0 +1,143 @@
+import os
+import re
+import hashlib
+from urllib.parse import urlparse
+from concurrent.futures import ThreadPoolExecutor
+import requests
+
+
+# "/courses/1/files/456/preview", "/files/456/download?verifier=..."
+FILE_PATH = r"""(?:/courses/\d+)?/files/(\d+)(?:[/?#][^"'\s]*)?"""
+FILES_FOLDER = "canvas"
+
+
+def file_reference(host=None):
+    """Pattern of the links to Canvas files in src/href attributes: relative
+    paths, or absolute URLs on `host` (e.g. "canvas.ubc.ca")"""
+    prefix = ""
+    if host:
+        prefix = "(?:https?://{})?".format(re.escape(host))
+    return re.compile(r"""(["'])({}{})\1""".format(prefix, FILE_PATH))
+
+
+FILE_REFERENCE = file_reference()
+
+
+def file_references(html, pattern=FILE_REFERENCE):
+    """Ids of the Canvas files referenced in src/href attributes of `html`"""
+    return {match.group(3) for match in pattern.finditer(html)}
+
+
+class CanvasFiles:
+    """Downloads the Canvas files embedded in question HTML into clientFilesCourse.
+
+    Files are stored once, under the hash of their content, in
+    clientFilesCourse/canvas/, so an image used by many questions (or
+    uploaded twice) is stored only once. `names` maps Canvas file ids to the
+    stored names; pass the manifest's mapping to skip files downloaded by
+    earlier runs. Without `canvas` (e.g. when generating from a snapshot),
+    only links to files downloaded before or added with `add` are rewritten,
+    and `host` is the Canvas host of absolute links.
+    """
+
+    def __init__(self, canvas, pl_repo, names=None, host=None):
+        self.canvas = canvas
+        if canvas is not None:
+            host = urlparse(canvas.api_url).netloc
+        # links to other sites that happen to contain /files/<id> are left alone
+        self.pattern = file_reference(host)
+        self.directory = os.path.join(pl_repo, "clientFilesCourse", FILES_FOLDER)
+        self.names = names if names is not None else {}
+        # ids of the files linked from the questions of this run
+        self.referenced = set()
+        # ids of the files that could not be fetched, not tried again in this run
+        self.failed_ids = set()
+        self.downloaded = 0
+        self.failed = 0
+
+    def _store(self, content, extension):
+        name = hashlib.sha256(content).hexdigest()[:20] + extension
+        path = os.path.join(self.directory, name)
+        if not os.path.exists(path):
+            os.makedirs(self.directory, exist_ok=True)
+            with open(path + ".tmp", "wb") as f:
+                f.write(content)
+            os.replace(path + ".tmp", path)
+        return name
+
+    def add(self, file_id, name, content):
+        """Store a file fetched earlier, e.g. saved in a snapshot"""
+        self.names[file_id] = self._store(content, os.path.splitext(name)[1])
+
+    def _download(self, file_id):
+        try:
+            meta = self.canvas.file(file_id)
+            # the download url is pre-signed, so skip the response cache
+            response = self.canvas.session.request("GET", meta["url"])
+            response.raise_for_status()
+        except (requests.exceptions.RequestException, KeyError, ValueError) as e:
+            # e.g. no "url" for locked or unpublished files
+            print(f"[Warning] Cannot download Canvas file {file_id}: {e}")
+            return None
+        extension = os.path.splitext(meta.get("filename") or "")[1].lower()
+        return self._store(response.content, extension)
+
+    def fetch(self, file_ids):
+        """Download the files not downloaded yet, in parallel.
+
+        Each file that cannot be fetched is reported once per run.
+        """
+        missing = sorted(
+            file_id
+            for file_id in set(file_ids) - self.failed_ids
+            if file_id not in self.names
+            or not os.path.exists(os.path.join(self.directory, self.names[file_id]))
+        )
+        if not missing:
+            return
+        if self.canvas is None:
+            for file_id in missing:
+                print(f"[Warning] Canvas file {file_id} was never downloaded, its links are left as they are")
+            self.failed_ids.update(missing)
+            self.failed += len(missing)
+            return
+        with ThreadPoolExecutor(max_workers=self.canvas.session.pool_size) as pool:
+            for file_id, name in zip(missing, pool.map(self._download, missing)):
+                if name is None:
+                    self.failed_ids.add(file_id)
+                    self.failed += 1
+                else:
+                    self.names[file_id] = name
+                    self.downloaded += 1
+
+    def rewrite(self, html):
+        """Point the file references in `html` at the downloaded copies"""
+
+        def replace(match):
+            name = self.names.get(match.group(3))
+            if name is None:
+                return match.group(0)
+            return "{0}{{{{options.client_files_course_url}}}}/{1}/{2}{0}".format(
+                match.group(1), FILES_FOLDER, name
+            )
+
+        return self.pattern.sub(replace, html)
+
+    def localize(self, question_dirs):
+        """Download every file referenced by these questions and rewrite their HTML"""
+        htmls = {}
+        for question_dir in question_dirs:
+            with open(os.path.join(question_dir, "question.html")) as f:
+                htmls[question_dir] = f.read()
+        file_ids = {
+            file_id
+            for html in htmls.values()
+            for file_id in file_references(html, self.pattern)
+        }
+        self.referenced |= file_ids
+        self.fetch(file_ids)
+        for question_dir, html in htmls.items():
+            new_html = self.rewrite(html)
+            if new_html != html:
+                with open(os.path.join(question_dir, "question.html"), "w") as f:
+                    f.write(new_html)
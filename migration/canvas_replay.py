@@ -0,0 +1,184 @@
+import re
+import json
+import time
+import random
+import argparse
+import threading
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlparse, parse_qs, urlencode
+
+
+# Canvas' default page size when per_page is not given
+DEFAULT_PER_PAGE = 10
+PAGING_PARAMS = ["page", "per_page"]
+
+
+def endpoint_key(path_and_query):
+    """`v1/courses/1/quizzes?per_page=100&page=2` -> (`v1/courses/1/quizzes`, page)"""
+    url = urlparse(path_and_query)
+    query = parse_qs(url.query, keep_blank_values=True)
+    page = query.get("page", ["1"])[0]
+    for name in PAGING_PARAMS:
+        query.pop(name, None)
+    key = url.path.lstrip("/")
+    if query:
+        key += "?" + urlencode(sorted(query.items()), doseq=True)
+    return key, page
+
+
+class Cassette:
+    """Canvas responses recorded for offline replay.
+
+    Responses are stored per endpoint with the paging parameters removed.
+    For list endpoints, all pages are merged into a single item list, so the
+    replay server can serve them again with any page size.
+    """
+
+    def __init__(self, api_url=None, course_id=None):
+        self.api_url = api_url
+        # the `course_id` section of config.json, so benchmarks know what to fetch
+        self.course_id = course_id or {}
+        self.endpoints = {}
+        self._pages = {}
+        self._lock = threading.Lock()
+
+    def record(self, url, response):
+        """Remember one response of CanvasSession.get or AsyncCanvas.get"""
+        if not url.startswith(self.api_url):
+            return
+        key, page = endpoint_key(url[len(self.api_url):])
+        try:
+            body = response.json()
+        except ValueError:
+            body = response.text
+        with self._lock:
+            self._pages.setdefault(key, {})[page] = (response.status_code, body)
+
+    def _merge(self):
+        for key, pages in self._pages.items():
+            if all(page.isdigit() for page in pages):
+                pages = [pages[page] for page in sorted(pages, key=int)]
+            else:
+                # bookmark cursors: keep the order they were fetched in
+                pages = list(pages.values())
+            status_code, body = pages[0]
+            if status_code == 200 and isinstance(body, list):
+                body = [item for _, page in pages for item in page]
+            self.endpoints[key] = {"status_code": status_code, "body": body}
+
+    def save(self, path):
+        with self._lock:
+            self._merge()
+            with open(path, "w") as f:
+                json.dump(
+                    {
+                        "api_url": self.api_url,
+                        "course_id": self.course_id,
+                        "endpoints": self.endpoints,
+                    },
+                    f,
+                )
+
+    @classmethod
+    def load(cls, path):
+        with open(path) as f:
+            data = json.load(f)
+        cassette = cls(data["api_url"], data["course_id"])
+        cassette.endpoints = data["endpoints"]
+        return cassette
+
+
+class ReplayHandler(BaseHTTPRequestHandler):
+    """Serves a Cassette like Canvas would, under /api/"""
+
+    protocol_version = "HTTP/1.1"
+    # set by make_server
+    cassette = None
+    latency = 0.0
+    page_size = None
+    bookmarks = False
+    request_count = 0
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send_json(self, status_code, body, link=None):
+        content = json.dumps(body).encode("utf-8")
+        self.send_response(status_code)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(content)))
+        if link:
+            self.send_header("Link", link)
+        self.end_headers()
+        self.wfile.write(content)
+
+    def _link(self, path, query, page, rel):
+        query = dict(query, page=f"bookmark:{page}" if self.bookmarks else page)
+        return f'<http://{self.headers["Host"]}{path}?{urlencode(query, doseq=True)}>; rel="{rel}"'
+
+    def do_GET(self):
+        type(self).request_count += 1
+        if self.latency:
+            time.sleep(self.latency * random.uniform(0.8, 1.2))
+        url = urlparse(self.path)
+        key, page = endpoint_key(re.sub(r"^/api/", "", url.path) + "?" + url.query)
+        if key not in self.cassette.endpoints:
+            return self._send_json(404, {"errors": [{"message": "not recorded"}]})
+        endpoint = self.cassette.endpoints[key]
+        body = endpoint["body"]
+        if endpoint["status_code"] != 200 or not isinstance(body, list):
+            return self._send_json(endpoint["status_code"], body)
+
+        query = parse_qs(url.query, keep_blank_values=True)
+        per_page = self.page_size or int(query.get("per_page", [DEFAULT_PER_PAGE])[0])
+        query["per_page"] = [str(per_page)]
+        query.pop("page", None)
+        page = int(page.replace("bookmark:", ""))
+        last = max(1, -(-len(body) // per_page))
+        links = [
+            self._link(url.path, query, page, "current"),
+            self._link(url.path, query, 1, "first"),
+        ]
+        if page < last:
+            links.append(self._link(url.path, query, page + 1, "next"))
+        if not self.bookmarks:
+            # like Canvas, bookmark-paginated endpoints have no `last` link
+            links.append(self._link(url.path, query, last, "last"))
+        self._send_json(
+            200, body[(page - 1) * per_page : page * per_page], ", ".join(links)
+        )
+
+
+def make_server(cassette, port=0, latency=0.0, page_size=None, bookmarks=False):
+    """A ThreadingHTTPServer replaying `cassette`; point api_url at /api/ on it"""
+    handler = type(
+        "CassetteHandler",
+        (ReplayHandler,),
+        {
+            "cassette": cassette,
+            "latency": latency,
+            "page_size": page_size,
+            "bookmarks": bookmarks,
+        },
+    )
+    return ThreadingHTTPServer(("127.0.0.1", port), handler)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--cassette", required=True, help="Recorded with --record")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--latency", type=float, default=0.0, help="Seconds per request")
+    parser.add_argument("--page_size", type=int, default=None)
+    parser.add_argument("--bookmarks", action="store_true", help="Use bookmark paging")
+    args = parser.parse_args()
+
+    server = make_server(
+        Cassette.load(args.cassette),
+        args.port,
+        args.latency,
+        args.page_size,
+        args.bookmarks,
+    )
+    print(f'Replaying Canvas: set "api_url" to http://127.0.0.1:{args.port}/api/')
+    server.serve_forever()
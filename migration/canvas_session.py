@@ -0,0 +1,274 @@
+import json
+import codecs
+import threading
+import requests
+from requests.adapters import HTTPAdapter
+from requests.utils import parse_header_links
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+from canvas_throttle import RequestScheduler
+
+
+DEFAULT_POOL_SIZE = 10
+
+
+class ConnectionStats:
+    """Counts requests sent and TCP connections opened by a session"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.opened = 0
+
+    def add_request(self):
+        with self._lock:
+            self.requests += 1
+
+    def add_connection(self):
+        with self._lock:
+            self.opened += 1
+
+    @property
+    def reused(self):
+        return max(self.requests - self.opened, 0)
+
+    def summary(self):
+        return {
+            "requests": self.requests,
+            "connections_opened": self.opened,
+            "connections_reused": self.reused,
+        }
+
+
+class CanvasResponse:
+    """Transport-independent view of an HTTP response.
+
+    Both the requests and the httpx transports return this, so the Canvas
+    client only has to deal with one response type and one exception type
+    (requests.exceptions.HTTPError).
+    """
+
+    def __init__(self, status_code, headers, content, url, reason="", chunks=None):
+        self.status_code = status_code
+        self.headers = requests.structures.CaseInsensitiveDict(headers)
+        self.content = content
+        self.url = url
+        self.reason = reason
+        # body iterator of a streamed response, see CanvasSession.stream
+        self.chunks = chunks
+
+    def iter_content(self):
+        if self.chunks is not None:
+            return self.chunks
+        return iter([self.content])
+
+    @property
+    def text(self):
+        return self.content.decode("utf-8", errors="replace")
+
+    @property
+    def links(self):
+        links = {}
+        header = self.headers.get("link")
+        if header:
+            for link in parse_header_links(header):
+                key = link.get("rel") or link.get("url")
+                links[key] = link
+        return links
+
+    def json(self):
+        return json.loads(self.content)
+
+    def raise_for_status(self):
+        if 400 <= self.status_code < 600:
+            raise requests.exceptions.HTTPError(
+                f"{self.status_code} Error: {self.reason} for url: {self.url}",
+                response=self,
+            )
+
+
+def iter_json_array(chunks):
+    """Yield the elements of a JSON array read from byte chunks, one at a time.
+
+    Only the current element and the unparsed rest of the last chunk are
+    kept, so a very large page never has to be decoded as a whole.
+    """
+    decoder = json.JSONDecoder()
+    utf8 = codecs.getincrementaldecoder("utf-8")()
+    buffer = ""
+    started = False
+    for chunk in chunks:
+        buffer += utf8.decode(chunk)
+        pos = 0
+        while True:
+            while pos < len(buffer) and buffer[pos] in " \t\r\n,":
+                pos += 1
+            if pos == len(buffer):
+                break
+            if not started:
+                if buffer[pos] != "[":
+                    raise ValueError("Expected a JSON array")
+                started = True
+                pos += 1
+                continue
+            if buffer[pos] == "]":
+                return
+            try:
+                item, end = decoder.raw_decode(buffer, pos)
+            except json.JSONDecodeError:
+                break
+            if end == len(buffer) or buffer[end] not in " \t\r\n,]":
+                # a number such as "1500." may continue in the next chunk
+                break
+            yield item
+            pos = end
+        buffer = buffer[pos:]
+    # the closing "]" returns above
+    raise ValueError("Truncated JSON array")
+
+
+def _counting_pool(pool_class, stats):
+    """Subclass a urllib3 pool so that every new connection is counted"""
+
+    def _new_conn(self):
+        stats.add_connection()
+        return pool_class._new_conn(self)
+
+    return type(
+        f"Counting{pool_class.__name__}", (pool_class,), {"_new_conn": _new_conn}
+    )
+
+
+def _closing(chunks, response):
+    try:
+        yield from chunks
+    finally:
+        response.close()
+
+
+class CanvasSession:
+    """Pooled keep-alive HTTP session shared by every Canvas object.
+
+    Uses requests by default. With http2=True the requests go through an
+    httpx client instead, which multiplexes them over one HTTP/2 connection
+    per host (needs the `h2` package: pip install httpx[http2]).
+    """
+
+    def __init__(
+        self, headers=None, pool_size=DEFAULT_POOL_SIZE, http2=False, cache=None
+    ):
+        self.pool_size = pool_size
+        self.http2 = http2
+        # optional canvas_cache.ResponseCache used by get()
+        self.cache = cache
+        # optional canvas_replay.Cassette that every GET is recorded into
+        self.recorder = None
+        self.scheduler = RequestScheduler(pool_size)
+        self.stats = ConnectionStats()
+        headers = dict(headers or {})
+        headers.setdefault("Accept-Encoding", "gzip, deflate")
+
+        if http2:
+            import httpx
+
+            try:
+                import h2  # noqa: F401
+            except ImportError:
+                raise Exception("HTTP/2 needs the h2 package: pip install httpx[http2]")
+            self._client = httpx.Client(
+                http2=True,
+                headers=headers,
+                limits=httpx.Limits(
+                    max_connections=pool_size,
+                    max_keepalive_connections=pool_size,
+                ),
+            )
+        else:
+            self._client = requests.Session()
+            self._client.headers.update(headers)
+            adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+            adapter.poolmanager.pool_classes_by_scheme = {
+                "http": _counting_pool(HTTPConnectionPool, self.stats),
+                "https": _counting_pool(HTTPSConnectionPool, self.stats),
+            }
+            self._client.mount("https://", adapter)
+            self._client.mount("http://", adapter)
+
+    def _trace(self, event_name, info):
+        # httpcore reports connection setup through the "trace" extension
+        if event_name == "connection.connect_tcp.started":
+            self.stats.add_connection()
+
+    def request(self, method, url, headers=None, json=None):
+        """Send one request and return a CanvasResponse.
+
+        Goes through the scheduler, so rate-limited requests are retried.
+        """
+        return self.scheduler.call(lambda: self._send(method, url, headers, json))
+
+    def _send(self, method, url, headers=None, json=None, stream=False):
+        self.stats.add_request()
+        chunks = None
+        if self.http2:
+            response = self._client.send(
+                self._client.build_request(
+                    method,
+                    url,
+                    headers=headers,
+                    json=json,
+                    extensions={"trace": self._trace},
+                ),
+                stream=stream,
+            )
+            if stream and response.status_code == 200:
+                chunks = _closing(response.iter_bytes(), response)
+            else:
+                response.read()
+            return CanvasResponse(
+                response.status_code,
+                response.headers,
+                b"" if chunks is not None else response.content,
+                str(response.url),
+                response.reason_phrase,
+                chunks,
+            )
+        response = self._client.request(
+            method, url, headers=headers, json=json, stream=stream
+        )
+        if stream and response.status_code == 200:
+            chunks = _closing(response.iter_content(64 * 1024), response)
+        return CanvasResponse(
+            response.status_code,
+            response.headers,
+            b"" if chunks is not None else response.content,
+            response.url,
+            response.reason,
+            chunks,
+        )
+
+    def stream(self, url):
+        """GET `url` without reading the body; iterate it with iter_content()"""
+        if self.recorder is not None:
+            # recording needs the whole body anyway
+            return self.get(url)
+        return self.scheduler.call(lambda: self._send("GET", url, stream=True))
+
+    def get(self, url, headers=None):
+        response = self._cached_get(url, headers)
+        if self.recorder is not None:
+            self.recorder.record(url, response)
+        return response
+
+    def _cached_get(self, url, headers=None):
+        if self.cache is None:
+            return self.request("GET", url, headers=headers)
+        cached = self.cache.get(url)
+        headers = {**(headers or {}), **self.cache.validators(cached)}
+        response = self.request("GET", url, headers=headers)
+        if response.status_code == 304 and cached is not None:
+            self.cache.hit(url)
+            return cached
+        self.cache.store(url, response)
+        return response
+
+    def close(self):
+        self._client.close()
@@ -0,0 +1,163 @@
+import time
+import asyncio
+import threading
+from contextlib import contextmanager, asynccontextmanager
+import backoff
+
+
+# Canvas refills a token's bucket to 700 units; stay well clear of empty
+LOW_WATER_MARK = 150
+HIGH_WATER_MARK = 400
+DEFAULT_MAX_TRIES = 8
+
+
+def is_throttled(response):
+    """Canvas answers 403 "Rate Limit Exceeded" when the bucket is empty"""
+    if response.status_code == 429:
+        return True
+    return response.status_code == 403 and "Rate Limit Exceeded" in response.text
+
+
+class RequestScheduler:
+    """Adaptive concurrency limit and retry policy for Canvas requests.
+
+    Every response's X-Rate-Limit-Remaining is compared against two water
+    marks: below LOW_WATER_MARK the number of requests allowed in flight is
+    halved, above HIGH_WATER_MARK it grows by one again (up to
+    max_concurrency). Throttled responses are retried with full-jitter
+    exponential backoff. Time spent waiting for a slot or sleeping between
+    retries is added up in `throttled_seconds`.
+
+    `call` is for threads (CanvasSession), `acall` for asyncio (AsyncCanvas).
+    """
+
+    def __init__(self, max_concurrency, max_tries=DEFAULT_MAX_TRIES, max_wait=60):
+        self.max_concurrency = max_concurrency
+        self.limit = max_concurrency
+        self.in_flight = 0
+        self.remaining = None
+        self.request_cost = 0.0
+        self.retries = 0
+        self.throttled_seconds = 0.0
+        self._lock = threading.Lock()
+        self._condition = threading.Condition(self._lock)
+        self._async_condition = None
+
+        retry = backoff.on_predicate(
+            backoff.expo,
+            predicate=is_throttled,
+            max_tries=max_tries,
+            max_value=max_wait,
+            jitter=backoff.full_jitter,
+            on_backoff=self._on_backoff,
+        )
+        self._call = retry(self._attempt)
+        self._acall = retry(self._async_attempt)
+
+    def _on_backoff(self, details):
+        with self._lock:
+            self.retries += 1
+            self.throttled_seconds += details["wait"]
+            # the bucket is empty: drop to one request at a time
+            self.limit = 1
+        print(
+            "[Warning] Canvas rate limit hit, retrying in {:.1f}s".format(
+                details["wait"]
+            )
+        )
+
+    def update(self, response):
+        """Adjust the concurrency limit from the rate-limit headers.
+
+        Returns True if the limit was raised.
+        """
+        remaining = response.headers.get("X-Rate-Limit-Remaining")
+        cost = response.headers.get("X-Request-Cost")
+        with self._lock:
+            if cost is not None:
+                self.request_cost += float(cost)
+            if remaining is None:
+                return False
+            self.remaining = float(remaining)
+            if self.remaining < LOW_WATER_MARK:
+                self.limit = max(1, self.limit // 2)
+            elif self.remaining > HIGH_WATER_MARK and self.limit < self.max_concurrency:
+                self.limit += 1
+                self._condition.notify()
+                return True
+        return False
+
+    async def aupdate(self, response):
+        """`update`, also waking the coroutines waiting in async_slot"""
+        if self.update(response) and self._async_condition is not None:
+            async with self._async_condition:
+                self._async_condition.notify_all()
+
+    @contextmanager
+    def slot(self):
+        """Wait until fewer than `limit` requests are in flight"""
+        with self._condition:
+            start = time.monotonic()
+            waited = False
+            while self.in_flight >= self.limit:
+                # only count waits caused by a lowered limit as throttling
+                waited = waited or self.limit < self.max_concurrency
+                self._condition.wait()
+            if waited:
+                self.throttled_seconds += time.monotonic() - start
+            self.in_flight += 1
+        try:
+            yield
+        finally:
+            with self._condition:
+                self.in_flight -= 1
+                self._condition.notify()
+
+    @asynccontextmanager
+    async def async_slot(self):
+        if self._async_condition is None:
+            self._async_condition = asyncio.Condition()
+        async with self._async_condition:
+            start = time.monotonic()
+            waited = False
+            while self.in_flight >= self.limit:
+                # only count waits caused by a lowered limit as throttling
+                waited = waited or self.limit < self.max_concurrency
+                await self._async_condition.wait()
+            if waited:
+                self.throttled_seconds += time.monotonic() - start
+            self.in_flight += 1
+        try:
+            yield
+        finally:
+            async with self._async_condition:
+                self.in_flight -= 1
+                self._async_condition.notify_all()
+
+    def _attempt(self, send):
+        with self.slot():
+            response = send()
+        self.update(response)
+        return response
+
+    async def _async_attempt(self, send):
+        async with self.async_slot():
+            response = await send()
+        await self.aupdate(response)
+        return response
+
+    def call(self, send):
+        """Run `send()` (which returns a CanvasResponse) under the limit, with retries"""
+        return self._call(send)
+
+    async def acall(self, send):
+        """Await `send()` under the limit, with retries"""
+        return await self._acall(send)
+
+    def summary(self):
+        return {
+            "throttled_seconds": self.throttled_seconds,
+            "retries": self.retries,
+            "request_cost": self.request_cost,
+            "rate_limit_remaining": self.remaining,
+        }
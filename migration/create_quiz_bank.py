@@ -4,8 +4,21 @@ import os
 import re
 import json
 import argparse
-import uuid
+from urllib.parse import urlparse
+import asyncio
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
 import canvas
+from manifest import Manifest
+from canvas_files import CanvasFiles
+from renderers import render_question
+from variants import VARIANTS_FILE
+from pipeline import Pipeline, Stage
+from folder_names import FolderNames
+from allocation import QuestionAllocator
+from snapshot import SnapshotWriter, read_snapshot, snapshot_files, snapshot_host
+from qti import QtiExport
 
 
 def file_name_only(name):
@@ -20,35 +33,265 @@ parser.add_argument("--pl_repo", help="Directory where PrairieLearn repo is stor
 parser.add_argument("--question_folder", default="QuestionBank")
 parser.add_argument("--config_file", default="config.json")
 parser.add_argument("--debug", default=False, help="Enable debugging mode")
+parser.add_argument(
+    "--pool_size", type=int, default=None, help="Number of pooled Canvas connections"
+)
+parser.add_argument(
+    "--http2", action="store_true", help="Talk to Canvas over HTTP/2 (needs httpx[http2])"
+)
+parser.add_argument(
+    "--concurrency",
+    type=int,
+    default=1,
+    help="Fetch all courses and quizzes concurrently with up to N requests in flight",
+)
+parser.add_argument(
+    "--cache_dir", default=None, help="Cache Canvas responses in this directory"
+)
+parser.add_argument(
+    "--cache_size_mb", type=int, default=None, help="Size limit of the response cache"
+)
+parser.add_argument(
+    "--no_cache", action="store_true", help="Ignore cache_dir from the config file"
+)
+parser.add_argument(
+    "--record",
+    default=None,
+    help="Save every Canvas response to this cassette file (see canvas_replay.py)",
+)
+parser.add_argument(
+    "--no_files",
+    action="store_true",
+    help="Leave links to Canvas files in the questions instead of downloading them",
+)
+parser.add_argument(
+    "--stream",
+    action="store_true",
+    help="Write questions as they arrive instead of fetching whole quizzes first",
+)
+parser.add_argument(
+    "--all_quizzes",
+    action="store_true",
+    help="Migrate every quiz of the courses in the config file instead of the listed quiz ids",
+)
+parser.add_argument(
+    "--quiz_title",
+    default=None,
+    help="With --all_quizzes, only the quizzes whose title matches this regular expression",
+)
+parser.add_argument(
+    "--updated_since",
+    default=None,
+    help="With --all_quizzes, only the quizzes updated since this date (YYYY-MM-DD)",
+)
+parser.add_argument(
+    "--no_dedupe",
+    action="store_true",
+    help="Write a separate folder for every quiz using a question from a shared question bank",
+)
+parser.add_argument(
+    "--batch_new_quizzes",
+    action="store_true",
+    help="List the items of all New Quizzes of a course first, then fetch the item banks they draw from together",
+)
+parser.add_argument(
+    "--workers",
+    type=int,
+    default=1,
+    help="Render questions in N processes",
+)
+parser.add_argument(
+    "--writers", type=int, default=4, help="Number of threads writing question files"
+)
+parser.add_argument(
+    "--queue_depth",
+    type=int,
+    default=100,
+    help="Questions each stage may hold before the previous one waits",
+)
+parser.add_argument(
+    "--render_queue_depth",
+    type=int,
+    default=None,
+    help="Questions waiting to be rendered (default: --queue_depth)",
+)
+parser.add_argument(
+    "--write_queue_depth",
+    type=int,
+    default=None,
+    help="Questions waiting to be written (default: --queue_depth)",
+)
+parser.add_argument(
+    "--variant_pool",
+    type=int,
+    default=0,
+    help="Add N NumPy-generated variants to the Canvas ones of each calculated question",
+)
+parser.add_argument(
+    "--snapshot",
+    default=None,
+    help="Also save the fetched courses, quizzes and questions to this .jsonl.gz file",
+)
+parser.add_argument(
+    "--from_snapshot",
+    default=None,
+    help="Generate the questions from a --snapshot file instead of Canvas. Links to Canvas files not saved in the snapshot (or downloaded by an earlier run) are left as they are, with a warning",
+)
+parser.add_argument(
+    "--from_qti",
+    default=None,
+    help="Generate the questions from a Canvas course or quiz export (.imscc/.zip) instead of the API",
+)
 args = parser.parse_args()
-canvas = canvas.Canvas(args=args, debug=args.debug)
+if args.http2:
+    try:
+        import h2  # noqa: F401
+    except ImportError:
+        parser.error("--http2 needs the h2 package: pip install httpx[http2]")
+if args.workers > 1 and "fork" not in multiprocessing.get_all_start_methods():
+    parser.error("--workers needs a platform with fork()")
+if args.stream and args.concurrency > 1:
+    parser.error("--stream cannot be combined with --concurrency")
+if (args.quiz_title or args.updated_since) and not args.all_quizzes:
+    parser.error("--quiz_title and --updated_since need --all_quizzes")
+if args.stream and args.batch_new_quizzes:
+    parser.error("--stream cannot be combined with --batch_new_quizzes")
+if args.from_snapshot and args.from_qti:
+    parser.error("--from_snapshot and --from_qti cannot be combined")
+if (args.from_snapshot or args.from_qti) and args.record:
+    parser.error("--from_snapshot/--from_qti do not talk to Canvas, so there is nothing to --record")
 
 if not os.path.exists(os.path.join(args.pl_repo, "infoCourse.json")):
     raise Exception("Provided directory is not a PrairieLearn repository")
 
-with open(args.config_file) as f:
-    config_data = json.load(f)
-
-course_dict = config_data["course_id"]
-for course_id in course_dict.keys():
-    print("Reading data from Canvas...")
-    course = canvas.course(course_id, prompt_if_needed=True)
-    print("Using course: %s / %s" % (course["term"]["name"], course["course_code"]))
-
-    questions_dir = os.path.join(args.pl_repo, "questions", args.question_folder)
-    if not os.path.isdir(questions_dir):
-        os.makedirs(questions_dir)
-
-    quiz_id_list = course_dict[course_id]
-    for quiz_id in quiz_id_list:
-        quiz = course.quiz(quiz_id)
-        print("Using quiz: {} {}".format(quiz_id, quiz["title"]))
-
-        # Reading questions
-        print("Retrieving quiz questions from Canvas...")
-        (questions, groups) = quiz.questions()
-
-        question_title = file_name_only(quiz["title"])
+if args.from_snapshot or args.from_qti:
+    # everything comes from the file, without any Canvas request
+    canvas = None
+else:
+    canvas = canvas.Canvas(args=args, debug=args.debug)
+
+    with open(args.config_file) as f:
+        config_data = json.load(f)
+
+    course_dict = config_data["course_id"]
+    if args.record:
+        from canvas_replay import Cassette
+
+        canvas.session.recorder = Cassette(canvas.api_url, course_dict)
+
+
+def fetch_quizzes():
+    """Yield (course, quiz, iterable of questions, groups) one quiz at a time"""
+    for course_id in course_dict.keys():
+        print("Reading data from Canvas...")
+        course = canvas.course(course_id, prompt_if_needed=True)
+        print("Using course: %s / %s" % (course["term"]["name"], course["course_code"]))
+
+        quiz_id_list = course_dict[course_id]
+        if args.all_quizzes:
+            quiz_id_list = course.quiz_ids(args.quiz_title, args.updated_since)
+            print("Found {} quizzes to migrate".format(len(quiz_id_list)))
+        quizzes = (course.quiz(quiz_id) for quiz_id in quiz_id_list)
+        prefetched = {}
+        if args.batch_new_quizzes:
+            quizzes = list(quizzes)
+            new_quizzes = [quiz for quiz in quizzes if quiz.kind == "new"]
+            print("Retrieving the items of {} New Quizzes from Canvas...".format(len(new_quizzes)))
+            prefetched = dict(
+                zip(
+                    (quiz.id for quiz in new_quizzes),
+                    course.new_quiz_questions(new_quizzes),
+                )
+            )
+        for quiz_id, quiz in zip(quiz_id_list, quizzes):
+            print("Using quiz: {} {}".format(quiz_id, quiz["title"]))
+
+            # Reading questions
+            print("Retrieving quiz questions from Canvas...")
+            if args.stream:
+                # questions are parsed one at a time, in the order Canvas returns them
+                yield course, quiz, quiz.iter_questions(stream=True), None
+            elif quiz.id in prefetched:
+                (questions, groups) = prefetched.pop(quiz.id)
+                yield course, quiz, questions.values(), groups
+            else:
+                (questions, groups) = quiz.questions()
+                yield course, quiz, questions.values(), groups
+
+
+if args.from_snapshot:
+    print(f"Reading data from {args.from_snapshot}...")
+    fetched_quizzes = read_snapshot(args.from_snapshot)
+elif args.from_qti:
+    print(f"Reading data from {args.from_qti}...")
+    qti_export = QtiExport(args.from_qti, args.pl_repo)
+    fetched_quizzes = qti_export.quizzes()
+elif args.concurrency > 1:
+    import async_canvas
+
+    print("Reading data from Canvas ({} requests at a time)...".format(args.concurrency))
+    fetched_quizzes = asyncio.run(
+        async_canvas.fetch_all(
+            canvas.token,
+            canvas.api_url,
+            course_dict,
+            args.concurrency,
+            args.debug,
+            stats=canvas.session.stats,
+            cache=canvas.session.cache,
+            recorder=canvas.session.recorder,
+            select=(args.quiz_title, args.updated_since) if args.all_quizzes else None,
+        )
+    )
+    fetched_quizzes = [
+        (course, quiz, questions.values(), groups)
+        for course, quiz, questions, groups in fetched_quizzes
+    ]
+else:
+    fetched_quizzes = fetch_quizzes()
+snapshot = None
+if args.snapshot:
+    if canvas is not None:
+        snapshot = SnapshotWriter(args.snapshot, urlparse(canvas.api_url).netloc)
+    elif args.from_snapshot:
+        snapshot = SnapshotWriter(args.snapshot, snapshot_host(args.from_snapshot))
+    else:
+        snapshot = SnapshotWriter(args.snapshot)
+    fetched_quizzes = snapshot.tee(fetched_quizzes)
+
+questions_dir = os.path.join(args.pl_repo, "questions", args.question_folder)
+if not os.path.isdir(questions_dir):
+    os.makedirs(questions_dir)
+
+manifest = Manifest(args.pl_repo)
+folder_names = FolderNames()
+files = None
+if args.from_snapshot and not args.no_files:
+    files = CanvasFiles(
+        None, args.pl_repo, manifest.files, snapshot_host(args.from_snapshot)
+    )
+    for file_id, name, content in snapshot_files(args.from_snapshot):
+        files.add(file_id, name, content)
+elif not args.no_files:
+    files = CanvasFiles(canvas, args.pl_repo, manifest.files)
+render_pool = None
+if args.workers > 1:
+    render_pool = ProcessPoolExecutor(
+        args.workers, mp_context=multiprocessing.get_context("fork")
+    )
+    # with fork, every worker is started by the first task: do it now, as
+    # forking once the pipeline threads hold locks can deadlock the workers
+    render_pool.submit(int).result()
+
+
+def fetched_questions():
+    """Yield (course, quiz, position, question) for every question,
+    (course, quiz, None, None) after the last question of each quiz, and
+    (None, None, None, None) at the end"""
+    for course, quiz, questions, groups in fetched_quizzes:
+        if args.concurrency > 1 or args.from_snapshot or args.from_qti:
+            print("Using course: %s / %s" % (course["term"]["name"], course["course_code"]))
+            print("Using quiz: {} {}".format(quiz["id"], quiz["title"]))
 
         # can remove pl_quiz later
         # assessment_type = (
@@ -75,301 +318,242 @@ for course_id in course_dict.keys():
         # if quiz["time_limit"]:
         #     pl_quiz["allowAccess"][0]["timeLimitMin"] = quiz["time_limit"]
 
-        count = 1
-        for question in questions.values():
-            print(f'Handling question {question["id"]}...')
-            print(question["question_text"])
-            print()
+        for position, question in enumerate(questions, 1):
+            yield course, quiz, position, question
+        yield course, quiz, None, None
+    yield None, None, None, None
+
 
+# quiz -> number of questions sent to the render stage
+allocated = {}
+allocator = QuestionAllocator(manifest, folder_names, questions_dir)
+
+
+def shared_key(question):
+    """Copies of a question bank question in several quizzes have the same key"""
+    if args.no_dedupe or question.assessment_question_id is None:
+        return None
+    return (question.assessment_question_id, question.content_digest())
+
+
+def allocate_question(item):
+    """Fetch stage: pick the folder and uuid of a question"""
+    (course, quiz, position, question) = item
+    if course is None:
+        # after the last quiz, see fetched_questions
+        quiz_key = None
+        jobs = allocator.finish()
+    elif question is None:
+        quiz_key = (course["id"], quiz["id"])
+        jobs = []
+    else:
+        quiz_key = (course["id"], quiz["id"])
+        jobs = allocator.place(
+            Manifest.key(course["id"], quiz["id"], question.id),
+            question,
             # automatically set titles, as title will be changed later
-            question_title = "{}-Q{}-{}".format(
+            "{}-Q{}-{}".format(
                 file_name_only(quiz["title"]),
-                count,
-                file_name_only(question["question_name"])
+                position,
+                file_name_only(question.name)
+            ),
+            question.updated_at or quiz.data.get("updated_at"),
+            shared_key(question),
+        )
+
+    # question_alt = {
+    #     "id": file_name_only(quiz["title"]) + "/" + question_title,
+    #     "points": question.points,
+    # }
+    # if question.group_id:
+    #     group = groups[question.group_id]
+    #     if "_pl_alt" not in group:
+    #         group["_pl_alt"] = {
+    #             "numberChoose": group["pick_count"],
+    #             "points": group["question_points"],
+    #             "alternatives": [],
+    #         }
+    #         # pl_quiz["zones"][0]["questions"].append(group["_pl_alt"])
+    #     group["_pl_alt"]["alternatives"].append(question_alt)
+    # else:
+    #     pl_quiz["zones"][0]["questions"].append(question_alt)
+
+    # a job may be decided while a later quiz is fetched, it then counts
+    # towards that quiz
+    for job in jobs:
+        allocated[quiz_key] = allocated.get(quiz_key, 0) + 1
+        job["quiz"] = quiz_key
+        yield job
+    if question is None:
+        yield {"quiz": quiz_key, "expected": allocated.pop(quiz_key, 0)}
+
+
+# (folder, warning) of the questions to check by hand, listed again after the run
+render_warnings = []
+
+
+def render(job):
+    """Render stage: turn a question into the contents of its files.
+
+    With --workers the question is only handed to the process pool, and the
+    write stage waits for the result, so the questions rendering at the same
+    time are bounded by the write queue instead of by render threads.
+    """
+    if "question" in job:
+        if render_pool is None:
+            job["rendered"] = render_question(
+                job["question"], job["uuid"], args.variant_pool
+            )
+        else:
+            job["rendered"] = render_pool.submit(
+                render_question, job["question"], job["uuid"], args.variant_pool
+            )
+    return [job]
+
+
+# quiz -> [questions expected or None, question dirs written]
+quiz_progress = {}
+progress_lock = threading.Lock()
+finish_lock = threading.Lock()
+
+
+# written for some question types only, so left over when a question changes type
+OPTIONAL_FILES = ["server.py", VARIANTS_FILE]
+
+
+def write(job):
+    """Write stage: save the files, then finish the quiz once all are written"""
+    if "rendered" in job:
+        if render_pool is None:
+            (job["files"], warnings) = job["rendered"]
+        else:
+            (job["files"], warnings) = job["rendered"].result()
+        for warning in warnings:
+            print(f'[Warning] {job["folder"]}: {warning}')
+            render_warnings.append((job["folder"], warning))
+        for name, contents in job["files"].items():
+            with open(os.path.join(job["dir"], name), "w") as f:
+                f.write(contents)
+        for name in OPTIONAL_FILES:
+            path = os.path.join(job["dir"], name)
+            if name not in job["files"] and os.path.exists(path):
+                os.remove(path)
+        manifest.record(
+            job["manifest_key"], job["folder"], job["hash"], job["uuid"], job["updated_at"]
+        )
+    with progress_lock:
+        progress = quiz_progress.setdefault(job["quiz"], [None, []])
+        if "expected" in job:
+            progress[0] = job["expected"]
+        else:
+            progress[1].append(job["dir"])
+        if progress[0] is None or len(progress[1]) < progress[0]:
+            return
+        del quiz_progress[job["quiz"]]
+    with finish_lock:
+        if files is not None:
+            files.localize(progress[1])
+        manifest.save()
+
+
+pipeline = Pipeline(
+    Stage("fetch", allocate_question),
+    Stage(
+        "render",
+        render,
+        queue_depth=args.render_queue_depth or args.queue_depth,
+    ),
+    Stage(
+        "write",
+        write,
+        threads=args.writers,
+        queue_depth=args.write_queue_depth or args.queue_depth,
+    ),
+)
+# folders shared before this run, some copies may move out of them
+was_shared = manifest.shared_folders()
+pipeline.run(fetched_questions())
+if render_pool is not None:
+    render_pool.shutdown()
+
+# list the Canvas questions sharing a folder in its info.json
+shared = manifest.shared_folders()
+for folder in set(shared) | set(was_shared):
+    info_path = os.path.join(questions_dir, folder, "info.json")
+    if not os.path.exists(info_path):
+        continue
+    with open(info_path) as f:
+        info = json.load(f)
+    comment = {"canvas_questions": shared[folder]} if folder in shared else None
+    if info.get("comment") != comment:
+        if comment is None:
+            info.pop("comment", None)
+        else:
+            info["comment"] = comment
+        with open(info_path, "w") as f:
+            json.dump(info, f, indent=4)
+
+if snapshot is not None:
+    if files is not None:
+        snapshot.add_files(files)
+    snapshot.close()
+    print(
+        "Saved {} quizzes, {} questions, {} files to {}".format(
+            snapshot.quizzes, snapshot.questions, snapshot.files, args.snapshot
+        )
+    )
+if args.from_qti:
+    qti_export.close()
+    print(
+        "Canvas files: {} extracted to clientFilesCourse/canvas, {} missing from the export".format(
+            len(qti_export.files), len(qti_export.missing_files)
+        )
+    )
+if files is not None and (files.downloaded or files.failed):
+    print(
+        "Canvas files: {} downloaded to clientFilesCourse/canvas, {} failed".format(
+            files.downloaded, files.failed
+        )
+    )
+if args.record:
+    canvas.session.recorder.save(args.record)
+    print(f"Recorded Canvas responses to {args.record}")
+
+if render_warnings:
+    print(f"{len(render_warnings)} questions need to be checked by hand:")
+    for folder, warning in sorted(render_warnings):
+        print(f"  {folder}: {warning}")
+print(
+    "Questions: {} new, {} updated, {} unchanged, {} duplicates of shared bank questions collapsed".format(
+        manifest.counts["new"],
+        manifest.counts["updated"],
+        manifest.counts["unchanged"],
+        manifest.counts["shared"],
+    )
+)
+for stage in pipeline.summary():
+    print(
+        "Stage {stage}: {items} items, {items_per_second:.1f}/s, "
+        "busy {busy_seconds:.1f}s, idle {idle_seconds:.1f}s ({threads} threads)".format(
+            **stage
+        )
+    )
+if canvas is not None:
+    stats = canvas.connection_stats()
+    print(
+        "Canvas requests: {} ({} connections opened, {} reused)".format(
+            stats["requests"], stats["connections_opened"], stats["connections_reused"]
+        )
+    )
+    if stats["retries"] or stats["throttled_seconds"]:
+        print(
+            "Throttled by Canvas for {:.1f}s ({} retries)".format(
+                stats["throttled_seconds"], stats["retries"]
+            )
+        )
+    if "cache_hits" in stats:
+        print(
+            "Response cache: {} not modified, {} downloaded".format(
+                stats["cache_hits"], stats["cache_misses"]
             )
-            count += 1
-            suffix = 0
-            while os.path.exists(os.path.join(questions_dir, question_title)):
-                suffix += 1
-                question_title = f"{question_title}_{suffix}"
-            question_dir = os.path.join(questions_dir, question_title)
-            os.makedirs(question_dir)
-
-            # question_alt = {
-            #     "id": file_name_only(quiz["title"]) + "/" + question_title,
-            #     "points": question["points_possible"],
-            # }
-            # if question["quiz_group_id"]:
-            #     group = groups[question["quiz_group_id"]]
-            #     if "_pl_alt" not in group:
-            #         group["_pl_alt"] = {
-            #             "numberChoose": group["pick_count"],
-            #             "points": group["question_points"],
-            #             "alternatives": [],
-            #         }
-            #         # pl_quiz["zones"][0]["questions"].append(group["_pl_alt"])
-            #     group["_pl_alt"]["alternatives"].append(question_alt)
-            # else:
-            #     pl_quiz["zones"][0]["questions"].append(question_alt)
-
-            with open(os.path.join(question_dir, "info.json"), "w") as info:
-                obj = {
-                    "uuid": str(uuid.uuid4()),
-                    "type": "v3",
-                    "title": question["question_name"] if question["question_name"] is not None else "Unnamed Question",
-                    "topic": "None",
-                    "tags": ["fromcanvas"],
-                }
-                if question["question_type"] in [
-                    "text_only_question",
-                    "essay_question",
-                    "essay",
-                ]:
-                    obj["gradingMethod"] = "Manual"
-                json.dump(obj, info, indent=4)
-
-            with open(os.path.join(question_dir, "question.html"), "w") as template:
-                if question["question_type"] == "calculated_question":
-                    for variable in question["variables"]:
-                        question["question_text"] = question["question_text"].replace(
-                            f'[{variable["name"]}]',
-                            "{{params." + variable["name"] + "}}",
-                        )
-
-                if (
-                    question["question_type"] != "fill_in_multiple_blanks_question"
-                    and question["question_type"] != "multiple_dropdowns_question"
-                ):
-                    template.write("<pl-question-panel>\n<p>\n")
-                    template.write(question["question_text"] + "\n")
-                    template.write("</p>\n</pl-question-panel>\n")
-
-                if question["question_type"] == "text_only_question":
-                    pass
-
-                elif question["question_type"] in ["essay_question", "essay"]:
-                    template.write(
-                        '<pl-rich-text-editor file-name="answer.html"></pl-rich-text-editor>\n'
-                    )
-
-                elif question["question_type"] == "multiple_answers_question":
-                    template.write('<pl-checkbox answers-name="checkbox">\n')
-                    for answer in question["answers"]:
-                        if answer["weight"]:
-                            template.write('  <pl-answer correct="true">')
-                        else:
-                            template.write("  <pl-answer>")
-                        template.write(answer["text"] + "</pl-answer>\n")
-                    template.write("</pl-checkbox>\n")
-
-                elif (
-                    question["question_type"] == "true_false_question"
-                    or question["question_type"] == "multiple_choice_question"
-                ):
-                    template.write('<pl-multiple-choice answers-name="mc">\n')
-                    for answer in question["answers"]:
-                        if answer["weight"]:
-                            template.write('  <pl-answer correct="true">')
-                        else:
-                            template.write("  <pl-answer>")
-                        template.write(answer["text"] + "</pl-answer>\n")
-                    template.write("</pl-multiple-choice>\n")
-
-                elif question["question_type"] == "numerical_question":
-                    answer = question["answers"][0]
-                    if (
-                        answer["numerical_answer_type"] == "exact_answer"
-                        and abs(answer["exact"] - int(answer["exact"])) < 0.001
-                        and answer["margin"] == 0
-                    ):
-                        template.write(
-                            f'<pl-integer-input answers-name="value" correct-answer="{int(answer["exact"])}"></pl-integer-input>\n'
-                        )
-                    elif answer["numerical_answer_type"] == "exact_answer":
-                        template.write(
-                            f'<pl-number-input answers-name="value" correct-answer="{answer["exact"]}" atol="{answer["margin"]}"></pl-number-input>\n'
-                        )
-                    elif answer["numerical_answer_type"] == "range_answer":
-                        average = (answer["end"] + answer["start"]) / 2
-                        margin = abs(answer["end"] - average)
-                        template.write(
-                            f'<pl-number-input answers-name="value" correct-answer="{average}" atol="{margin}"></pl-number-input>\n'
-                        )
-                    elif answer["numerical_answer_type"] == "precision_answer":
-                        template.write(
-                            f'<pl-number-input answers-name="value" correct-answer="{answer["approximate"]}" comparison="sigfig" digits="{answer["precision"]}"></pl-number-input>\n'
-                        )
-                    else:
-                        input(
-                            f'Invalid numerical answer type: {answer["numerical_answer_type"]}'
-                        )
-                        template.write(
-                            f'<pl-number-input answers-name="value"></pl-number-input>\n'
-                        )
-
-                elif question["question_type"] == "calculated_question":
-                    answers_name = (
-                        question["formulas"][-1]["formula"].split("=")[0].strip()
-                    )
-                    template.write(
-                        f'<pl-number-input answers-name="{answers_name}" comparison="decdig" digits="{question["formula_decimal_places"]}"></pl-number-input>\n'
-                    )
-
-                elif question["question_type"] == "short_answer_question":
-                    answer = question["answers"][0]
-                    template.write(
-                        f'<pl-string-input answers-name="input" correct-answer="{answer["text"]}"></pl-string-input>\n'
-                    )
-
-                elif question["question_type"] == "fill_in_multiple_blanks_question":
-                    question_text = question["question_text"]
-                    options = {}
-                    for answer in question["answers"]:
-                        if answer["blank_id"] not in options:
-                            options[answer["blank_id"]] = []
-                        options[answer["blank_id"]].append(answer)
-                    for answer_id, answers in options.items():
-                        question_text.replace(
-                            f"[{answer_id}]",
-                            f'<pl-string-input answers-name="{answer_id}" correct-answer="{answers[0]["text"]}" remove-spaces="true" ignore-case="true" display="inline"></pl-string-input>',
-                        )
-                    template.write(question_text + "\n")
-
-                elif question["question_type"] == "matching_question":
-                    template.write('<pl-matching answers-name="match">\n')
-                    for answer in question["answers"]:
-                        template.write(
-                            f'  <pl-statement match="m{answer["match_id"]}">{answer["text"]}</pl-statement>\n'
-                        )
-                    for match in question["matches"]:
-                        template.write(
-                            f'  <pl-option name="m{match["match_id"]}">{match["text"]}</pl-option>\n'
-                        )
-                    template.write("</pl-matching>\n")
-
-                elif question["question_type"] == "multiple_dropdowns_question":
-                    blanks = {}
-                    for answer in question["answers"]:
-                        if answer["blank_id"] not in blanks:
-                            blanks[answer["blank_id"]] = []
-                        blanks[answer["blank_id"]].append(answer)
-                    question_text = question["question_text"]
-                    for blank, answers in blanks.items():
-                        dropdown = f'<pl-dropdown answers-name="{blank}">\n'
-                        for answer in answers:
-                            dropdown += "  <pl-answer"
-                            if answer["weight"] > 0:
-                                dropdown += ' correct="true"'
-                            dropdown += f'>{answer["text"]}</pl-answer>\n'
-                        dropdown += "</pl-dropdown>"
-                        question_text = question_text.replace(f"[{blank}]", dropdown)
-                    template.write(question_text + "\n")
-
-                elif question["question_type"] == "matching":
-                    # new quiz format
-                    template.write('<pl-matching answers-name="match">\n')
-                    for choice in question["interaction_data"]["questions"]:
-                        match_body = question["entry"]["scoring_data"]["value"][choice["id"]]
-                        item_body = choice["item_body"]
-                        template.write(f'  <pl-statement match="{match_body}">{item_body}</pl-statement>\n')                
-                elif question["question_type"] == "choice":
-                    # new quiz format
-                    template.write('<pl-multiple-choice answers-name="mc">\n')
-                    for answer in question["interaction_data"]["choices"]:
-                        if answer["id"] in question["entry"]["scoring_data"]["value"]:
-                            template.write('  <pl-answer correct="true">')
-                        else:
-                            template.write("  <pl-answer>")
-                        template.write(answer["item_body"] + "</pl-answer>\n")
-                    template.write("</pl-multiple-choice>\n")
-
-                elif question["question_type"] == "true-false":
-                    # new quiz format
-                    template.write('<pl-multiple-choice answers-name="mc">\n')
-                    if question["entry"]["scoring_data"]["value"]:
-                        template.write('  <pl-answer correct="true"> True </pl-answer>\n')
-                        template.write('  <pl-answer> False </pl-answer>\n')
-                    else:
-                        template.write('  <pl-answer> True </pl-answer>\n')
-                        template.write('  <pl-answer correct="true"> False </pl-answer>\n')
-                    template.write("</pl-multiple-choice>\n")
-
-                elif question["question_type"] == "multi-answer":
-                    # new quiz format
-                    template.write('<pl-checkbox answers-name="checkbox">\n')
-                    for answer in question["interaction_data"]["choices"]:
-                        if answer["id"] in question["entry"]["scoring_data"]["value"]:
-                            template.write('  <pl-answer correct="true">')
-                        else:
-                            template.write("  <pl-answer>")
-                        template.write(answer["item_body"] + "</pl-answer>\n")
-                    template.write("</pl-checkbox>\n")
-
-                elif question["question_type"] == "rich-fill-blank":
-                    # new quiz format
-                    question_text = question["question_text"]
-                    options = {}
-                    for answer in question["entry"]["scoring_data"]["value"]:
-                        if answer["id"] not in options:
-                            options[answer["id"]] = answer["scoring_data"]["value"]
-                    for answer_id, answers in options.items():
-                        question_text = question_text.replace(
-                            f'<span id="blank_{answer_id}"></span>',
-                            f'<pl-string-input answers-name="{answer_id}" correct-answer="{answers}" remove-spaces="true" ignore-case="true" display="inline"></pl-string-input>',
-                        )
-                    template.write(question_text + "\n")
-
-                # elif question["question_type"] == "ordering":
-                #     # TODO: ordering
-                #     print('')
-                #     template.write('<pl-order-blocks answers-name="order-numbers">\n')
-                #     for answer in question["interaction_data"]["choices"]:
-                #         if answer["id"] in question["entry"]["scoring_data"]["value"]:
-                #             template.write('  <pl-answer correct="true">')
-                #         else:
-                #             template.write("  <pl-answer>")
-                #         template.write(answer["item_body"] + "</pl-answer>\n")
-                #     template.write("</pl-order-blocks>\n")
-
-                else:
-                    input("Unsupported question type: " + question["question_type"])
-                    template.write(json.dumps(question, indent=4))
-
-                if "correct_comments" in question.keys():
-                    # only for old quiz
-                    if question["correct_comments"] or question["neutral_comments"]:
-                        template.write("<pl-answer-panel>\n<p>\n")
-                        if question.get("correct_comments_html", False):
-                            template.write(question["correct_comments_html"] + "\n")
-                        elif question["correct_comments"]:
-                            template.write(question["correct_comments"] + "\n")
-                        if question.get("neutral_comments_html", False):
-                            template.write(question["neutral_comments_html"] + "\n")
-                        elif question["neutral_comments"]:
-                            template.write(question["neutral_comments"] + "\n")
-                        template.write("</p>\n</pl-answer-panel>\n")
-
-            if question["question_type"] == "calculated_question":
-                with open(os.path.join(question_dir, "server.py"), "w") as script:
-                    script.write("import random\n\n")
-                    script.write("def generate(data):\n")
-                    for variable in question["variables"]:
-                        if not variable.get("scale", False):
-                            script.write(
-                                f'    {variable["name"]} = random.randint({int(variable["min"])}, {int(variable["max"])})\n'
-                            )
-                        else:
-                            multip = 10 ** variable["scale"]
-                            script.write(
-                                f'    {variable["name"]} = random.randint({int(variable["min"] * multip)}, {int(variable["max"] * multip)}) / {multip}\n'
-                            )
-                    for formula in question["formulas"]:
-                        script.write(f'    {formula["formula"]}\n')
-                    for variable in question["variables"]:
-                        script.write(
-                            f'    data["params"]["{variable["name"]}"] = {variable["name"]}\n'
-                        )
-                    answer = question["formulas"][-1]["formula"].split("=")[0].strip()
-                    script.write(
-                        f'    data["correct_answers"]["{answer}"] = {answer}\n'
-                    )
+        )
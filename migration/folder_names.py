@@ -0,0 +1,38 @@
+import os
+import threading
+
+
+class FolderNames:
+    """Hands out unique question folder names, adding `_1`, `_2`, ... on collisions.
+
+    Each directory is listed once, the first time a name is asked for in it;
+    after that, names are checked against the in-memory set instead of
+    stat-ing one candidate at a time. Safe to share between threads.
+    """
+
+    def __init__(self):
+        # directory -> casefolded names taken in it (case-insensitive, since
+        # `Foo` and `foo` are the same folder on macOS and Windows)
+        self.taken = {}
+        # (directory, name) -> last suffix handed out for name
+        self.suffixes = {}
+        self._lock = threading.Lock()
+
+    def _taken(self, directory):
+        if directory not in self.taken:
+            names = os.listdir(directory) if os.path.isdir(directory) else []
+            self.taken[directory] = {name.casefold() for name in names}
+        return self.taken[directory]
+
+    def allocate(self, directory, name):
+        """A name in `directory` that no other folder has or will be given"""
+        with self._lock:
+            taken = self._taken(directory)
+            candidate = name
+            suffix = self.suffixes.get((directory, name), 0)
+            while candidate.casefold() in taken:
+                suffix += 1
+                candidate = f"{name}_{suffix}"
+            self.suffixes[(directory, name)] = suffix
+            taken.add(candidate.casefold())
+            return candidate
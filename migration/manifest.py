@@ -0,0 +1,77 @@
+import os
+import json
+import hashlib
+import threading
+
+
+MANIFEST_FILE = "canvas_manifest.json"
+
+
+def content_hash(question):
+    """Stable hash of a question as returned by Quiz.questions/NewQuiz.questions"""
+    return hashlib.sha256(
+        json.dumps(question, sort_keys=True, default=str).encode("utf-8")
+    ).hexdigest()
+
+
+class Manifest:
+    """Maps Canvas course/quiz/question ids to the PL question folders made from them.
+
+    Stored as `canvas_manifest.json` at the root of the PL repo, so a re-run
+    of create_quiz_bank.py can skip unchanged questions and update changed
+    ones in place instead of creating `_1`, `_2` copies.
+    """
+
+    def __init__(self, pl_repo):
+        self.path = os.path.join(pl_repo, MANIFEST_FILE)
+        self.questions = {}
+        # Canvas file id -> name in clientFilesCourse/canvas, see canvas_files.py
+        self.files = {}
+        if os.path.exists(self.path):
+            with open(self.path) as f:
+                data = json.load(f)
+            self.questions = data["questions"]
+            self.files = data.get("files", {})
+        self.counts = {"new": 0, "updated": 0, "unchanged": 0, "shared": 0}
+        # record() and save() are called from the writer threads
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def key(course_id, quiz_id, question_id):
+        return f"{course_id}/{quiz_id}/{question_id}"
+
+    def get(self, key, questions_dir):
+        """The manifest entry for `key`, if its folder still exists"""
+        entry = self.questions.get(key)
+        if entry and os.path.isdir(os.path.join(questions_dir, entry["folder"])):
+            return entry
+        return None
+
+    def record(self, key, folder, digest, question_uuid, updated_at=None):
+        with self._lock:
+            self.questions[key] = {
+                "folder": folder,
+                "hash": digest,
+                "uuid": question_uuid,
+                "updated_at": updated_at,
+            }
+
+    def shared_folders(self):
+        """folder -> keys of the Canvas questions written to it, for folders shared by several"""
+        with self._lock:
+            keys = {}
+            for key, entry in self.questions.items():
+                keys.setdefault(entry["folder"], []).append(key)
+        # sorted, as the keys are recorded in the order the writer threads finish
+        return {folder: sorted(keys) for folder, keys in keys.items() if len(keys) > 1}
+
+    def save(self):
+        """Write the manifest atomically"""
+        tmp_path = self.path + ".tmp"
+        with self._lock, open(tmp_path, "w") as f:
+            json.dump(
+                {"version": 1, "questions": self.questions, "files": self.files},
+                f,
+                indent=2,
+            )
+        os.replace(tmp_path, self.path)
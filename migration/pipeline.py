@@ -0,0 +1,159 @@
+import time
+import queue
+import threading
+
+
+# put on a stage's input queue once its upstream has finished
+_DONE = object()
+
+
+class Stage:
+    """A pool of threads applying `func` to the items on a bounded queue.
+
+    `func(item)` returns an iterable (a list, a generator or None) of items for
+    the next stage. Time spent in `func`, including producing each result of a
+    generator, is busy time; time spent waiting for input or for room on the
+    next stage's queue is idle time.
+    """
+
+    def __init__(self, name, func, threads=1, queue_depth=100):
+        self.name = name
+        self.func = func
+        self.threads = threads
+        self.input = queue.Queue(queue_depth)
+        self.output = None
+        self.pipeline = None
+        self.items = 0
+        self.busy = 0.0
+        self.idle = 0.0
+        self.elapsed = 0.0
+        self.started = None
+        self._running = 0
+        self._lock = threading.Lock()
+
+    def _add(self, busy=0.0, idle=0.0, items=0):
+        with self._lock:
+            self.busy += busy
+            self.idle += idle
+            self.items += items
+
+    def _from_queue(self):
+        while not self.pipeline.error:
+            start = time.perf_counter()
+            item = self.input.get()
+            self._add(idle=time.perf_counter() - start)
+            if item is _DONE:
+                # leave it for the other threads of this stage
+                self.input.put(_DONE)
+                return
+            yield item
+        # an error elsewhere: keep the upstream stages from blocking
+        while True:
+            item = self.input.get()
+            if item is _DONE:
+                self.input.put(_DONE)
+                return
+
+    def _from_source(self, source):
+        while not self.pipeline.error:
+            start = time.perf_counter()
+            try:
+                item = next(source)
+            except StopIteration:
+                return
+            finally:
+                self._add(busy=time.perf_counter() - start)
+            yield item
+
+    def _put(self, item):
+        start = time.perf_counter()
+        self.output.input.put(item)
+        self._add(idle=time.perf_counter() - start)
+
+    def _work(self, items):
+        try:
+            for item in items:
+                results = iter(self.func(item) or ())
+                while True:
+                    start = time.perf_counter()
+                    try:
+                        result = next(results)
+                    except StopIteration:
+                        break
+                    finally:
+                        self._add(busy=time.perf_counter() - start)
+                    if self.output is not None:
+                        self._put(result)
+                self._add(items=1)
+        except BaseException as e:
+            self.pipeline.fail(e)
+            # drain the queue so upstream stages can finish
+            for _ in items:
+                pass
+        finally:
+            with self._lock:
+                self._running -= 1
+                last = self._running == 0
+            if last:
+                self.elapsed = time.perf_counter() - self.started
+                if self.output is not None:
+                    self.output.input.put(_DONE)
+
+    def start(self, source=None):
+        self.started = time.perf_counter()
+        self._running = self.threads
+        for _ in range(self.threads):
+            if source is not None:
+                items = self._from_source(source)
+            else:
+                items = self._from_queue()
+            thread = threading.Thread(target=self._work, args=(items,), daemon=True)
+            thread.start()
+            yield thread
+
+    def summary(self):
+        return {
+            "stage": self.name,
+            "threads": self.threads,
+            "items": self.items,
+            "items_per_second": self.items / self.elapsed if self.elapsed else 0.0,
+            "busy_seconds": self.busy,
+            "idle_seconds": self.idle,
+        }
+
+
+class Pipeline:
+    """Stages connected by bounded queues, so a slow stage holds back the
+    ones before it instead of letting the queues grow without limit.
+
+    The first stage reads from the iterable given to `run`, with one thread
+    (generators cannot be shared between threads).
+    """
+
+    def __init__(self, *stages):
+        self.stages = stages
+        self.error = None
+        self._lock = threading.Lock()
+        for stage, next_stage in zip(stages, stages[1:]):
+            stage.output = next_stage
+        for stage in stages:
+            stage.pipeline = self
+        stages[0].threads = 1
+
+    def fail(self, error):
+        with self._lock:
+            if self.error is None:
+                self.error = error
+
+    def run(self, source):
+        """Push every item of `source` through the stages and wait for them"""
+        threads = list(self.stages[0].start(iter(source)))
+        for stage in self.stages[1:]:
+            threads.extend(stage.start())
+        for thread in threads:
+            thread.join()
+        if self.error is not None:
+            raise self.error
+
+    def summary(self):
+        return [stage.summary() for stage in self.stages]
@@ -0,0 +1,474 @@
+import os
+import re
+import hashlib
+import zipfile
+import posixpath
+from urllib.parse import unquote
+import xml.etree.ElementTree as ET
+from canvas import order_quiz_questions
+from canvas_files import FILES_FOLDER
+
+
+# `$IMS-CC-FILEBASE$/Uploaded Media/cat.png`, url-encoded or not
+FILEBASE_REFERENCE = re.compile(
+    r"(?:\$|%24)IMS(?:-|_)CC(?:-|_)FILEBASE(?:\$|%24)/([^\"'?#<>\s]+)"
+)
+FILES_ROOT = "web_resources"
+CHOICE_QUESTION_TYPES = [
+    "multiple_choice_question",
+    "true_false_question",
+    "multiple_answers_question",
+]
+BLANK_QUESTION_TYPES = [
+    "fill_in_multiple_blanks_question",
+    "multiple_dropdowns_question",
+]
+
+
+def local_name(tag):
+    """`{http://www.imsglobal.org/xsd/ims_qtiasiv1p2}item` -> `item`"""
+    return tag.rsplit("}", 1)[-1]
+
+
+def _iter(elem, name):
+    return (child for child in elem.iter() if local_name(child.tag) == name)
+
+
+def _find(elem, name):
+    return next(_iter(elem, name), None)
+
+
+def _child(elem, name):
+    return next((child for child in elem if local_name(child.tag) == name), None)
+
+
+def _text(elem, name, default=None):
+    found = _find(elem, name) if elem is not None else None
+    if found is None or found.text is None:
+        return default
+    return found.text.strip()
+
+
+def _material(elem):
+    """Text of the `material` directly under elem, and whether it is HTML"""
+    material = _child(elem, "material") if elem is not None else None
+    mattext = _find(material, "mattext") if material is not None else None
+    if mattext is None:
+        return "", False
+    return mattext.text or "", mattext.get("texttype") == "text/html"
+
+
+def _metadata(item):
+    return {
+        _text(field, "fieldlabel"): _text(field, "fieldentry")
+        for field in _iter(item, "qtimetadatafield")
+    }
+
+
+def _number(text):
+    value = float(text)
+    return int(value) if value.is_integer() else value
+
+
+def _scored_conditions(item):
+    """The conditionvars of the respconditions that give points"""
+    for condition in _iter(item, "respcondition"):
+        setvar = _find(condition, "setvar")
+        if setvar is None or setvar.get("varname", "SCORE") != "SCORE":
+            continue
+        if float(setvar.text or 0) > 0:
+            yield _find(condition, "conditionvar")
+
+
+def _positive(elem, name):
+    """Descendants called `name` that are not inside a <not>"""
+    for child in elem:
+        if local_name(child.tag) == "not":
+            continue
+        if local_name(child.tag) == name:
+            yield child
+        yield from _positive(child, name)
+
+
+def _correct_responses(item):
+    """respident -> the response idents (or texts) that give points"""
+    correct = {}
+    for conditionvar in _scored_conditions(item):
+        for varequal in _positive(conditionvar, "varequal"):
+            correct.setdefault(varequal.get("respident"), []).append(
+                (varequal.text or "").strip()
+            )
+    return correct
+
+
+def _labels(response):
+    for label in _iter(response, "response_label"):
+        text, is_html = _material(label)
+        yield label.get("ident"), text, is_html
+
+
+def _choice_answers(item, presentation):
+    correct = _correct_responses(item)
+    answers = []
+    for response in _iter(presentation, "response_lid"):
+        for ident, text, is_html in _labels(response):
+            answer = {
+                "id": ident,
+                "text": text,
+                "weight": 100 if ident in correct.get(response.get("ident"), []) else 0,
+            }
+            if is_html:
+                answer["html"] = text
+            answers.append(answer)
+    return answers
+
+
+def _blank_answers(item, presentation):
+    correct = _correct_responses(item)
+    answers = []
+    for response in _iter(presentation, "response_lid"):
+        (blank_id, _) = _material(response)
+        for ident, text, _ in _labels(response):
+            answers.append(
+                {
+                    "id": ident,
+                    "text": text,
+                    "blank_id": blank_id.strip(),
+                    "weight": 100 if ident in correct.get(response.get("ident"), []) else 0,
+                }
+            )
+    return answers
+
+
+def _matching_answers(item, presentation):
+    correct = _correct_responses(item)
+    answers = []
+    matches = {}
+    for response in _iter(presentation, "response_lid"):
+        (left, _) = _material(response)
+        for ident, text, _ in _labels(response):
+            matches[ident] = {"match_id": ident, "text": text}
+        match_ids = correct.get(response.get("ident"), [None])
+        answers.append(
+            {"id": response.get("ident"), "text": left, "match_id": match_ids[0]}
+        )
+    return answers, list(matches.values())
+
+
+def _numerical_answers(item):
+    answers = []
+    for conditionvar in _scored_conditions(item):
+        exact = _text(conditionvar, "varequal")
+        low = _text(conditionvar, "vargte") or _text(conditionvar, "vargt")
+        high = _text(conditionvar, "varlte") or _text(conditionvar, "varlt")
+        if exact is not None:
+            margin = round(abs(float(exact) - float(low)), 10) if low is not None else 0
+            answers.append(
+                {
+                    "numerical_answer_type": "exact_answer",
+                    "exact": _number(exact),
+                    "margin": _number(str(margin)),
+                    "weight": 100,
+                }
+            )
+        elif low is not None and high is not None:
+            answers.append(
+                {
+                    "numerical_answer_type": "range_answer",
+                    "start": _number(low),
+                    "end": _number(high),
+                    "weight": 100,
+                }
+            )
+    return answers
+
+
+def _calculated(item, question):
+    calculated = _find(item, "calculated")
+    if calculated is None:
+        return
+    formulas = _find(calculated, "formulas")
+    question["formula_decimal_places"] = int(formulas.get("decimal_places", 0))
+    question["formulas"] = [
+        {"formula": (formula.text or "").strip()} for formula in _iter(formulas, "formula")
+    ]
+    question["variables"] = [
+        {
+            "name": var.get("name"),
+            "scale": int(var.get("scale", 0)),
+            "min": _number(_text(var, "min")),
+            "max": _number(_text(var, "max")),
+        }
+        for var in _iter(_find(calculated, "vars"), "var")
+    ]
+    question["answer_tolerance"] = _number(_text(calculated, "answer_tolerance", "0"))
+    question["answers"] = [
+        {
+            "variables": [
+                {"name": var.get("name"), "value": _number(var.text)}
+                for var in _iter(var_set, "var")
+            ],
+            "answer": _number(_text(var_set, "answer")),
+            "weight": 100,
+        }
+        for var_set in _iter(calculated, "var_set")
+    ]
+
+
+def _feedback(item, question):
+    for feedback in _iter(item, "itemfeedback"):
+        name = {
+            "correct_fb": "correct_comments",
+            "general_incorrect_fb": "incorrect_comments",
+            "general_fb": "neutral_comments",
+        }.get(feedback.get("ident"))
+        if name is None:
+            continue
+        mattext = _find(feedback, "mattext")
+        if mattext is None:
+            continue
+        if mattext.get("texttype") == "text/html":
+            question[name + "_html"] = mattext.text or ""
+        question[name] = mattext.text or ""
+
+
+def item_question(item, group=None):
+    """A question record like the /questions listing of a quiz returns, from
+    one QTI <item>; order_quiz_questions sets its position"""
+    metadata = _metadata(item)
+    presentation = _find(item, "presentation")
+    (question_text, _) = _material(presentation)
+    question = {
+        "id": item.get("ident"),
+        "assessment_question_id": metadata.get("assessment_question_identifierref"),
+        "quiz_group_id": group["id"] if group else None,
+        "position": None,
+        "question_name": item.get("title"),
+        "question_type": metadata.get("question_type", "text_only_question"),
+        "question_text": question_text,
+        "points_possible": _number(metadata.get("points_possible") or "0"),
+        "correct_comments": "",
+        "incorrect_comments": "",
+        "neutral_comments": "",
+        "answers": [],
+    }
+    question_type = question["question_type"]
+    if question_type in CHOICE_QUESTION_TYPES:
+        question["answers"] = _choice_answers(item, presentation)
+    elif question_type in BLANK_QUESTION_TYPES:
+        question["answers"] = _blank_answers(item, presentation)
+    elif question_type == "matching_question":
+        (question["answers"], question["matches"]) = _matching_answers(
+            item, presentation
+        )
+    elif question_type == "short_answer_question":
+        question["answers"] = [
+            {"text": text, "weight": 100}
+            for texts in _correct_responses(item).values()
+            for text in texts
+        ]
+    elif question_type == "numerical_question":
+        question["answers"] = _numerical_answers(item)
+    elif question_type == "calculated_question":
+        _calculated(item, question)
+    _feedback(item, question)
+    return question
+
+
+class QtiRecord:
+    """A course or quiz read from an export, used like canvas.Course/Quiz"""
+
+    kind = "classic"
+
+    def __init__(self, data):
+        self.data = data
+        self.id = data["id"]
+
+    def __getitem__(self, index):
+        return self.data[index]
+
+
+class QtiExport:
+    """Reads classic quizzes from a Canvas course or quiz export (.imscc or QTI .zip).
+
+    Each assessment is parsed with iterparse and every <item> is dropped from
+    the tree once it has been turned into a question record, so memory use does
+    not grow with the size of the quiz XML. Files referenced through
+    `$IMS-CC-FILEBASE$` are copied straight from the zip into
+    clientFilesCourse/canvas/ (named by content hash, like canvas_files.py)
+    and the references rewritten. Close it (or use it in a `with` block)
+    once the quizzes have been read.
+    """
+
+    def __init__(self, path, pl_repo):
+        self.path = path
+        self.zip = zipfile.ZipFile(path)
+        self.directory = os.path.join(pl_repo, "clientFilesCourse", FILES_FOLDER)
+        # path inside the export -> stored name
+        self.files = {}
+        self.missing_files = set()
+        try:
+            self.course = QtiRecord(self._course_data())
+        except Exception:
+            self.zip.close()
+            raise
+
+    def close(self):
+        self.zip.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def _course_data(self):
+        title = os.path.splitext(os.path.basename(self.path))[0]
+        data = {
+            "id": title,
+            "name": title,
+            "course_code": title,
+            "term": {"name": "Canvas export"},
+        }
+        if "course_settings/course_settings.xml" in self.zip.namelist():
+            with self.zip.open("course_settings/course_settings.xml") as f:
+                settings = ET.parse(f).getroot()
+            data["id"] = settings.get("identifier", title)
+            data["name"] = _text(settings, "title", title)
+            data["course_code"] = _text(settings, "course_code", data["name"])
+        return data
+
+    def _assessment_files(self):
+        for name in self.zip.namelist():
+            if name.endswith(".xml.qti") or (
+                name.endswith(".xml")
+                and posixpath.basename(name) == posixpath.basename(posixpath.dirname(name)) + ".xml"
+            ):
+                yield name
+
+    def _extract(self, path):
+        """Copy one file out of the zip, returning its stored name"""
+        if path in self.files:
+            return self.files[path]
+        try:
+            info = self.zip.getinfo(f"{FILES_ROOT}/{path}")
+        except KeyError:
+            self.missing_files.add(path)
+            return None
+        digest = hashlib.sha256()
+        os.makedirs(self.directory, exist_ok=True)
+        tmp_path = os.path.join(self.directory, f".{os.getpid()}.tmp")
+        with self.zip.open(info) as source, open(tmp_path, "wb") as target:
+            for chunk in iter(lambda: source.read(1024 * 1024), b""):
+                digest.update(chunk)
+                target.write(chunk)
+        name = digest.hexdigest()[:20] + os.path.splitext(path)[1].lower()
+        os.replace(tmp_path, os.path.join(self.directory, name))
+        self.files[path] = name
+        return name
+
+    def rewrite(self, html):
+        """Point `$IMS-CC-FILEBASE$` references at the extracted files"""
+
+        def replace(match):
+            name = self._extract(unquote(match.group(1)))
+            if name is None:
+                return match.group(0)
+            return "{{options.client_files_course_url}}/" + f"{FILES_FOLDER}/{name}"
+
+        return FILEBASE_REFERENCE.sub(replace, html)
+
+    def _rewrite_question(self, question):
+        for key in [
+            "question_text",
+            "correct_comments",
+            "correct_comments_html",
+            "incorrect_comments",
+            "incorrect_comments_html",
+            "neutral_comments",
+            "neutral_comments_html",
+        ]:
+            if question.get(key):
+                question[key] = self.rewrite(question[key])
+        for answer in question["answers"]:
+            for key in ["text", "html"]:
+                if isinstance(answer.get(key), str):
+                    answer[key] = self.rewrite(answer[key])
+        return question
+
+    def _read_assessment(self, name):
+        """(quiz data, questions, groups) of one assessment file, or None for question banks"""
+        quiz = None
+        questions = []
+        groups = {}
+        # enclosing sections; the outermost one is Canvas' root_section
+        sections = []
+        parents = []
+        # items and groups seen directly in the root section, which give the
+        # position of each group like Canvas' quiz_groups listing does
+        slots = 0
+        with self.zip.open(name) as f:
+            for event, elem in ET.iterparse(f, events=("start", "end")):
+                tag = local_name(elem.tag)
+                if event == "start":
+                    if tag == "objectbank":
+                        return None
+                    if tag == "assessment":
+                        quiz = {"id": elem.get("ident"), "title": elem.get("title")}
+                    elif tag == "section":
+                        if len(sections) == 1:
+                            slots += 1
+                        sections.append(
+                            {
+                                "id": elem.get("ident"),
+                                "name": elem.get("title"),
+                                "pick_count": None,
+                                "question_points": None,
+                                "position": slots,
+                            }
+                        )
+                    parents.append(elem)
+                    continue
+
+                parents.pop()
+                if tag == "item":
+                    group = sections[-1] if len(sections) > 1 else None
+                    if group is not None:
+                        groups[group["id"]] = group
+                    else:
+                        slots += 1
+                    questions.append(self._rewrite_question(item_question(elem, group)))
+                    # done with this item: drop it from the tree
+                    if parents:
+                        parents[-1].remove(elem)
+                elif tag == "selection_number" and sections:
+                    sections[-1]["pick_count"] = int(elem.text)
+                elif tag == "points_per_item" and sections:
+                    sections[-1]["question_points"] = _number(elem.text)
+                elif tag == "sourcebank_ref" and sections:
+                    print(
+                        "[Warning] Group {} of quiz {} draws from a question bank, "
+                        "which is not part of the export".format(
+                            sections[-1]["name"], quiz and quiz["title"]
+                        )
+                    )
+                elif tag == "section":
+                    sections.pop()
+        if quiz is None:
+            return None
+        (questions, groups) = order_quiz_questions([questions], groups.get)
+        return quiz, questions.values(), groups
+
+    def quizzes(self):
+        """Yield (course, quiz, questions, groups) for every quiz in the export"""
+        seen = set()
+        for name in self._assessment_files():
+            assessment = self._read_assessment(name)
+            if assessment is None:
+                continue
+            (quiz, questions, groups) = assessment
+            # full course exports have each quiz twice, as CC and as QTI
+            if quiz["id"] in seen:
+                continue
+            seen.add(quiz["id"])
+            yield self.course, QtiRecord(quiz), questions, groups
@@ -0,0 +1,175 @@
+import zlib
+from dataclasses import dataclass, field, fields
+from manifest import content_hash
+
+
+# question text longer than this is kept zlib-compressed until it is read
+COMPRESS_OVER = 1024
+ANSWER_KEYS = [
+    "id",
+    "text",
+    "weight",
+    "html",
+    "blank_id",
+    "match_id",
+    "numerical_answer_type",
+    "exact",
+    "margin",
+    "start",
+    "end",
+    "approximate",
+    "precision",
+    "variables",
+    "answer",
+]
+
+
+@dataclass(slots=True)
+class Answer:
+    """One answer of a classic quiz question (or one match of a matching question)"""
+
+    id: object = None
+    text: str = ""
+    weight: float = 0
+    html: str = None
+    blank_id: str = None
+    match_id: object = None
+    # numerical_question
+    numerical_answer_type: str = None
+    exact: float = None
+    margin: float = None
+    start: float = None
+    end: float = None
+    approximate: float = None
+    precision: int = None
+    # calculated_question: one precomputed variable set and its answer
+    variables: list = None
+    answer: float = None
+
+    @classmethod
+    def from_canvas(cls, answer):
+        return cls(**{key: answer[key] for key in ANSWER_KEYS if key in answer})
+
+    def to_dict(self):
+        return {
+            f.name: getattr(self, f.name)
+            for f in fields(self)
+            if getattr(self, f.name) is not None
+        }
+
+
+@dataclass(slots=True)
+class Question:
+    """What the renderers need from a Canvas question, classic or New Quizzes.
+
+    Built once when a quiz is fetched, so the rest of the Canvas payload can
+    be dropped. `digest` is the content_hash of that payload, which the
+    manifest compares between runs.
+    """
+
+    id: object
+    kind: str
+    type: str
+    name: str
+    digest: str
+    _text: object = ""
+    points: float = None
+    group_id: object = None
+    position: int = None
+    assessment_question_id: object = None
+    updated_at: str = None
+    answers: list = field(default_factory=list)
+    matches: list = field(default_factory=list)
+    # correct/neutral comments, classic quizzes only
+    correct_comments: str = None
+    correct_comments_html: str = None
+    neutral_comments: str = None
+    neutral_comments_html: str = None
+    # calculated_question
+    variables: list = None
+    formulas: list = None
+    formula_decimal_places: int = None
+    answer_tolerance: float = None
+    # New Quizzes: entry.interaction_data and entry.scoring_data.value
+    interaction: dict = None
+    scoring: object = None
+
+    @property
+    def text(self):
+        if isinstance(self._text, bytes):
+            return zlib.decompress(self._text).decode("utf-8")
+        return self._text
+
+    @text.setter
+    def text(self, value):
+        value = value or ""
+        if len(value) > COMPRESS_OVER:
+            self._text = zlib.compress(value.encode("utf-8"))
+        else:
+            self._text = value
+
+    @classmethod
+    def from_canvas(cls, question, kind="classic"):
+        """From a question dict of order_quiz_questions/iter_new_quiz_questions"""
+        model = cls(
+            id=question["id"],
+            kind=kind,
+            type=question["question_type"],
+            name=question["question_name"],
+            digest=content_hash(question),
+            points=question.get("points_possible"),
+            group_id=question.get("quiz_group_id"),
+            position=question.get("position"),
+            assessment_question_id=question.get("assessment_question_id"),
+            updated_at=question.get("updated_at"),
+        )
+        model.text = question["question_text"]
+        if kind == "new":
+            entry = question["entry"]
+            model.interaction = question["interaction_data"]
+            model.scoring = entry.get("scoring_data", {}).get("value")
+            return model
+        model.answers = [Answer.from_canvas(a) for a in question.get("answers") or []]
+        model.matches = [Answer.from_canvas(m) for m in question.get("matches") or []]
+        model.correct_comments = question.get("correct_comments")
+        model.correct_comments_html = question.get("correct_comments_html")
+        model.neutral_comments = question.get("neutral_comments")
+        model.neutral_comments_html = question.get("neutral_comments_html")
+        model.variables = question.get("variables")
+        model.formulas = question.get("formulas")
+        model.formula_decimal_places = question.get("formula_decimal_places")
+        model.answer_tolerance = question.get("answer_tolerance")
+        return model
+
+    def to_dict(self):
+        """JSON-friendly form, read back by from_dict (see snapshot.py)"""
+        data = {}
+        for f in fields(self):
+            value = getattr(self, f.name)
+            if f.name == "_text":
+                data["text"] = self.text
+            elif f.name in ["answers", "matches"]:
+                data[f.name] = [answer.to_dict() for answer in value]
+            elif value is not None:
+                data[f.name] = value
+        return data
+
+    def content_digest(self):
+        """Hash of what gets rendered, leaving out the ids and placement that
+        differ between the copies of a question bank question in several quizzes"""
+        data = self.to_dict()
+        for key in ["id", "digest", "position", "group_id", "points", "updated_at"]:
+            data.pop(key, None)
+        for answer in data["answers"] + data["matches"]:
+            answer.pop("id", None)
+        return content_hash(data)
+
+    @classmethod
+    def from_dict(cls, data):
+        data = dict(data)
+        text = data.pop("text", "")
+        data["answers"] = [Answer(**a) for a in data.get("answers", [])]
+        data["matches"] = [Answer(**m) for m in data.get("matches", [])]
+        model = cls(**data)
+        model.text = text
+        return model
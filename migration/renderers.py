@@ -0,0 +1,363 @@
+import json
+from variants import VARIANTS_FILE, canvas_variants, pool_variants, variants_csv
+
+
+# question_type -> renderer; a renderer turns one Canvas question into the
+# contents of its PL files and must not do any I/O, so that questions can be
+# rendered in worker processes. It is called with the question, a list to add
+# warnings to and the options of the run (see render_question)
+RENDERERS = {}
+
+MANUAL_QUESTION_TYPES = ["text_only_question", "essay_question", "essay"]
+
+def renderer(*question_types):
+    """Register the decorated function as the renderer of `question_types`"""
+
+    def register(func):
+        for question_type in question_types:
+            RENDERERS[question_type] = func
+        return func
+
+    return register
+
+
+def render_question(question, question_uuid, variant_pool=0):
+    """Render a question_model.Question.
+
+    `variant_pool` rows of NumPy-generated variants are added to the Canvas
+    ones of each calculated question. Returns ({file name: contents},
+    [warnings]). The warnings are for the caller to show; renderers never
+    prompt.
+    """
+    warnings = []
+    options = {"variant_pool": variant_pool}
+    render = RENDERERS.get(question.type, render_unsupported)
+    files = {"info.json": render_info(question, question_uuid)}
+    files.update(render(question, warnings, options))
+    return files, warnings
+
+
+def render_info(question, question_uuid):
+    obj = {
+        "uuid": question_uuid,
+        "type": "v3",
+        "title": question.name if question.name is not None else "Unnamed Question",
+        "topic": "None",
+        "tags": ["fromcanvas"],
+    }
+    if question.type in MANUAL_QUESTION_TYPES:
+        obj["gradingMethod"] = "Manual"
+    return json.dumps(obj, indent=4)
+
+
+def question_panel(question_text):
+    return "<pl-question-panel>\n<p>\n" + question_text + "\n" + "</p>\n</pl-question-panel>\n"
+
+
+def answer_panel(question):
+    """Correct/neutral comments of a classic quiz question"""
+    html = ""
+    if question.kind == "classic":
+        # only for old quiz
+        if question.correct_comments or question.neutral_comments:
+            html += "<pl-answer-panel>\n<p>\n"
+            if question.correct_comments_html:
+                html += question.correct_comments_html + "\n"
+            elif question.correct_comments:
+                html += question.correct_comments + "\n"
+            if question.neutral_comments_html:
+                html += question.neutral_comments_html + "\n"
+            elif question.neutral_comments:
+                html += question.neutral_comments + "\n"
+            html += "</p>\n</pl-answer-panel>\n"
+    return html
+
+
+def render_unsupported(question, warnings, options):
+    warnings.append("Unsupported question type: " + question.type)
+    return {
+        "question.html": question_panel(question.text)
+        + json.dumps(question.to_dict(), indent=4)
+        + answer_panel(question)
+    }
+
+
+@renderer("text_only_question")
+def render_text_only(question, warnings, options):
+    return {
+        "question.html": question_panel(question.text)
+        + answer_panel(question)
+    }
+
+
+@renderer("essay_question", "essay")
+def render_essay(question, warnings, options):
+    return {
+        "question.html": question_panel(question.text)
+        + '<pl-rich-text-editor file-name="answer.html"></pl-rich-text-editor>\n'
+        + answer_panel(question)
+    }
+
+
+@renderer("multiple_answers_question")
+def render_multiple_answers(question, warnings, options):
+    html = question_panel(question.text)
+    html += '<pl-checkbox answers-name="checkbox">\n'
+    for answer in question.answers:
+        if answer.weight:
+            html += '  <pl-answer correct="true">'
+        else:
+            html += "  <pl-answer>"
+        html += answer.text + "</pl-answer>\n"
+    html += "</pl-checkbox>\n"
+    return {"question.html": html + answer_panel(question)}
+
+
+@renderer("true_false_question", "multiple_choice_question")
+def render_multiple_choice(question, warnings, options):
+    html = question_panel(question.text)
+    html += '<pl-multiple-choice answers-name="mc">\n'
+    for answer in question.answers:
+        if answer.weight:
+            html += '  <pl-answer correct="true">'
+        else:
+            html += "  <pl-answer>"
+        html += answer.text + "</pl-answer>\n"
+    html += "</pl-multiple-choice>\n"
+    return {"question.html": html + answer_panel(question)}
+
+
+@renderer("numerical_question")
+def render_numerical(question, warnings, options):
+    html = question_panel(question.text)
+    answer = question.answers[0]
+    if (
+        answer.numerical_answer_type == "exact_answer"
+        and abs(answer.exact - int(answer.exact)) < 0.001
+        and answer.margin == 0
+    ):
+        html += f'<pl-integer-input answers-name="value" correct-answer="{int(answer.exact)}"></pl-integer-input>\n'
+    elif answer.numerical_answer_type == "exact_answer":
+        html += f'<pl-number-input answers-name="value" correct-answer="{answer.exact}" atol="{answer.margin}"></pl-number-input>\n'
+    elif answer.numerical_answer_type == "range_answer":
+        average = (answer.end + answer.start) / 2
+        margin = abs(answer.end - average)
+        html += f'<pl-number-input answers-name="value" correct-answer="{average}" atol="{margin}"></pl-number-input>\n'
+    elif answer.numerical_answer_type == "precision_answer":
+        html += f'<pl-number-input answers-name="value" correct-answer="{answer.approximate}" comparison="sigfig" digits="{answer.precision}"></pl-number-input>\n'
+    else:
+        warnings.append(
+            f'Invalid numerical answer type: {answer.numerical_answer_type}'
+        )
+        html += '<pl-number-input answers-name="value"></pl-number-input>\n'
+    return {"question.html": html + answer_panel(question)}
+
+
+@renderer("calculated_question")
+def render_calculated(question, warnings, options):
+    question_text = question.text
+    for variable in question.variables:
+        question_text = question_text.replace(
+            f'[{variable["name"]}]',
+            "{{params." + variable["name"] + "}}",
+        )
+    answers_name = question.formulas[-1]["formula"].split("=")[0].strip()
+    html = question_panel(question_text)
+    html += f'<pl-number-input answers-name="{answers_name}" comparison="decdig" digits="{question.formula_decimal_places}"></pl-number-input>\n'
+
+    rows = canvas_variants(question)
+    if options["variant_pool"]:
+        try:
+            rows += pool_variants(question, answers_name, options["variant_pool"])
+        except Exception as e:
+            warnings.append(f"Could not generate variants of {answers_name}: {e}")
+    if not rows:
+        return {
+            "question.html": html + answer_panel(question),
+            "server.py": calculated_script(question, answers_name),
+        }
+
+    # pick one of the precomputed variants instead of redrawing the variables
+    script = "import os\nimport csv\nimport random\n\n"
+    script += f"with open(os.path.join(os.path.dirname(os.path.abspath(__file__)), \"{VARIANTS_FILE}\")) as f:\n"
+    script += "    VARIANTS = list(csv.reader(f))[1:]\n\n\n"
+    script += "def generate(data):\n"
+    script += "    row = random.choice(VARIANTS)\n"
+    for i, variable in enumerate(question.variables):
+        cast = "float" if variable.get("scale", False) else "int"
+        script += f'    data["params"]["{variable["name"]}"] = {cast}(row[{i}])\n'
+    script += f'    data["correct_answers"]["{answers_name}"] = float(row[{len(question.variables)}])\n'
+    return {
+        "question.html": html + answer_panel(question),
+        "server.py": script,
+        VARIANTS_FILE: variants_csv(question, answers_name, rows),
+    }
+
+
+def calculated_script(question, answers_name):
+    """server.py drawing the variables at random, for questions without variants"""
+    script = "import random\n\n"
+    script += "def generate(data):\n"
+    for variable in question.variables:
+        if not variable.get("scale", False):
+            script += f'    {variable["name"]} = random.randint({int(variable["min"])}, {int(variable["max"])})\n'
+        else:
+            multip = 10 ** variable["scale"]
+            script += f'    {variable["name"]} = random.randint({int(variable["min"] * multip)}, {int(variable["max"] * multip)}) / {multip}\n'
+    for formula in question.formulas:
+        script += f'    {formula["formula"]}\n'
+    for variable in question.variables:
+        script += f'    data["params"]["{variable["name"]}"] = {variable["name"]}\n'
+    script += f'    data["correct_answers"]["{answers_name}"] = {answers_name}\n'
+    return script
+
+
+@renderer("short_answer_question")
+def render_short_answer(question, warnings, options):
+    answer = question.answers[0]
+    return {
+        "question.html": question_panel(question.text)
+        + f'<pl-string-input answers-name="input" correct-answer="{answer.text}"></pl-string-input>\n'
+        + answer_panel(question)
+    }
+
+
+@renderer("fill_in_multiple_blanks_question")
+def render_fill_in_multiple_blanks(question, warnings, options):
+    question_text = question.text
+    blanks = {}
+    for answer in question.answers:
+        if answer.blank_id not in blanks:
+            blanks[answer.blank_id] = []
+        blanks[answer.blank_id].append(answer)
+    for answer_id, answers in blanks.items():
+        question_text.replace(
+            f"[{answer_id}]",
+            f'<pl-string-input answers-name="{answer_id}" correct-answer="{answers[0].text}" remove-spaces="true" ignore-case="true" display="inline"></pl-string-input>',
+        )
+    return {"question.html": question_text + "\n" + answer_panel(question)}
+
+
+@renderer("matching_question")
+def render_matching(question, warnings, options):
+    html = question_panel(question.text)
+    html += '<pl-matching answers-name="match">\n'
+    for answer in question.answers:
+        html += f'  <pl-statement match="m{answer.match_id}">{answer.text}</pl-statement>\n'
+    for match in question.matches:
+        html += f'  <pl-option name="m{match.match_id}">{match.text}</pl-option>\n'
+    html += "</pl-matching>\n"
+    return {"question.html": html + answer_panel(question)}
+
+
+@renderer("multiple_dropdowns_question")
+def render_multiple_dropdowns(question, warnings, options):
+    blanks = {}
+    for answer in question.answers:
+        if answer.blank_id not in blanks:
+            blanks[answer.blank_id] = []
+        blanks[answer.blank_id].append(answer)
+    question_text = question.text
+    for blank, answers in blanks.items():
+        dropdown = f'<pl-dropdown answers-name="{blank}">\n'
+        for answer in answers:
+            dropdown += "  <pl-answer"
+            if answer.weight > 0:
+                dropdown += ' correct="true"'
+            dropdown += f'>{answer.text}</pl-answer>\n'
+        dropdown += "</pl-dropdown>"
+        question_text = question_text.replace(f"[{blank}]", dropdown)
+    return {"question.html": question_text + "\n" + answer_panel(question)}
+
+
+@renderer("matching")
+def render_new_matching(question, warnings, options):
+    # new quiz format
+    html = question_panel(question.text)
+    html += '<pl-matching answers-name="match">\n'
+    for choice in question.interaction["questions"]:
+        match_body = question.scoring[choice["id"]]
+        item_body = choice["item_body"]
+        html += f'  <pl-statement match="{match_body}">{item_body}</pl-statement>\n'
+    return {"question.html": html + answer_panel(question)}
+
+
+@renderer("choice")
+def render_new_choice(question, warnings, options):
+    # new quiz format
+    html = question_panel(question.text)
+    html += '<pl-multiple-choice answers-name="mc">\n'
+    for answer in question.interaction["choices"]:
+        if answer["id"] in question.scoring:
+            html += '  <pl-answer correct="true">'
+        else:
+            html += "  <pl-answer>"
+        html += answer["item_body"] + "</pl-answer>\n"
+    html += "</pl-multiple-choice>\n"
+    return {"question.html": html + answer_panel(question)}
+
+
+@renderer("true-false")
+def render_new_true_false(question, warnings, options):
+    # new quiz format
+    html = question_panel(question.text)
+    html += '<pl-multiple-choice answers-name="mc">\n'
+    if question.scoring:
+        html += '  <pl-answer correct="true"> True </pl-answer>\n'
+        html += "  <pl-answer> False </pl-answer>\n"
+    else:
+        html += "  <pl-answer> True </pl-answer>\n"
+        html += '  <pl-answer correct="true"> False </pl-answer>\n'
+    html += "</pl-multiple-choice>\n"
+    return {"question.html": html + answer_panel(question)}
+
+
+@renderer("multi-answer")
+def render_new_multi_answer(question, warnings, options):
+    # new quiz format
+    html = question_panel(question.text)
+    html += '<pl-checkbox answers-name="checkbox">\n'
+    for answer in question.interaction["choices"]:
+        if answer["id"] in question.scoring:
+            html += '  <pl-answer correct="true">'
+        else:
+            html += "  <pl-answer>"
+        html += answer["item_body"] + "</pl-answer>\n"
+    html += "</pl-checkbox>\n"
+    return {"question.html": html + answer_panel(question)}
+
+
+@renderer("rich-fill-blank")
+def render_new_rich_fill_blank(question, warnings, options):
+    # new quiz format
+    question_text = question.text
+    blanks = {}
+    for answer in question.scoring:
+        if answer["id"] not in blanks:
+            blanks[answer["id"]] = answer["scoring_data"]["value"]
+    for answer_id, answers in blanks.items():
+        question_text = question_text.replace(
+            f'<span id="blank_{answer_id}"></span>',
+            f'<pl-string-input answers-name="{answer_id}" correct-answer="{answers}" remove-spaces="true" ignore-case="true" display="inline"></pl-string-input>',
+        )
+    return {
+        "question.html": question_panel(question.text)
+        + question_text
+        + "\n"
+        + answer_panel(question)
+    }
+
+
+# @renderer("ordering")
+# def render_new_ordering(question, warnings, options):
+#     # TODO: ordering
+#     html = question_panel(question.text)
+#     html += '<pl-order-blocks answers-name="order-numbers">\n'
+#     for answer in question.interaction["choices"]:
+#         if answer["id"] in question.scoring:
+#             html += '  <pl-answer correct="true">'
+#         else:
+#             html += "  <pl-answer>"
+#         html += answer["item_body"] + "</pl-answer>\n"
+#     html += "</pl-order-blocks>\n"
+#     return {"question.html": html + answer_panel(question)}
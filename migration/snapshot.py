@@ -0,0 +1,128 @@
+import os
+import json
+import gzip
+import base64
+from question_model import Question
+
+
+SNAPSHOT_VERSION = 3
+
+
+class SnapshotRecord:
+    """A course or quiz read back from a snapshot, used like canvas.Course/Quiz"""
+
+    def __init__(self, data, kind=None):
+        self.data = data
+        self.id = data["id"]
+        # "classic" or "new" for quizzes
+        self.kind = kind
+
+    def __getitem__(self, index):
+        return self.data[index]
+
+
+class SnapshotWriter:
+    """Writes what create_quiz_bank.py fetched to a gzipped JSONL file.
+
+    One `quiz` line (course, quiz and question groups) is followed by one
+    `question` line per question_model.Question, and `file` lines hold the
+    Canvas files the questions link to. The first line has the Canvas `host`,
+    to recognize absolute links to its files. The file is written to
+    `<path>.tmp` and moved into place by `close`, so an interrupted run never
+    leaves a truncated snapshot.
+    """
+
+    def __init__(self, path, host=None):
+        self.path = path
+        self.file = gzip.open(path + ".tmp", "wt", encoding="utf-8")
+        self.quizzes = 0
+        self.questions = 0
+        self.files = 0
+        self._write({"type": "snapshot", "version": SNAPSHOT_VERSION, "host": host})
+
+    def _write(self, record):
+        self.file.write(json.dumps(record, sort_keys=True, default=str) + "\n")
+
+    def _questions(self, questions):
+        for question in questions:
+            self._write({"type": "question", "question": question.to_dict()})
+            self.questions += 1
+            yield question
+
+    def tee(self, fetched_quizzes):
+        """Pass (course, quiz, questions, groups) through, writing each to the snapshot"""
+        for course, quiz, questions, groups in fetched_quizzes:
+            self._write(
+                {
+                    "type": "quiz",
+                    "kind": quiz.kind,
+                    "course": course.data,
+                    "quiz": quiz.data,
+                    "groups": list(groups.values()) if groups else None,
+                }
+            )
+            self.quizzes += 1
+            yield course, quiz, self._questions(questions), groups
+
+    def add_files(self, files):
+        """Save the files of a canvas_files.CanvasFiles linked from the questions"""
+        for file_id in sorted(files.referenced):
+            name = files.names.get(file_id)
+            if name is None or not os.path.exists(os.path.join(files.directory, name)):
+                continue
+            with open(os.path.join(files.directory, name), "rb") as f:
+                content = base64.b64encode(f.read()).decode("ascii")
+            self._write({"type": "file", "id": file_id, "name": name, "content": content})
+            self.files += 1
+
+    def close(self):
+        self.file.close()
+        os.replace(self.path + ".tmp", self.path)
+
+
+def snapshot_host(path):
+    """The Canvas host a snapshot was fetched from, if known"""
+    with gzip.open(path, "rt", encoding="utf-8") as f:
+        return json.loads(f.readline()).get("host")
+
+
+def snapshot_files(path):
+    """Yield (file id, name, content) of the Canvas files saved in a snapshot"""
+    with gzip.open(path, "rt", encoding="utf-8") as f:
+        for line in f:
+            record = json.loads(line)
+            if record["type"] == "file":
+                yield record["id"], record["name"], base64.b64decode(record["content"])
+
+
+def read_snapshot(path):
+    """Yield (course, quiz, questions, groups) from a snapshot, like the Canvas fetch does"""
+    courses = {}
+    current = None
+    with gzip.open(path, "rt", encoding="utf-8") as f:
+        for line in f:
+            record = json.loads(line)
+            if record["type"] == "snapshot":
+                if record["version"] != SNAPSHOT_VERSION:
+                    raise Exception(
+                        f'{path} is a version {record["version"]} snapshot, expected {SNAPSHOT_VERSION}'
+                    )
+            elif record["type"] == "quiz":
+                if current is not None:
+                    yield current
+                course_id = record["course"]["id"]
+                if course_id not in courses:
+                    courses[course_id] = SnapshotRecord(record["course"])
+                groups = None
+                if record["groups"] is not None:
+                    groups = {group["id"]: group for group in record["groups"]}
+                current = (
+                    courses[course_id],
+                    SnapshotRecord(record["quiz"], record["kind"]),
+                    [],
+                    groups,
+                )
+            elif record["type"] == "question":
+                current[2].append(Question.from_dict(record["question"]))
+    if current is not None:
+        yield current
@@ -0,0 +1,117 @@
+import io
+import csv
+import numpy as np
+
+
+VARIANTS_FILE = "variants.csv"
+
+
+def _fold(func):
+    """Canvas' min/max take any number of arguments"""
+
+    def fold(*values):
+        result = values[0]
+        for value in values[1:]:
+            result = func(result, value)
+        return result
+
+    return fold
+
+
+# the functions of Canvas formulas, applied to whole columns of variants at
+# once; log is base 10 and ln the natural log, as in Canvas
+FORMULA_FUNCTIONS = {
+    "abs": np.abs,
+    "sqrt": np.sqrt,
+    "exp": np.exp,
+    "ln": np.log,
+    "log": np.log10,
+    "sin": np.sin,
+    "cos": np.cos,
+    "tan": np.tan,
+    "asin": np.arcsin,
+    "acos": np.arccos,
+    "atan": np.arctan,
+    "atan2": np.arctan2,
+    "ceil": np.ceil,
+    "floor": np.floor,
+    "round": np.round,
+    "min": _fold(np.minimum),
+    "max": _fold(np.maximum),
+    "pi": np.pi,
+    "e": np.e,
+}
+
+
+def _value(variable, value):
+    """A variable's value as the generated server.py would have drawn it"""
+    if not variable.get("scale", False):
+        return int(round(float(value)))
+    return round(float(value), variable["scale"])
+
+
+def _answer(question, value):
+    """An answer rounded to the decimal places of the question, as Canvas shows it"""
+    if question.formula_decimal_places is None:
+        return float(value)
+    return round(float(value), int(question.formula_decimal_places))
+
+
+def canvas_variants(question):
+    """Rows of [variables..., answer] from the variable sets Canvas computed"""
+    rows = []
+    for answer in question.answers:
+        if not answer.variables or answer.answer is None:
+            continue
+        values = {variable["name"]: variable["value"] for variable in answer.variables}
+        if any(variable["name"] not in values for variable in question.variables):
+            continue
+        rows.append(
+            [_value(variable, values[variable["name"]]) for variable in question.variables]
+            + [_answer(question, answer.answer)]
+        )
+    return rows
+
+
+def pool_variants(question, answers_name, size):
+    """`size` more rows, drawn and evaluated with NumPy like server.py used to.
+
+    Seeded from the question digest, so a re-run writes the same pool.
+    """
+    rng = np.random.default_rng(int(question.digest[:16], 16))
+    # evaluated as floats, as int64 would wrap where server.py's ints did not
+    names = {}
+    for variable in question.variables:
+        if not variable.get("scale", False):
+            names[variable["name"]] = rng.integers(
+                int(variable["min"]), int(variable["max"]), size, endpoint=True
+            ).astype(float)
+        else:
+            multip = 10 ** variable["scale"]
+            names[variable["name"]] = (
+                rng.integers(
+                    int(variable["min"] * multip),
+                    int(variable["max"] * multip),
+                    size,
+                    endpoint=True,
+                )
+                / multip
+            )
+    columns = [names[variable["name"]] for variable in question.variables]
+    for formula in question.formulas:
+        exec(formula["formula"], {"__builtins__": {}, **FORMULA_FUNCTIONS}, names)
+    answers = np.broadcast_to(np.asarray(names[answers_name], dtype=float), (size,))
+    return [
+        [_value(variable, column[i]) for variable, column in zip(question.variables, columns)]
+        + [_answer(question, answers[i])]
+        for i in range(size)
+    ]
+
+
+def variants_csv(question, answers_name, rows):
+    """The variant table: a header of variable names and the answer, then one row per variant"""
+    f = io.StringIO()
+    writer = csv.writer(f, lineterminator="\n")
+    writer.writerow([variable["name"] for variable in question.variables] + [answers_name])
+    writer.writerows(rows)
+    return f.getvalue()
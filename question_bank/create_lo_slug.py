@@ -1,16 +1,22 @@
 import argparse
 import os
 from openai_utils import create_slug
+from llm_cache import add_cache_arguments, open_cache, print_cache_summary
 
 
 parser = argparse.ArgumentParser()
 parser.add_argument("--lo_file_path")
+add_cache_arguments(parser)
 args = parser.parse_args()
 
 print(f"Reading {args.lo_file_path}")
 with open(args.lo_file_path, "r") as f:
     lo_text = f.read()
-slug_text = create_slug(lo_text, model_name="gpt-4o")
+cache = open_cache(args, os.path.dirname(args.lo_file_path))
+slug_text = create_slug(lo_text, model_name="gpt-4o", cache=cache)
+if cache is not None:
+    cache.close()
+print_cache_summary(cache)
 args.slug_file_path = "{}/slug.txt".format(os.path.dirname(args.lo_file_path))
 print(f"Writing slug to {args.slug_file_path}")
 with open(args.slug_file_path, "w") as f:
@@ -0,0 +1,137 @@
+import os
+import json
+import time
+import sqlite3
+import hashlib
+import threading
+
+
+CACHE_FILE = "llm_cache.sqlite"
+DEFAULT_MAX_BYTES = 64 * 1024 * 1024
+DEFAULT_MAX_AGE_DAYS = 90
+
+
+def cache_key(*parts):
+    """Hash of everything a response depends on (model, prompt version, inputs)"""
+    return hashlib.sha256(
+        json.dumps(parts, sort_keys=True).encode("utf-8")
+    ).hexdigest()
+
+
+class LLMCache:
+    """Persistent cache of LLM responses in one SQLite file.
+
+    Responses are stored as JSON under a cache_key. evict() drops the entries
+    older than `max_age_days`, then the least recently used ones until the
+    responses fit in `max_bytes`.
+    """
+
+    def __init__(
+        self, path, max_bytes=DEFAULT_MAX_BYTES, max_age_days=DEFAULT_MAX_AGE_DAYS
+    ):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.max_age_days = max_age_days
+        self.hits = 0
+        self.misses = 0
+        # get/put are called from the classification threads
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS responses ("
+            "key TEXT PRIMARY KEY, value TEXT, created_at REAL, used_at REAL)"
+        )
+        self._db.commit()
+
+    def get(self, key):
+        """The cached response for `key`, or None"""
+        with self._lock:
+            row = self._db.execute(
+                "SELECT value FROM responses WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self._db.execute(
+                "UPDATE responses SET used_at = ? WHERE key = ?", (time.time(), key)
+            )
+            self._db.commit()
+        return json.loads(row[0])
+
+    def put(self, key, value):
+        now = time.time()
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?)",
+                (key, json.dumps(value), now, now),
+            )
+            self._db.commit()
+
+    def evict(self):
+        """Delete expired entries, then least recently used ones over max_bytes"""
+        with self._lock:
+            self._db.execute(
+                "DELETE FROM responses WHERE created_at < ?",
+                (time.time() - self.max_age_days * 24 * 3600,),
+            )
+            size = 0
+            evicted = []
+            for key, length in self._db.execute(
+                "SELECT key, LENGTH(key) + LENGTH(value) FROM responses ORDER BY used_at DESC"
+            ):
+                size += length
+                if size > self.max_bytes:
+                    evicted.append((key,))
+            self._db.executemany("DELETE FROM responses WHERE key = ?", evicted)
+            self._db.commit()
+
+    def close(self):
+        self.evict()
+        self._db.close()
+
+    def summary(self):
+        return {"cache_hits": self.hits, "cache_misses": self.misses}
+
+
+def add_cache_arguments(parser):
+    parser.add_argument(
+        "--cache_file",
+        default=None,
+        help=f"SQLite file caching the API responses (default: {CACHE_FILE} next to the input file)",
+    )
+    parser.add_argument(
+        "--cache_size_mb", type=int, default=None, help="Size limit of the response cache"
+    )
+    parser.add_argument(
+        "--cache_max_age_days",
+        type=int,
+        default=DEFAULT_MAX_AGE_DAYS,
+        help="Drop cached responses older than this",
+    )
+    parser.add_argument(
+        "--no_cache", action="store_true", help="Always call the API, without the cache"
+    )
+
+
+def open_cache(args, default_dir):
+    """The LLMCache selected by the add_cache_arguments flags, or None"""
+    if args.no_cache:
+        return None
+    path = args.cache_file or os.path.join(default_dir, CACHE_FILE)
+    print(f"Caching responses in {path}")
+    return LLMCache(
+        path,
+        args.cache_size_mb * 1024 * 1024 if args.cache_size_mb else DEFAULT_MAX_BYTES,
+        args.cache_max_age_days,
+    )
+
+
+def print_cache_summary(cache):
+    if cache is not None:
+        stats = cache.summary()
+        print(
+            "LLM cache: {} hits, {} misses ({})".format(
+                stats["cache_hits"], stats["cache_misses"], cache.path
+            )
+        )
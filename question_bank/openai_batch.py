@@ -0,0 +1,194 @@
+import json
+import time
+import itertools
+from concurrent.futures import ThreadPoolExecutor
+from openai_utils import shared_client, folder_name_key, folder_name_request
+
+
+COMPLETION_WINDOW = "24h"
+ENDPOINT = "/v1/chat/completions"
+FINISHED = ["completed", "failed", "expired", "cancelled"]
+
+
+class OpenAIBatches:
+    """Runs a JSONL file of requests through the OpenAI Batch API.
+
+    Talks to /files and /batches through the generic client methods, as the
+    pinned openai package predates `client.batches`.
+    """
+
+    def __init__(self, client=None):
+        self.client = client or shared_client()
+
+    def submit(self, path):
+        """Upload the batch file and start the batch, returning its id"""
+        with open(path, "rb") as f:
+            # "batch" is missing from the pinned client's list of purposes,
+            # but the value is sent as is and the API accepts it
+            batch_file = self.client.files.create(file=f, purpose="batch")
+        batch = self.client.post(
+            "/batches",
+            body={
+                "input_file_id": batch_file.id,
+                "endpoint": ENDPOINT,
+                "completion_window": COMPLETION_WINDOW,
+            },
+            cast_to=object,
+        )
+        print(f'Batch {batch["id"]} submitted, if interrupted resume with --batch_id {batch["id"]}')
+        return batch["id"]
+
+    def status(self, batch_id):
+        """The batch object: status, request_counts, output_file_id, ..."""
+        return self.client.get(f"/batches/{batch_id}", cast_to=object)
+
+    def output(self, file_id):
+        """Lines of an output or error file"""
+        return self.client.files.content(file_id).text.splitlines()
+
+
+class LocalBatches:
+    """Stand-in for OpenAIBatches that sends each request of the batch file as a
+    normal chat completion, for testing against any chat completions server"""
+
+    def __init__(self, client=None, concurrency=8):
+        self.client = client or shared_client()
+        self.concurrency = concurrency
+        self.batches = {}
+        self._ids = itertools.count(1)
+
+    def _run(self, request):
+        try:
+            completion = self.client.chat.completions.create(**request["body"])
+        except Exception as e:
+            return {"custom_id": request["custom_id"], "error": {"message": str(e)}}
+        return {
+            "custom_id": request["custom_id"],
+            "response": {"status_code": 200, "body": completion.model_dump()},
+        }
+
+    def submit(self, path):
+        with open(path) as f:
+            requests = [json.loads(line) for line in f]
+        with ThreadPoolExecutor(max_workers=self.concurrency) as pool:
+            lines = [json.dumps(line) for line in pool.map(self._run, requests)]
+        batch_id = f"local_batch_{next(self._ids)}"
+        self.batches[batch_id] = lines
+        return batch_id
+
+    def status(self, batch_id):
+        total = len(self.batches[batch_id])
+        return {
+            "id": batch_id,
+            "status": "completed",
+            "request_counts": {"total": total, "completed": total, "failed": 0},
+            "output_file_id": batch_id,
+            "error_file_id": None,
+        }
+
+    def output(self, file_id):
+        return self.batches[file_id]
+
+
+def write_batch_file(path, requests):
+    """Write {custom_id: request body} as a batch input file"""
+    with open(path, "w") as f:
+        for custom_id, body in requests.items():
+            f.write(
+                json.dumps(
+                    {"custom_id": custom_id, "method": "POST", "url": ENDPOINT, "body": body}
+                )
+                + "\n"
+            )
+
+
+def wait_for_batch(batches, batch_id, poll_seconds):
+    """Poll until the batch is finished and return the batch object"""
+    while True:
+        batch = batches.status(batch_id)
+        counts = batch.get("request_counts") or {}
+        print(
+            "Batch {}: {} ({}/{} done, {} failed)".format(
+                batch_id,
+                batch["status"],
+                counts.get("completed", 0),
+                counts.get("total", 0),
+                counts.get("failed", 0),
+            )
+        )
+        if batch["status"] in FINISHED:
+            return batch
+        time.sleep(poll_seconds)
+
+
+def batch_folder_names(
+    batches,
+    name_mapping,
+    question_texts,
+    model_name,
+    batch_file,
+    poll_seconds=60,
+    batch_id=None,
+    cache=None,
+):
+    """get_folder_name for every text of `question_texts` ({key: question text}),
+    sent as one batch.
+
+    Returns {key: response, or the Exception to raise for that question}.
+    Responses already in `cache` are not sent, and new ones are stored in it.
+    With `batch_id`, waits for that batch (e.g. from an interrupted run)
+    instead of submitting a new one.
+    """
+    results = {}
+    requests = {}
+    keys = {}
+    for i, (key, question_text) in enumerate(question_texts.items()):
+        cached = None
+        if cache is not None:
+            cached = cache.get(folder_name_key(name_mapping, question_text, model_name))
+        if cached is not None:
+            results[key] = cached
+            continue
+        custom_id = f"question-{i}"
+        requests[custom_id] = folder_name_request(name_mapping, question_text, model_name)
+        keys[custom_id] = key
+    if not requests:
+        return results
+
+    if batch_id is None:
+        write_batch_file(batch_file, requests)
+        print(f"Submitting {len(requests)} requests from {batch_file}...")
+        batch_id = batches.submit(batch_file)
+    batch = wait_for_batch(batches, batch_id, poll_seconds)
+
+    lines = []
+    for file_id in [batch.get("output_file_id"), batch.get("error_file_id")]:
+        if file_id:
+            lines += batches.output(file_id)
+    for line in lines:
+        result = json.loads(line)
+        custom_id = result["custom_id"]
+        if custom_id not in keys:
+            continue
+        response = result.get("response") or {}
+        if result.get("error") or response.get("status_code") != 200:
+            error = result.get("error") or response.get("body", {}).get("error")
+            results[keys[custom_id]] = Exception(f"batch request failed: {error}")
+            continue
+        content = response["body"]["choices"][0]["message"]["content"]
+        try:
+            results[keys[custom_id]] = json.loads(content)
+        except ValueError as e:
+            results[keys[custom_id]] = e
+            continue
+        if cache is not None:
+            cache.put(
+                folder_name_key(
+                    name_mapping, question_texts[keys[custom_id]], model_name
+                ),
+                results[keys[custom_id]],
+            )
+    for custom_id, key in keys.items():
+        if key not in results:
+            results[key] = Exception(f'no result in batch {batch_id} ({batch["status"]})')
+    return results
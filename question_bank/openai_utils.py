@@ -1,9 +1,38 @@
 from openai import OpenAI
 import json
+import threading
+from llm_cache import cache_key
 
 
-def create_slug(lo_text, model_name="gpt-3.5-turbo"):
-    client = OpenAI()
+_client = None
+_client_lock = threading.Lock()
+
+# part of the cache keys: bump when a prompt below changes, so responses to
+# the old prompt are not reused
+PROMPT_VERSION = 1
+
+
+def shared_client():
+    """One OpenAI client, and so one connection pool, for all requests of the process"""
+    global _client
+    with _client_lock:
+        if _client is None:
+            _client = OpenAI()
+    return _client
+
+
+def normalize_text(text):
+    """Collapse whitespace, so reformatting a question does not miss the cache"""
+    return " ".join(text.split())
+
+
+def create_slug(lo_text, model_name="gpt-3.5-turbo", cache=None):
+    key = cache_key("create_slug", PROMPT_VERSION, model_name, normalize_text(lo_text))
+    if cache is not None:
+        response = cache.get(key)
+        if response is not None:
+            return response
+    client = shared_client()
 
     completion = client.chat.completions.create(
         messages=[
@@ -27,19 +56,38 @@ def create_slug(lo_text, model_name="gpt-3.5-turbo"):
         .message.content.replace("<output>\n", "")
         .replace("</output>", "")
     )
+    if cache is not None:
+        cache.put(key, response)
     return response
 
 
-def get_folder_name(name_mapping, question_text, model_name="gpt-3.5-turbo"):
-    client = OpenAI()
+# steps 1 and 2 of the classification prompt, shared by the one- and the
+# several-questions-per-request prompts
+FOLDER_NAME_STEPS = (
+    "Use the following step-by-step instructions to respond to user inputs."
+    + "Step 1: Match the question to the corresponding lecture and the learning objective slug. You might see some question unrelated to the lecture and learning objective (e.g., what did you learn in the lecture), use the slug 'others'. Note that the verb in the objective is important to take into consideration. "
+    + "Step 2: Create a slug and a title for the provided question. The question title is a short summary (no more than one sentence, do not use punctuation marks). The purpose of the title is to distinguish the question from other questions, so do not to repeat the learning objective or the question itself. For example, a question title can be 'Fibonacci function' or 'Fill missing data in grades data'. Only capitalize the first letter of a sentence. A slug is a short label for the question, containing only letters, numbers or hyphens. Do not use underscores for slug."
+)
 
-    completion = client.chat.completions.create(
-        messages=[
+
+def folder_name_key(name_mapping, question_text, model_name):
+    """Cache key of a get_folder_name response"""
+    return cache_key(
+        "get_folder_name",
+        PROMPT_VERSION,
+        model_name,
+        name_mapping,
+        normalize_text(question_text),
+    )
+
+
+def folder_name_request(name_mapping, question_text, model_name):
+    """Body of the chat completion request sent by get_folder_name"""
+    return {
+        "messages": [
             {
                 "role": "system",
-                "content": "Use the following step-by-step instructions to respond to user inputs."
-                + "Step 1: Match the question to the corresponding lecture and the learning objective slug. You might see some question unrelated to the lecture and learning objective (e.g., what did you learn in the lecture), use the slug 'others'. Note that the verb in the objective is important to take into consideration. "
-                + "Step 2: Create a slug and a title for the provided question. The question title is a short summary (no more than one sentence, do not use punctuation marks). The purpose of the title is to distinguish the question from other questions, so do not to repeat the learning objective or the question itself. For example, a question title can be 'Fibonacci function' or 'Fill missing data in grades data'. Only capitalize the first letter of a sentence. A slug is a short label for the question, containing only letters, numbers or hyphens. Do not use underscores for slug."
+                "content": FOLDER_NAME_STEPS
                 # + "The final output should have the format: 'lecture_objective_slug\nquestion_slug\nquestion_title'. The outputs are separated by new lines. For example, 'lec6_function-test/obj1_function-definition\nadd-10\nImplement a function to add ten' or 'others\nwhat_do_you_learn\nWhat do you learn in lecture' for unrelated questions.",
                 + "Step 3: Output a JSON object structured like: {'lec_slug': ..., 'lo_slug': .... 'question_slug': ..., 'question_title': question_title}. For example, {'lec_slug': 'lec6_function-test', 'lo_slug': 'obj1_function-definition', 'question_slug': 'add-10', 'question_title': 'Implement a function to add ten'}",
             },
@@ -50,7 +98,193 @@ def get_folder_name(name_mapping, question_text, model_name="gpt-3.5-turbo"):
                 ),
             },
         ],
-        model=model_name,
-        response_format={"type": "json_object"},
-    )
+        "model": model_name,
+        "response_format": {"type": "json_object"},
+    }
+
+
+def _request_folder_name(name_mapping, question_text, model_name, usage, retry=False):
+    request = folder_name_request(name_mapping, question_text, model_name)
+    completion = shared_client().chat.completions.create(**request)
+    if usage is not None:
+        # a retried question is already counted by the request it came from
+        usage.add(
+            completion.usage,
+            request,
+            name_mapping,
+            [] if retry else [question_text],
+            model_name,
+        )
     return json.loads(completion.choices[0].message.content)
+
+
+def get_folder_name(
+    name_mapping, question_text, model_name="gpt-3.5-turbo", cache=None, usage=None
+):
+    key = folder_name_key(name_mapping, question_text, model_name)
+    if cache is not None:
+        response = cache.get(key)
+        if response is not None:
+            return response
+    response = _request_folder_name(name_mapping, question_text, model_name, usage)
+    if cache is not None:
+        cache.put(key, response)
+    return response
+
+
+def folder_names_request(name_mapping, question_texts, model_name):
+    """Body of a request classifying several questions.
+
+    The instructions and the learning objectives come first and are the same
+    in every request, so the provider can cache that prefix; only the
+    questions at the end change.
+    """
+    return {
+        "messages": [
+            {
+                "role": "system",
+                "content": FOLDER_NAME_STEPS
+                + "Step 3: Do this for each question, then output a JSON object structured like: {'questions': [{'id': <question id>, 'lec_slug': ..., 'lo_slug': ..., 'question_slug': ..., 'question_title': ...}, ...]}, with one entry per question, in the order of the questions. For example, {'questions': [{'id': 1, 'lec_slug': 'lec6_function-test', 'lo_slug': 'obj1_function-definition', 'question_slug': 'add-10', 'question_title': 'Implement a function to add ten'}]}"
+                + "The slugs for lecture and learning objective, and descriptions are (delimited with XML tags): <learning objective> {} </learning objective>".format(
+                    name_mapping
+                ),
+            },
+            {
+                "role": "user",
+                "content": "The questions are (delimited with XML tags): "
+                + "".join(
+                    '<question id="{}"> {} </question>\n'.format(i, question_text)
+                    for i, question_text in enumerate(question_texts, 1)
+                ),
+            },
+        ],
+        "model": model_name,
+        "response_format": {"type": "json_object"},
+    }
+
+
+def parse_folder_names(content, count):
+    """The `count` responses in a folder_names_request reply, in question order.
+
+    A question whose entry is missing, duplicated or not an object gets an
+    Exception instead.
+    """
+    results = [None] * count
+    try:
+        items = json.loads(content)["questions"]
+    except (ValueError, KeyError, TypeError):
+        items = []
+    if not isinstance(items, list):
+        items = []
+    for item in items:
+        if not isinstance(item, dict):
+            continue
+        try:
+            i = int(item.get("id")) - 1
+        except (TypeError, ValueError):
+            continue
+        if 0 <= i < count and results[i] is None:
+            results[i] = {key: value for key, value in item.items() if key != "id"}
+        elif 0 <= i < count:
+            results[i] = Exception(f"question {i + 1} answered twice")
+    return [
+        Exception(f"question {i + 1} missing from the response") if result is None else result
+        for i, result in enumerate(results)
+    ]
+
+
+def get_folder_names(
+    name_mapping, question_texts, model_name="gpt-3.5-turbo", cache=None, usage=None
+):
+    """get_folder_name for several questions, sent in one request.
+
+    Returns the responses in the order of `question_texts`. Questions the
+    reply does not answer properly are asked again one at a time; if that
+    fails too, their response is the Exception.
+    """
+    responses = [None] * len(question_texts)
+    pending = []
+    for i, question_text in enumerate(question_texts):
+        if cache is not None:
+            responses[i] = cache.get(folder_name_key(name_mapping, question_text, model_name))
+        if responses[i] is None:
+            pending.append(i)
+    if not pending:
+        return responses
+
+    texts = [question_texts[i] for i in pending]
+    request = folder_names_request(name_mapping, texts, model_name)
+    completion = shared_client().chat.completions.create(**request)
+    if usage is not None:
+        usage.add(completion.usage, request, name_mapping, texts, model_name)
+    parsed = parse_folder_names(completion.choices[0].message.content, len(pending))
+    for i, response in zip(pending, parsed):
+        if isinstance(response, Exception):
+            print(f"[Warning] {response}, asking for it on its own")
+            try:
+                response = _request_folder_name(
+                    name_mapping, question_texts[i], model_name, usage, retry=True
+                )
+            except Exception as e:
+                responses[i] = e
+                continue
+        if cache is not None:
+            cache.put(folder_name_key(name_mapping, question_texts[i], model_name), response)
+        responses[i] = response
+    return responses
+
+
+class TokenUsage:
+    """Tokens used by the classification requests, as reported by the API.
+
+    Also estimates what the same questions would have used with one question
+    per request, from the tokens per character of the actual prompts.
+    """
+
+    def __init__(self):
+        self.requests = 0
+        self.questions = 0
+        self.prompt_tokens = 0
+        self.cached_tokens = 0
+        self.completion_tokens = 0
+        self.single_prompt_tokens = 0
+        # add() is called from the classification threads
+        self._lock = threading.Lock()
+
+    def add(self, usage, request, name_mapping, question_texts, model_name):
+        if usage is None:
+            return
+        details = getattr(usage, "prompt_tokens_details", None) or {}
+        if not isinstance(details, dict):
+            details = details.model_dump()
+        prompt_chars = len(json.dumps(request["messages"]))
+        single_chars = sum(
+            len(json.dumps(folder_name_request(name_mapping, text, model_name)["messages"]))
+            for text in question_texts
+        )
+        with self._lock:
+            self.requests += 1
+            self.questions += len(question_texts)
+            self.prompt_tokens += usage.prompt_tokens
+            self.cached_tokens += details.get("cached_tokens") or 0
+            self.completion_tokens += usage.completion_tokens
+            self.single_prompt_tokens += usage.prompt_tokens * single_chars / prompt_chars
+
+
+def print_token_usage(usage):
+    if usage.questions:
+        print(
+            "Tokens: {} prompt ({} cached), {} completion in {} requests for {} questions".format(
+                usage.prompt_tokens,
+                usage.cached_tokens,
+                usage.completion_tokens,
+                usage.requests,
+                usage.questions,
+            )
+        )
+        print(
+            "Prompt tokens per question: {:.0f}, about {:.0f} with one question per request".format(
+                usage.prompt_tokens / usage.questions,
+                usage.single_prompt_tokens / usage.questions,
+            )
+        )
@@ -1,10 +1,24 @@
 import json
 import argparse
-import html2text
 from glob import glob
 import os
-from openai_utils import get_folder_name
+import sys
+from openai_utils import (
+    get_folder_name,
+    get_folder_names,
+    normalize_text,
+    TokenUsage,
+    print_token_usage,
+)
+from question_text import DEFAULT_QUESTION_TOKENS, question_budget, prepare_question_text
+from llm_cache import add_cache_arguments, open_cache, print_cache_summary
+from openai_batch import OpenAIBatches, LocalBatches, batch_folder_names
 import uuid
+from concurrent.futures import Future, ThreadPoolExecutor
+
+# shared with migration/create_quiz_bank.py
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "migration"))
+from folder_names import FolderNames
 
 
 parser = argparse.ArgumentParser()
@@ -18,9 +32,57 @@ parser.add_argument(
 parser.add_argument(
     "--model_type", default="gpt-3.5-turbo", help="gpt-4-0125-preview or gpt-3.5-turbo"
 )
+parser.add_argument(
+    "--concurrency", type=int, default=8, help="Number of questions classified at a time"
+)
+parser.add_argument(
+    "--questions_per_request",
+    type=int,
+    default=1,
+    help="Classify this many questions in each request, sending the learning objectives once for all of them",
+)
+parser.add_argument(
+    "--question_tokens",
+    type=int,
+    default=DEFAULT_QUESTION_TOKENS,
+    help="Longer questions are shortened to this many tokens before classification",
+)
+parser.add_argument(
+    "--context_window",
+    type=int,
+    default=None,
+    help="Context window of --model_type in tokens, for models question_text.py does not know",
+)
+add_cache_arguments(parser)
+parser.add_argument(
+    "--batch",
+    action="store_true",
+    help="Classify all questions in one OpenAI Batch API job instead of one request each",
+)
+parser.add_argument(
+    "--batch_local",
+    action="store_true",
+    help="With --batch, run the batch file through normal requests instead of the Batch API",
+)
+parser.add_argument(
+    "--batch_id", default=None, help="With --batch, wait for this submitted batch"
+)
+parser.add_argument(
+    "--batch_file",
+    default=None,
+    help="With --batch, where to write the requests (default: organize_batch.jsonl next to the slug file)",
+)
+parser.add_argument(
+    "--batch_poll_seconds", type=int, default=60, help="How often to check on the batch"
+)
 args = parser.parse_args()
+if (args.batch_local or args.batch_id) and not args.batch:
+    parser.error("--batch_local and --batch_id need --batch")
+if args.questions_per_request < 1:
+    parser.error("--questions_per_request must be at least 1")
+if args.batch and args.questions_per_request > 1:
+    parser.error("--questions_per_request cannot be used with --batch")
 
-h = html2text.HTML2Text()
 question_root_folder = "{}/questions".format(args.pl_repo)
 question_list = glob(
     "{}/{}/*".format(question_root_folder, args.question_folder), recursive=True
@@ -34,41 +96,123 @@ if os.path.exists(args.slug_file_path):
         name_mapping = f.read()
 else:
     raise Exception(f"{args.slug_file_path} does not exists.")
+cache = open_cache(args, os.path.dirname(args.slug_file_path))
+# fit the questions of a request, with the slug file, in the model window
+budget = question_budget(
+    name_mapping,
+    args.model_type,
+    args.question_tokens,
+    args.questions_per_request,
+    args.context_window,
+)
 
 print("processing {} questions".format(len(question_list)))
 question_check_list = []
-count = -1
-unnamed_questions_count = 0
-for question_folder in question_list:
-    count += 1
+folder_names = FolderNames()
+usage = TokenUsage()
 
+# read every question first, so they can all be sent to the API at once
+questions = []
+for question_folder in question_list:
     with open("{}/info.json".format(question_folder), "r") as f:
         question_info = json.load(f)
     with open("{}/question.html".format(question_folder), "r") as f:
         question_html = f.read()
 
-    question_text = h.handle(question_html)
-    question_text = (
-        question_text.replace("\n", " ")
-        .replace("  ", " ")
-        .replace("  ", " ")
-        .replace("  ", " ")
+    question_text, full_tokens, tokens = prepare_question_text(
+        question_html, args.model_type, budget
     )
+    if tokens < full_tokens:
+        print(f"Shortened {question_folder} from {full_tokens} to {tokens} tokens")
+    questions.append((question_folder, question_info, question_html, question_text))
 
-    if len(question_text) > 5000:
-        # if the question is too long. do not call the API to save cost
-        print(
-            f"Question too long. Use `others` for question {count}: {question_folder}"
+
+def classify_chunk(chunk):
+    """Classify the {text key: question text} of `chunk` in one request and
+    fill in their futures"""
+    try:
+        results = get_folder_names(
+            name_mapping,
+            list(chunk.values()),
+            model_name=args.model_type,
+            cache=cache,
+            usage=usage,
         )
-        # use others/unnamed_question_1, ...
-        lecture_obj_slug = "others"
-        question_slug = f"unnamed-question-{unnamed_questions_count}"
-        question_title = f"Unnamed Question {unnamed_questions_count}"
-        unnamed_questions_count += 1
-    else:
-        responses = get_folder_name(
-            name_mapping, question_text, model_name=args.model_type
+    except Exception as e:
+        results = [e] * len(chunk)
+    for text_key, result in zip(chunk, results):
+        if isinstance(result, Exception):
+            submitted[text_key].set_exception(result)
+        else:
+            submitted[text_key].set_result(result)
+
+
+# classify up to --concurrency questions at a time, but move them one by one in
+# the sorted order, so the slugs and suffixes do not depend on response timing
+with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+    futures = []
+    # normalized text -> future, so identical questions are only sent once
+    submitted = {}
+    # normalized text -> question text, with --batch
+    batched = {}
+    # normalized text -> question text, with --questions_per_request
+    chunked = {}
+    for (_, _, _, question_text) in questions:
+        text_key = normalize_text(question_text)
+        if text_key not in submitted and args.batch:
+            # filled in below, once the batch is done
+            submitted[text_key] = Future()
+            batched[text_key] = question_text
+        elif text_key not in submitted and args.questions_per_request > 1:
+            # filled in by classify_chunk
+            submitted[text_key] = Future()
+            chunked[text_key] = question_text
+        elif text_key not in submitted:
+            submitted[text_key] = pool.submit(
+                get_folder_name,
+                name_mapping,
+                question_text,
+                model_name=args.model_type,
+                cache=cache,
+                usage=usage,
+            )
+        futures.append(submitted[text_key])
+    chunked = list(chunked.items())
+    for i in range(0, len(chunked), args.questions_per_request):
+        pool.submit(classify_chunk, dict(chunked[i : i + args.questions_per_request]))
+    if batched:
+        if args.batch_local:
+            batches = LocalBatches(concurrency=args.concurrency)
+        else:
+            batches = OpenAIBatches()
+        results = batch_folder_names(
+            batches,
+            name_mapping,
+            batched,
+            args.model_type,
+            args.batch_file
+            or os.path.join(os.path.dirname(args.slug_file_path), "organize_batch.jsonl"),
+            poll_seconds=args.batch_poll_seconds,
+            batch_id=args.batch_id,
+            cache=cache,
         )
+        for text_key, result in results.items():
+            if isinstance(result, Exception):
+                submitted[text_key].set_exception(result)
+            else:
+                submitted[text_key].set_result(result)
+
+    unnamed_questions_count = 0
+    for count, (question, future) in enumerate(zip(questions, futures)):
+        (question_folder, question_info, question_html, question_text) = question
+
+        try:
+            # copied, as identical questions share the response
+            responses = dict(future.result())
+        except Exception as e:
+            print(f"[Warning] Could not classify question {count}: {question_folder}: {e}")
+            question_check_list.append(question_folder)
+            responses = {}
 
         key_list = list(responses.keys())
         if "lec_slug" not in key_list:
@@ -84,54 +228,37 @@ for question_folder in question_list:
         if "question_title" not in key_list:
             responses["question_title"] = "Unnamed question"
 
-    # add suffix if the question folder already exists
-    suffix = 0
-    if os.path.exists(
-        os.path.join(
-            question_root_folder,
-            responses["lec_slug"],
-            responses["lo_slug"],
+        # add suffix if the question folder already exists
+        responses["question_slug"] = folder_names.allocate(
+            os.path.join(question_root_folder, responses["lec_slug"], responses["lo_slug"]),
             responses["question_slug"],
         )
-    ):
-        new_question_slug = responses["question_slug"]
-        while os.path.exists(
-            os.path.join(
-                question_root_folder,
-                responses["lec_slug"],
-                responses["lo_slug"],
-                new_question_slug,
-            )
+
+        # create question folder
+        new_folder = question_root_folder
+        for new_folder_extension in [responses["lec_slug"], responses["lo_slug"], responses["question_slug"]]:
+            new_folder += "/{}".format(new_folder_extension)
+            if os.path.exists(new_folder) is False:
+                os.mkdir(new_folder)
+
+        # write data
+        question_info["uuid"] = str(uuid.uuid4())
+        question_info["title"] = responses["question_title"]
+        question_info["topic"] = responses["lec_slug"].replace("lec_", "")
+        question_info["tags"] = [responses["lo_slug"].replace("obj_", "")]
+        if (
+            "gradingMethod" in question_info.keys()
+            and question_info["gradingMethod"] == "Manual"
         ):
-            suffix += 1
-            new_question_slug = f"{responses["question_slug"]}_{suffix}"
-        responses["question_slug"] = new_question_slug
-
-    # create question folder
-    new_folder = question_root_folder
-    for new_folder_extension in [responses["lec_slug"], responses["lo_slug"], responses["question_slug"]]:
-        new_folder += "/{}".format(new_folder_extension)
-        if os.path.exists(new_folder) is False:
-            os.mkdir(new_folder)
-
-    # write data
-    question_info["uuid"] = str(uuid.uuid4())
-    question_info["title"] = responses["question_title"]
-    question_info["topic"] = responses["lec_slug"].replace("lec_", "")
-    question_info["tags"] = [responses["lo_slug"].replace("obj_", "")]
-    if (
-        "gradingMethod" in question_info.keys()
-        and question_info["gradingMethod"] == "Manual"
-    ):
-        question_info["tags"].append("manual")
-
-    with open("{}/info.json".format(new_folder), "w") as f:
-        json.dump(question_info, f, indent=2)
-
-    with open("{}/question.html".format(new_folder), "w") as f:
-        f.write(question_html)
-
-    print("Copy Question {} from {} to {}.".format(count, question_folder, new_folder))
+            question_info["tags"].append("manual")
+
+        with open("{}/info.json".format(new_folder), "w") as f:
+            json.dump(question_info, f, indent=2)
+
+        with open("{}/question.html".format(new_folder), "w") as f:
+            f.write(question_html)
+
+        print("Copy Question {} from {} to {}.".format(count, question_folder, new_folder))
 
 if len(question_check_list):
     print(
@@ -140,3 +267,8 @@ if len(question_check_list):
     with open("question_check_list.txt", "w") as f:
         for q in question_check_list:
             f.write("{}\n".format(q))
+
+if cache is not None:
+    cache.close()
+print_cache_summary(cache)
+print_token_usage(usage)
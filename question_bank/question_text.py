@@ -0,0 +1,135 @@
+import re
+import json
+import html2text
+import tiktoken
+from openai_utils import folder_name_request, folder_names_request
+
+
+# tokens kept of each question, unless the model window is smaller
+DEFAULT_QUESTION_TOKENS = 1000
+# room left for each question's JSON response
+RESPONSE_TOKENS = 100
+# context window of the models used with organize_questions, other models
+# only get the --question_tokens limit unless --context_window is given
+MODEL_WINDOWS = {
+    "gpt-3.5-turbo": 16385,
+    "gpt-4": 8192,
+    "gpt-4-turbo": 128000,
+    "gpt-4-0125-preview": 128000,
+    "gpt-4o": 128000,
+    "gpt-4o-mini": 128000,
+}
+
+# html2text output, with mark_code set
+CODE = re.compile(r"\[code\](.*?)\[/code\]", re.S)
+# images, and base64 data pasted in the question
+DATA = re.compile(r"!\[[^\]]*\]\([^)]*\)|data:[\w/+.-]+;base64,[A-Za-z0-9+/=]+")
+# consecutive lines with a column separator
+TABLE = re.compile(r"(?:^[^\n]*\|[^\n]*(?:\n|$))+", re.M)
+
+_encodings = {}
+
+
+class _ApproximateEncoding:
+    """About four characters per token, when tiktoken has no encoding file"""
+
+    def encode(self, text):
+        return [text[i : i + 4] for i in range(0, len(text), 4)]
+
+    def decode(self, tokens):
+        return "".join(tokens)
+
+
+def encoding_for(model_name):
+    """The tiktoken encoding of `model_name` (cl100k_base for unknown models)"""
+    if model_name not in _encodings:
+        try:
+            try:
+                _encodings[model_name] = tiktoken.encoding_for_model(model_name)
+            except KeyError:
+                _encodings[model_name] = tiktoken.get_encoding("cl100k_base")
+        except Exception:
+            # the encodings are downloaded on first use
+            if not any(isinstance(e, _ApproximateEncoding) for e in _encodings.values()):
+                print("[Warning] tiktoken encodings unavailable, estimating 4 chars/token")
+            _encodings[model_name] = _ApproximateEncoding()
+    return _encodings[model_name]
+
+
+def count_tokens(text, model_name):
+    return len(encoding_for(model_name).encode(text))
+
+
+def question_budget(
+    name_mapping,
+    model_name,
+    max_tokens=DEFAULT_QUESTION_TOKENS,
+    questions_per_request=1,
+    window=None,
+):
+    """Tokens each question may use, so that `questions_per_request` questions,
+    the prompt and the responses fit in the window of the model"""
+    window = window or MODEL_WINDOWS.get(model_name)
+    if window is None:
+        print(f"[Warning] Unknown context window of {model_name}, set it with --context_window")
+        return max_tokens
+    if questions_per_request > 1:
+        request = folder_names_request(name_mapping, [""] * questions_per_request, model_name)
+    else:
+        request = folder_name_request(name_mapping, "", model_name)
+    prompt_tokens = count_tokens(json.dumps(request["messages"]), model_name)
+    available = (
+        window
+        - prompt_tokens
+        - RESPONSE_TOKENS * questions_per_request
+    ) // questions_per_request
+    if available <= 0:
+        raise Exception(
+            f"The prompt ({prompt_tokens} tokens) does not fit in the window of {model_name}."
+        )
+    return min(max_tokens, available)
+
+
+def _collapse(text):
+    return " ".join(text.split())
+
+
+def _shorten(text, budget, encoding):
+    """Keep the start and the end of `text`, where the question usually is"""
+    tokens = encoding.encode(text)
+    if len(tokens) <= budget:
+        return text
+    budget -= len(encoding.encode(" [...] "))
+    if budget <= 0:
+        return "[...]"
+    head = budget * 2 // 3
+    tail = budget - head
+    return "{} [...] {}".format(
+        encoding.decode(tokens[:head]).strip(), encoding.decode(tokens[-tail:]).strip()
+    )
+
+
+def prepare_question_text(question_html, model_name, budget=DEFAULT_QUESTION_TOKENS):
+    """Text of a question for the classification prompt, in at most `budget` tokens.
+
+    Images and embedded data are always dropped. Over the budget, code blocks
+    and then tables are replaced by a placeholder, and if that is not enough
+    the middle of the text is cut. Returns the text and its token count
+    before and after.
+    """
+    h = html2text.HTML2Text()
+    h.mark_code = True
+    h.body_width = 0
+    text = DATA.sub("", h.handle(question_html))
+    encoding = encoding_for(model_name)
+
+    full = _collapse(CODE.sub(r"\1", text))
+    full_tokens = len(encoding.encode(full))
+    if full_tokens <= budget:
+        return full, full_tokens, full_tokens
+
+    text = CODE.sub("\n[code omitted]\n", text)
+    if len(encoding.encode(_collapse(text))) > budget:
+        text = TABLE.sub("[table omitted]\n", text)
+    text = _shorten(_collapse(text), budget, encoding)
+    return text, full_tokens, len(encoding.encode(text))
@@ -0,0 +1,7 @@
+import os
+import sys
+
+# the scripts import their helper modules as siblings
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, "migration"))
+sys.path.insert(0, os.path.join(ROOT, "question_bank"))
@@ -0,0 +1,117 @@
+import itertools
+from types import SimpleNamespace
+import pytest
+from allocation import QuestionAllocator
+from folder_names import FolderNames
+from manifest import Manifest
+
+
+def allocate(tmp_path, copies, previous=None):
+    """Place `copies` ([(manifest key, digest, contents)]) like one run of
+    create_quiz_bank.py, on a manifest holding `previous` ({key: (folder, digest)}).
+
+    Returns the manifest entries after the run and the jobs written.
+    """
+    questions_dir = tmp_path / "questions"
+    questions_dir.mkdir(exist_ok=True)
+    manifest = Manifest(str(tmp_path))
+    for key, (folder, digest) in (previous or {}).items():
+        (questions_dir / folder).mkdir(exist_ok=True)
+        manifest.record(key, folder, digest, f"uuid-{folder}")
+    allocator = QuestionAllocator(manifest, FolderNames(), str(questions_dir))
+    jobs = []
+    for key, digest, contents in copies:
+        question = SimpleNamespace(id=key, digest=digest, text="")
+        shared = None if contents is None else (500, contents)
+        jobs += allocator.place(key, question, f"new-{key}", None, shared)
+    jobs += allocator.finish()
+    # the write stage
+    for job in jobs:
+        manifest.record(job["manifest_key"], job["folder"], job["hash"], job["uuid"])
+    return manifest.questions, jobs
+
+
+SHARED = {"A": ("F", "a0"), "B": ("F", "b0")}
+
+
+def orders(*copies):
+    return pytest.mark.parametrize("copies", list(itertools.permutations(copies)))
+
+
+def test_new_copies_share_one_folder(tmp_path):
+    manifest, jobs = allocate(tmp_path, [("A", "a0", "c0"), ("B", "b0", "c0")])
+    assert [job["manifest_key"] for job in jobs] == ["A"]
+    assert manifest["A"]["folder"] == manifest["B"]["folder"] == "new-A"
+    assert manifest["A"]["uuid"] == manifest["B"]["uuid"]
+
+
+def test_no_sharing_without_key(tmp_path):
+    manifest, jobs = allocate(tmp_path, [("A", "a0", None), ("B", "b0", None)])
+    assert len(jobs) == 2
+    assert manifest["A"]["folder"] != manifest["B"]["folder"]
+
+
+@orders(("A", "a0", "c0"), ("B", "b0", "c0"))
+def test_unchanged_copies_skipped(tmp_path, copies):
+    manifest, jobs = allocate(tmp_path, copies, SHARED)
+    assert jobs == []
+    assert manifest["A"]["folder"] == manifest["B"]["folder"] == "F"
+
+
+@orders(("A", "a0", "c0"), ("B", "b1", "c1"))
+def test_edited_copy_moves_out(tmp_path, copies):
+    manifest, jobs = allocate(tmp_path, copies, SHARED)
+    assert [(job["manifest_key"], job["folder"]) for job in jobs] == [("B", "new-B")]
+    assert manifest["A"] == {"folder": "F", "hash": "a0", "uuid": "uuid-F", "updated_at": None}
+    assert manifest["B"]["uuid"] != "uuid-F"
+
+
+@orders(("A", "a1", "c1"), ("B", "b1", "c1"))
+def test_copies_edited_the_same_way_stay_in_place(tmp_path, copies):
+    manifest, jobs = allocate(tmp_path, copies, SHARED)
+    assert [(job["folder"], job["uuid"]) for job in jobs] == [("F", "uuid-F")]
+    assert manifest["A"]["folder"] == manifest["B"]["folder"] == "F"
+    assert manifest["A"]["uuid"] == manifest["B"]["uuid"] == "uuid-F"
+    assert (manifest["A"]["hash"], manifest["B"]["hash"]) == ("a1", "b1")
+
+
+@orders(("A", "a1", "c1"), ("B", "b2", "c2"))
+def test_copies_edited_differently(tmp_path, copies):
+    manifest, jobs = allocate(tmp_path, copies, SHARED)
+    first = copies[0][0]
+    second = copies[1][0]
+    assert [(job["manifest_key"], job["folder"]) for job in jobs] == [
+        (first, "F"),
+        (second, f"new-{second}"),
+    ]
+    assert manifest[first]["uuid"] == "uuid-F"
+
+
+def test_copy_not_fetched_keeps_the_folder(tmp_path):
+    manifest, jobs = allocate(tmp_path, [("A", "a1", "c1")], SHARED)
+    assert [(job["manifest_key"], job["folder"]) for job in jobs] == [("A", "new-A")]
+    assert manifest["B"]["folder"] == "F"
+
+
+@orders(("A", "a0", "c0"), ("B", "b1", "c1"), ("C", "c", "c1"))
+def test_edited_copy_joins_a_copy_with_its_new_contents(tmp_path, copies):
+    manifest, jobs = allocate(tmp_path, copies, SHARED)
+    assert len(jobs) == 1
+    assert manifest["A"]["folder"] == "F"
+    assert manifest["B"]["folder"] == manifest["C"]["folder"] != "F"
+
+
+@orders(("A", "a1", "c1"), ("B", "b1", "c1"), ("C", "c", "c1"))
+def test_nothing_written_is_replaced(tmp_path, copies):
+    manifest, jobs = allocate(tmp_path, copies, SHARED)
+    # each folder is written at most once
+    folders = [job["folder"] for job in jobs]
+    assert len(folders) == len(set(folders))
+    assert len({entry["folder"] for entry in manifest.values()}) == len(
+        {entry["uuid"] for entry in manifest.values()}
+    )
+
+
+def test_only_copy_updated_in_place(tmp_path):
+    manifest, jobs = allocate(tmp_path, [("A", "a1", "c1")], {"A": ("G", "a0")})
+    assert [(job["folder"], job["uuid"]) for job in jobs] == [("G", "uuid-G")]
@@ -0,0 +1,47 @@
+from canvas import map_quiz_kinds, select_quizzes
+
+LISTINGS = {
+    "classic": [
+        [
+            {"id": 1, "title": "Midterm 1", "updated_at": "2024-01-10T12:00:00Z"},
+            {"id": 2, "title": "Practice", "updated_at": "2024-03-01T08:00:00Z"},
+        ],
+        [{"id": 3, "title": "Midterm 2", "updated_at": None}],
+    ],
+    "new": [[{"id": 4, "title": "Final"}, {"id": "1", "title": "Shadowed"}]],
+}
+
+
+def test_map_quiz_kinds():
+    kinds = map_quiz_kinds(LISTINGS)
+    assert {quiz_id: kind for quiz_id, (kind, _) in kinds.items()} == {
+        "1": "classic",
+        "2": "classic",
+        "3": "classic",
+        "4": "new",
+    }
+    assert kinds["1"][1]["title"] == "Midterm 1"
+
+
+def test_map_quiz_kinds_empty():
+    assert map_quiz_kinds({"classic": [], "new": []}) == {}
+
+
+def test_select_all():
+    assert select_quizzes(map_quiz_kinds(LISTINGS)) == ["1", "2", "3", "4"]
+
+
+def test_select_by_title():
+    assert select_quizzes(map_quiz_kinds(LISTINGS), title="^Midterm") == ["1", "3"]
+
+
+def test_select_updated_since():
+    kinds = map_quiz_kinds(LISTINGS)
+    # quizzes without updated_at (New Quizzes, or null) are always kept
+    assert select_quizzes(kinds, updated_since="2024-02-01") == ["2", "3", "4"]
+    assert select_quizzes(kinds, updated_since="2024-01-10T12:00:00Z") == ["1", "2", "3", "4"]
+
+
+def test_select_title_and_updated_since():
+    kinds = map_quiz_kinds(LISTINGS)
+    assert select_quizzes(kinds, "Midterm|Final", "2024-02-01") == ["3", "4"]
@@ -0,0 +1,39 @@
+import asyncio
+from canvas_cache import ResponseCache
+from canvas_session import CanvasResponse
+from async_canvas import AsyncCanvas
+
+URL = "https://canvas.test/api/v1/courses/1"
+
+
+def response(body, status_code=200):
+    return CanvasResponse(status_code, {"ETag": '"1"'}, body, URL)
+
+
+def test_entries_are_per_token(tmp_path):
+    ResponseCache(str(tmp_path), token="alice").store(URL, response(b"alice's"))
+    assert ResponseCache(str(tmp_path), token="bob").get(URL) is None
+    assert ResponseCache(str(tmp_path), token="alice").get(URL).content == b"alice's"
+
+
+def test_token_not_stored(tmp_path):
+    ResponseCache(str(tmp_path), token="secret-token").store(URL, response(b"{}"))
+    for path in tmp_path.iterdir():
+        assert b"secret-token" not in path.read_bytes()
+        assert "secret-token" not in path.name
+
+
+def test_async_revalidation(tmp_path):
+    cache = ResponseCache(str(tmp_path), token="alice")
+    cache.store(URL, response(b"cached"))
+    canvas = AsyncCanvas("alice", "https://canvas.test/api/", cache=cache)
+    sent = []
+
+    async def get(url, headers=None):
+        sent.append(headers)
+        return response(b"", 304)
+
+    canvas._get = get
+    assert asyncio.run(canvas._cached_get(URL)).content == b"cached"
+    assert sent == [{"If-None-Match": '"1"'}]
+    assert cache.hits == 1
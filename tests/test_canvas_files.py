@@ -0,0 +1,88 @@
+import requests
+from canvas_files import CanvasFiles, file_reference, file_references
+
+
+def test_relative_links():
+    html = '<img src="/courses/1/files/456/preview"><a href="/files/789/download?verifier=x">'
+    assert file_references(html) == {"456", "789"}
+
+
+def test_absolute_relative_and_foreign_links():
+    pattern = file_reference("canvas.ubc.ca")
+    html = (
+        '<img src="https://canvas.ubc.ca/courses/1/files/1/preview">'
+        "<img src='http://canvas.ubc.ca/files/2/download?verifier=x'>"
+        '<a href="/courses/1/files/3">'
+        '<a href="/files/4/download">'
+        '<img src="https://canvas.ubc.ca.example.com/files/5">'
+        '<img src="https://other.instructure.com/courses/1/files/6/preview">'
+    )
+    assert file_references(html, pattern) == {"1", "2", "3", "4"}
+
+
+def test_absolute_links_need_a_host():
+    html = '<img src="https://canvas.ubc.ca/files/1"><img src="/files/2">'
+    assert file_references(html) == {"2"}
+
+
+def test_links_on_the_canvas_host_only():
+    pattern = file_reference("canvas.ubc.ca")
+    html = (
+        '<img src="https://canvas.ubc.ca/courses/1/files/456/preview">'
+        '<a href="https://example.com/files/789">'
+        '<a href="https://example.com/docs/courses/2/files/12">'
+    )
+    assert file_references(html, pattern) == {"456"}
+
+
+class Session:
+    pool_size = 2
+
+    def request(self, method, url):
+        raise AssertionError(f"{url} should not be downloaded")
+
+
+class LockedFileCanvas:
+    api_url = "https://canvas.ubc.ca/api/v1"
+    session = Session()
+
+    def file(self, file_id):
+        if file_id == "1":
+            raise requests.exceptions.ConnectionError("connection reset")
+        # no "url" for locked files
+        return {"id": file_id, "locked_for_user": True}
+
+
+def test_failed_downloads_are_counted(tmp_path):
+    files = CanvasFiles(LockedFileCanvas(), str(tmp_path))
+    files.fetch(["1", "2"])
+    assert (files.downloaded, files.failed) == (0, 2)
+
+
+def test_failed_files_reported_once(tmp_path, capsys):
+    canvas = LockedFileCanvas()
+    requested = []
+    file = canvas.file
+    canvas.file = lambda file_id: requested.append(file_id) or file(file_id)
+    files = CanvasFiles(canvas, str(tmp_path))
+    files.fetch(["1", "2"])
+    files.fetch(["2", "1"])
+    assert sorted(requested) == ["1", "2"]
+    assert files.failed == 2
+    assert capsys.readouterr().out.count("Canvas file 2") == 1
+
+
+def test_files_without_canvas(tmp_path, capsys):
+    files = CanvasFiles(None, str(tmp_path), host="canvas.ubc.ca")
+    files.add("1", "a.png", b"png")
+    question_dir = tmp_path / "q"
+    question_dir.mkdir()
+    (question_dir / "question.html").write_text(
+        '<img src="https://canvas.ubc.ca/files/1"><img src="/files/2">'
+    )
+    files.localize([str(question_dir)])
+    html = (question_dir / "question.html").read_text()
+    assert "/files/1" not in html
+    assert '"/files/2"' in html
+    assert files.referenced == {"1", "2"}
+    assert "Canvas file 2" in capsys.readouterr().out
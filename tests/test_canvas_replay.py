@@ -0,0 +1,228 @@
+import json
+import asyncio
+import threading
+from types import SimpleNamespace
+import pytest
+import canvas
+import async_canvas
+from canvas_replay import Cassette, make_server
+
+COURSE = {"id": 1, "name": "Course", "course_code": "C1", "term": {"name": "T"}}
+QUIZ = {"id": 5, "title": "Quiz", "time_limit": None}
+NEW_QUIZ = {"id": 6, "title": "New Quiz"}
+# a New Quizzes item drawing from item bank 900
+BANK_ITEM = {
+    "id": "i1",
+    "position": 1,
+    "entry_type": "Bank",
+    "entry": {"id": 900, "title": "Bank"},
+    "points_possible": 1,
+}
+GROUP = {"id": 70, "name": "Pick one", "pick_count": 1, "question_points": 2, "position": 3}
+
+
+def question(i, group_id=None):
+    return {
+        "id": 100 + i,
+        "quiz_group_id": group_id,
+        "position": i,
+        "question_name": f"Question {i}",
+        "question_type": "multiple_choice_question",
+        "question_text": f"<p>Question {i}</p>",
+        "points_possible": 1,
+        "answers": [{"id": 1, "text": "a", "weight": 100}],
+    }
+
+
+QUESTIONS = [question(i, GROUP["id"] if i in (4, 9) else None) for i in range(1, 26)]
+
+
+def cassette():
+    cassette = Cassette("unused", {"1": [5]})
+    cassette.endpoints = {
+        "v1/courses/1?include%5B%5D=term": {"status_code": 200, "body": COURSE},
+        "v1/courses/1/quizzes": {"status_code": 200, "body": [QUIZ]},
+        "v1/courses/1/quizzes/5": {"status_code": 200, "body": QUIZ},
+        "v1/courses/1/quizzes/5/questions": {"status_code": 200, "body": QUESTIONS},
+        "v1/courses/1/quizzes/5/groups/70": {"status_code": 200, "body": GROUP},
+        "quiz/v1/courses/1/quizzes": {"status_code": 200, "body": [NEW_QUIZ]},
+        "quiz/v1/courses/1/quizzes/6": {"status_code": 200, "body": NEW_QUIZ},
+        "quiz/v1/courses/1/quizzes/6/items": {"status_code": 200, "body": []},
+        "quiz/v1/courses/1/quizzes/7": {"status_code": 200, "body": {"id": 7, "title": "Retake"}},
+        "quiz/v1/courses/1/quizzes/7/items": {"status_code": 200, "body": [BANK_ITEM]},
+        "quiz/v1/courses/1/quizzes/8": {"status_code": 200, "body": {"id": 8, "title": "Makeup"}},
+        "quiz/v1/courses/1/quizzes/8/items": {"status_code": 200, "body": [BANK_ITEM]},
+        "quiz/v1/banks/900/bank_entries": {"status_code": 200, "body": []},
+    }
+    return cassette
+
+
+@pytest.fixture
+def replay(tmp_path, monkeypatch):
+    """Start a replay server; returns (api_url, server) for the given options"""
+    servers = []
+    monkeypatch.setenv("CANVAS_ACCESS_TOKEN", "replay")
+
+    def start(**options):
+        server = make_server(cassette(), latency=0.01, **options)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        servers.append(server)
+        return f"http://127.0.0.1:{server.server_port}/api/", server
+
+    yield start
+    for server in servers:
+        server.shutdown()
+        server.server_close()
+    # the api url and the session are shared through class attributes
+    for name in ["_api_url", "_session"]:
+        if name in vars(canvas.Canvas):
+            delattr(canvas.Canvas, name)
+
+
+def sync_canvas(api_url, tmp_path):
+    config = tmp_path / "config.json"
+    config.write_text(json.dumps({"access_token": "replay", "api_url": api_url}))
+    return canvas.Canvas(args=SimpleNamespace(config_file=str(config), pool_size=4))
+
+
+def ids(pages):
+    return [[item["id"] for item in page] for page in pages]
+
+
+def test_numbered_pages_fanned_out_in_order(replay, tmp_path):
+    (api_url, server) = replay(page_size=10)
+    pages = sync_canvas(api_url, tmp_path).request("v1/courses/1/quizzes/5/questions?per_page=100")
+    assert ids(pages) == [
+        [q["id"] for q in QUESTIONS[:10]],
+        [q["id"] for q in QUESTIONS[10:20]],
+        [q["id"] for q in QUESTIONS[20:]],
+    ]
+    assert server.RequestHandlerClass.request_count == 3
+
+
+def test_async_numbered_pages_in_order(replay):
+    (api_url, _) = replay(page_size=10)
+
+    async def fetch():
+        async with async_canvas.AsyncCanvas("replay", api_url, 4) as client:
+            return await client.request("v1/courses/1/quizzes/5/questions?per_page=100")
+
+    assert ids(asyncio.run(fetch())) == [
+        [q["id"] for q in QUESTIONS[:10]],
+        [q["id"] for q in QUESTIONS[10:20]],
+        [q["id"] for q in QUESTIONS[20:]],
+    ]
+
+
+def test_bookmarks_follow_next(replay, tmp_path):
+    (api_url, server) = replay(page_size=10, bookmarks=True)
+    client = sync_canvas(api_url, tmp_path)
+    response = client.session.get(api_url + "v1/courses/1/quizzes/5/questions?per_page=100")
+    # no `last` link, so the pages cannot be numbered ahead
+    assert canvas.remaining_page_urls(response) is None
+    pages = client.request("v1/courses/1/quizzes/5/questions?per_page=100")
+    assert [len(page) for page in pages] == [10, 10, 5]
+    assert [item["id"] for page in pages for item in page] == [q["id"] for q in QUESTIONS]
+
+
+def dump(fetched):
+    return json.dumps(
+        [
+            (
+                course.data,
+                quiz.data,
+                quiz.kind,
+                [question.to_dict() for question in questions.values()],
+                groups,
+            )
+            for course, quiz, questions, groups in fetched
+        ],
+        sort_keys=True,
+    )
+
+
+@pytest.mark.parametrize("bookmarks", [False, True])
+def test_fetch_all_matches_sync_path(replay, tmp_path, bookmarks):
+    (api_url, _) = replay(page_size=10, bookmarks=bookmarks)
+    client = sync_canvas(api_url, tmp_path)
+    course = client.course(1)
+    quiz = course.quiz(5)
+    (questions, groups) = quiz.questions()
+    fetched = asyncio.run(async_canvas.fetch_all("replay", api_url, {"1": [5]}, 4))
+    assert dump(fetched) == dump([(course, quiz, questions, groups)])
+    assert [q.position for q in questions.values()][:5] == [1, 2, 3, 3, 4]
+
+
+def test_each_group_requested_once(replay, tmp_path):
+    (api_url, server) = replay(page_size=10)
+    quiz = sync_canvas(api_url, tmp_path).course(1).quiz(5)
+    before = server.RequestHandlerClass.request_count
+    (questions, groups) = quiz.questions()
+    # three pages of questions, and group 70 once for its two questions
+    assert server.RequestHandlerClass.request_count - before == 3 + 1
+    assert list(groups) == [70]
+    assert [q.points for q in questions.values() if q.group_id == 70] == [2, 2]
+
+
+def test_objects_share_one_keep_alive_session(replay, tmp_path):
+    (api_url, server) = replay(page_size=10)
+    client = sync_canvas(api_url, tmp_path)
+    course = client.course(1)
+    quiz = course.quiz(5)
+    quiz.questions()
+    assert course.session is client.session and quiz.session is client.session
+    stats = client.connection_stats()
+    assert stats["requests"] == server.RequestHandlerClass.request_count
+    assert stats["connections_opened"] <= 4 < stats["requests"]
+
+
+def test_quiz_ids_fetched_directly(replay, tmp_path):
+    (api_url, server) = replay()
+    course = sync_canvas(api_url, tmp_path).course(1)
+    before = server.RequestHandlerClass.request_count
+    assert course.quiz(5).kind == "classic"
+    assert server.RequestHandlerClass.request_count - before == 1
+    # not a classic quiz: a 404, then the New Quizzes API
+    assert course.quiz(6).kind == "new"
+    assert server.RequestHandlerClass.request_count - before == 3
+    assert course.kinds is None
+
+
+def test_listed_quizzes_not_fetched_again(replay, tmp_path):
+    (api_url, server) = replay()
+    course = sync_canvas(api_url, tmp_path).course(1)
+    assert course.quiz_ids() == ["5", "6"]
+    before = server.RequestHandlerClass.request_count
+    assert [course.quiz(5).kind, course.quiz(6).kind] == ["classic", "new"]
+    assert server.RequestHandlerClass.request_count == before
+
+
+@pytest.mark.parametrize("select", [None, (None, None)])
+def test_async_quiz_lookup(replay, select):
+    (api_url, server) = replay()
+    fetched = asyncio.run(async_canvas.fetch_all("replay", api_url, {"1": [6]}, 4, select=select))
+    assert [(quiz.id, quiz.kind) for _, quiz, _, _ in fetched] == (
+        [(6, "new")] if select is None else [(5, "classic"), (6, "new")]
+    )
+    if select is None:
+        # the course, quiz 6 from both APIs and its items, without listings
+        assert server.RequestHandlerClass.request_count == 4
+
+
+def test_item_bank_fetched_once_per_course(replay, tmp_path):
+    (api_url, server) = replay()
+    course = sync_canvas(api_url, tmp_path).course(1)
+    quizzes = [course.new_quiz(7), course.new_quiz(8)]
+    before = server.RequestHandlerClass.request_count
+    results = course.new_quiz_questions(quizzes)
+    # the two /items listings, then bank 900 once for both quizzes
+    assert server.RequestHandlerClass.request_count - before == 3
+    assert [list(groups) for _, groups in results] == [["i1"], ["i1"]]
+
+
+def test_async_item_bank_fetched_once_per_course(replay):
+    (api_url, server) = replay()
+    fetched = asyncio.run(async_canvas.fetch_all("replay", api_url, {"1": [7, 8]}, 4))
+    assert [quiz.id for _, quiz, _, _ in fetched] == [7, 8]
+    # the course, each quiz from both APIs and its items, and bank 900 once
+    assert server.RequestHandlerClass.request_count == 1 + 2 * 3 + 1
@@ -0,0 +1,51 @@
+import json
+import pytest
+from canvas_session import iter_json_array
+
+ITEMS = [
+    {"id": 1, "question_text": "<p>[a], {b}</p>", "points_possible": 1500.25},
+    {"id": 2, "question_name": "café — été", "answers": []},
+    [1, 2, {"nested": "]"}],
+    'escaped \" quote',
+    123456,
+    None,
+]
+BODY = json.dumps(ITEMS, ensure_ascii=False, indent=1).encode("utf-8")
+
+
+def chunked(data, size):
+    return [data[i : i + size] for i in range(0, len(data), size)]
+
+
+@pytest.mark.parametrize("size", [1, 2, 3, 7, 64, len(BODY)])
+def test_any_chunk_boundary(size):
+    assert list(iter_json_array(chunked(BODY, size))) == ITEMS
+
+
+def test_every_split_point():
+    for i in range(1, len(BODY)):
+        assert list(iter_json_array([BODY[:i], BODY[i:]])) == ITEMS
+
+
+def test_number_split_across_chunks():
+    assert list(iter_json_array([b"[1500", b".25, 1", b"2]"])) == [1500.25, 12]
+
+
+def test_empty_array():
+    assert list(iter_json_array([b" [ ", b"] "])) == []
+
+
+def test_items_are_yielded_before_the_rest_arrives():
+    items = iter_json_array(iter([b'[{"id": 1}, ', b"{"]))
+    assert next(items) == {"id": 1}
+
+
+@pytest.mark.parametrize("body", [b"", b"[", b'[{"id": 1}', b'[{"id": 1},', b"[1, 2"])
+def test_truncated(body):
+    with pytest.raises(ValueError):
+        list(iter_json_array(chunked(body, 3)))
+
+
+def test_not_an_array():
+    with pytest.raises(ValueError):
+        list(iter_json_array([b'{"id": 1}']))
@@ -0,0 +1,103 @@
+import asyncio
+import pytest
+from canvas_session import CanvasResponse
+from canvas_throttle import RequestScheduler, HIGH_WATER_MARK, LOW_WATER_MARK
+
+
+def response(status_code=200, remaining=None, cost=None, body=b"{}"):
+    headers = {}
+    if remaining is not None:
+        headers["X-Rate-Limit-Remaining"] = str(remaining)
+    if cost is not None:
+        headers["X-Request-Cost"] = str(cost)
+    return CanvasResponse(status_code, headers, body, "https://canvas.test/api/v1/x")
+
+
+@pytest.mark.parametrize(
+    "remaining, limit",
+    [
+        (0, 4),
+        (LOW_WATER_MARK - 1, 4),
+        (LOW_WATER_MARK, 8),
+        (HIGH_WATER_MARK, 8),
+        (HIGH_WATER_MARK + 1, 9),
+    ],
+)
+def test_water_marks(remaining, limit):
+    scheduler = RequestScheduler(10)
+    scheduler.limit = 8
+    scheduler.update(response(remaining=remaining))
+    assert scheduler.limit == limit
+
+
+def test_limit_bounds():
+    scheduler = RequestScheduler(2)
+    assert not scheduler.update(response(remaining=700))
+    assert scheduler.limit == 2
+    scheduler.limit = 1
+    scheduler.update(response(remaining=0))
+    assert scheduler.limit == 1
+
+
+def test_cost_added_up():
+    scheduler = RequestScheduler(2)
+    scheduler.update(response(cost=1.5))
+    scheduler.update(response(cost=2, remaining=600))
+    assert (scheduler.request_cost, scheduler.remaining) == (3.5, 600)
+
+
+def test_throttled_requests_retried():
+    scheduler = RequestScheduler(4, max_tries=3, max_wait=0)
+    responses = iter(
+        [
+            response(429),
+            response(403, body=b"403 Forbidden (Rate Limit Exceeded)"),
+            response(200, remaining=500),
+        ]
+    )
+    assert scheduler.call(lambda: next(responses)).status_code == 200
+    assert scheduler.retries == 2
+    # a throttled response drops to one request at a time, then grows again
+    assert scheduler.limit == 2
+
+
+def test_retries_give_up():
+    scheduler = RequestScheduler(4, max_tries=2, max_wait=0)
+    assert scheduler.call(lambda: response(429)).status_code == 429
+    assert scheduler.retries == 1
+
+
+def test_other_403_not_retried():
+    scheduler = RequestScheduler(4, max_tries=3, max_wait=0)
+    assert scheduler.call(lambda: response(403, body=b"unauthorized")).status_code == 403
+    assert scheduler.retries == 0
+
+
+def test_raised_limit_wakes_async_waiters():
+    scheduler = RequestScheduler(2)
+    scheduler.limit = 1
+
+    async def run():
+        holding = asyncio.Event()
+        done = asyncio.Event()
+
+        async def in_flight():
+            async with scheduler.async_slot():
+                holding.set()
+                await done.wait()
+
+        async def waiting():
+            async with scheduler.async_slot():
+                pass
+
+        first = asyncio.create_task(in_flight())
+        await holding.wait()
+        second = asyncio.create_task(waiting())
+        await asyncio.sleep(0)
+        assert not second.done()
+        await scheduler.aupdate(response(remaining=HIGH_WATER_MARK + 1))
+        await asyncio.wait_for(second, 1)
+        done.set()
+        await first
+
+    asyncio.run(run())
@@ -0,0 +1,210 @@
+import os
+import sys
+import json
+import gzip
+import base64
+import subprocess
+import pytest
+from conftest import ROOT
+from question_model import Question
+from manifest import MANIFEST_FILE
+from snapshot import SNAPSHOT_VERSION, snapshot_files, snapshot_host
+
+
+def bank_question(question_id, text):
+    """A copy of question bank question 500, as Canvas returns it in a quiz"""
+    return Question.from_canvas(
+        {
+            "id": question_id,
+            "question_type": "multiple_choice_question",
+            "question_name": "Question",
+            "question_text": text,
+            "assessment_question_id": 500,
+            "points_possible": 1,
+            "position": 3,
+            "answers": [
+                {"id": 1, "text": "a", "weight": 100},
+                {"id": 2, "text": "b", "weight": 0},
+            ],
+        }
+    )
+
+
+@pytest.fixture
+def pl_repo(tmp_path):
+    repo = tmp_path / "pl"
+    repo.mkdir()
+    (repo / "infoCourse.json").write_text("{}")
+    return repo
+
+
+def migrate(pl_repo, tmp_path, quizzes, *options, files=None):
+    """Run create_quiz_bank.py on a snapshot of {quiz id: question}, with the
+    Canvas `files` ({file id: content}) of canvas.test when given"""
+    path = tmp_path / "snapshot.jsonl.gz"
+    with gzip.open(path, "wt") as f:
+        header = {"type": "snapshot", "version": SNAPSHOT_VERSION, "host": "canvas.test"}
+        f.write(json.dumps(header) + "\n")
+        for quiz_id, question in quizzes.items():
+            course = {"id": 1, "course_code": "C", "term": {"name": "T"}}
+            quiz = {"id": quiz_id, "title": f"Quiz{quiz_id}"}
+            f.write(
+                json.dumps(
+                    {"type": "quiz", "kind": "classic", "course": course, "quiz": quiz, "groups": None}
+                )
+                + "\n"
+            )
+            f.write(json.dumps({"type": "question", "question": question.to_dict()}) + "\n")
+        for file_id, content in (files or {}).items():
+            record = {
+                "type": "file",
+                "id": file_id,
+                "name": "saved.png",
+                "content": base64.b64encode(content).decode("ascii"),
+            }
+            f.write(json.dumps(record) + "\n")
+    if files is None:
+        options += ("--no_files",)
+    subprocess.run(
+        [
+            sys.executable,
+            os.path.join(ROOT, "migration", "create_quiz_bank.py"),
+            "--pl_repo",
+            str(pl_repo),
+            "--from_snapshot",
+            str(path),
+            *options,
+        ],
+        check=True,
+        capture_output=True,
+    )
+    with open(pl_repo / MANIFEST_FILE) as f:
+        return json.load(f)["questions"]
+
+
+def read(pl_repo, manifest, key, name="question.html"):
+    folder = manifest[key]["folder"]
+    return (pl_repo / "questions" / "QuestionBank" / folder / name).read_text()
+
+
+def test_unchanged_question_skipped(pl_repo, tmp_path):
+    before = migrate(pl_repo, tmp_path, {10: bank_question(1, "Same")})
+    folder = pl_repo / "questions" / "QuestionBank" / before["1/10/1"]["folder"]
+    (folder / "question.html").write_text("edited by hand")
+    assert migrate(pl_repo, tmp_path, {10: bank_question(1, "Same")}) == before
+    assert (folder / "question.html").read_text() == "edited by hand"
+
+
+def test_changed_question_updated_in_place(pl_repo, tmp_path):
+    before = migrate(pl_repo, tmp_path, {10: bank_question(1, "Same")})
+    manifest = migrate(pl_repo, tmp_path, {10: bank_question(1, "Edited")})
+    assert manifest["1/10/1"]["folder"] == before["1/10/1"]["folder"]
+    assert manifest["1/10/1"]["uuid"] == before["1/10/1"]["uuid"]
+    assert manifest["1/10/1"]["hash"] != before["1/10/1"]["hash"]
+    assert "Edited" in read(pl_repo, manifest, "1/10/1")
+    assert len(os.listdir(pl_repo / "questions" / "QuestionBank")) == 1
+
+
+def test_shared_question_written_once(pl_repo, tmp_path):
+    manifest = migrate(
+        pl_repo, tmp_path, {10: bank_question(1, "Same"), 11: bank_question(2, "Same")}
+    )
+    assert manifest["1/10/1"]["folder"] == manifest["1/11/2"]["folder"]
+    info = json.loads(read(pl_repo, manifest, "1/10/1", "info.json"))
+    assert info["comment"] == {"canvas_questions": ["1/10/1", "1/11/2"]}
+
+
+def test_edited_copy_gets_its_own_folder(pl_repo, tmp_path):
+    migrate(pl_repo, tmp_path, {10: bank_question(1, "Same"), 11: bank_question(2, "Same")})
+    manifest = migrate(
+        pl_repo, tmp_path, {10: bank_question(1, "Same"), 11: bank_question(2, "Edited")}
+    )
+    assert manifest["1/10/1"]["folder"] != manifest["1/11/2"]["folder"]
+    assert manifest["1/10/1"]["uuid"] != manifest["1/11/2"]["uuid"]
+    assert "Same" in read(pl_repo, manifest, "1/10/1")
+    assert "Edited" in read(pl_repo, manifest, "1/11/2")
+    info = json.loads(read(pl_repo, manifest, "1/10/1", "info.json"))
+    assert "comment" not in info
+
+
+def test_copies_edited_differently(pl_repo, tmp_path):
+    migrate(pl_repo, tmp_path, {10: bank_question(1, "Same"), 11: bank_question(2, "Same")})
+    manifest = migrate(
+        pl_repo, tmp_path, {10: bank_question(1, "First"), 11: bank_question(2, "Second")}
+    )
+    assert manifest["1/10/1"]["folder"] != manifest["1/11/2"]["folder"]
+    assert "First" in read(pl_repo, manifest, "1/10/1")
+    assert "Second" in read(pl_repo, manifest, "1/11/2")
+
+
+def test_copies_edited_the_same_way_stay_shared(pl_repo, tmp_path):
+    before = migrate(
+        pl_repo, tmp_path, {10: bank_question(1, "Same"), 11: bank_question(2, "Same")}
+    )
+    manifest = migrate(
+        pl_repo, tmp_path, {10: bank_question(1, "Edited"), 11: bank_question(2, "Edited")}
+    )
+    for key in ["1/10/1", "1/11/2"]:
+        assert manifest[key]["folder"] == before[key]["folder"]
+        assert manifest[key]["uuid"] == before[key]["uuid"]
+    assert "Edited" in read(pl_repo, manifest, "1/10/1")
+    assert os.listdir(pl_repo / "questions" / "QuestionBank") == [before["1/10/1"]["folder"]]
+
+
+def test_stale_files_removed_after_writing(pl_repo, tmp_path):
+    before = migrate(pl_repo, tmp_path, {10: bank_question(1, "Same")})
+    stale = pl_repo / "questions" / "QuestionBank" / before["1/10/1"]["folder"] / "server.py"
+    stale.write_text("# from when the question was calculated")
+    manifest = migrate(pl_repo, tmp_path, {10: bank_question(1, "Edited")})
+    assert "Edited" in read(pl_repo, manifest, "1/10/1")
+    assert not stale.exists()
+
+
+def test_workers_get_variant_pool(pl_repo, tmp_path):
+    calculated = Question.from_canvas(
+        {
+            "id": 2,
+            "question_type": "calculated_question",
+            "question_name": "Question",
+            "question_text": "[x]",
+            "variables": [{"name": "x", "min": 1, "max": 9, "scale": 0}],
+            "formulas": [{"formula": "answer = x * 2"}],
+            "formula_decimal_places": 0,
+            "answers": [],
+        }
+    )
+    manifest = migrate(
+        pl_repo,
+        tmp_path,
+        {10: bank_question(1, "Same"), 11: calculated},
+        "--workers",
+        "2",
+        "--variant_pool",
+        "5",
+    )
+    assert "Same" in read(pl_repo, manifest, "1/10/1")
+    rows = read(pl_repo, manifest, "1/11/2", "variants.csv").splitlines()
+    assert len(rows) == 1 + 5
+
+
+def test_files_saved_in_snapshot_localized(pl_repo, tmp_path):
+    question = bank_question(
+        1,
+        '<img src="https://canvas.test/courses/1/files/7/preview">'
+        '<img src="https://example.com/files/8">',
+    )
+    manifest = migrate(pl_repo, tmp_path, {10: question}, files={"7": b"png"})
+    html = read(pl_repo, manifest, "1/10/1")
+    assert "https://canvas.test" not in html
+    assert "https://example.com/files/8" in html
+    (name,) = os.listdir(pl_repo / "clientFilesCourse" / "canvas")
+    assert f"{{{{options.client_files_course_url}}}}/canvas/{name}" in html
+    assert (pl_repo / "clientFilesCourse" / "canvas" / name).read_bytes() == b"png"
+
+
+def test_snapshot_keeps_files(pl_repo, tmp_path):
+    question = bank_question(1, '<img src="/courses/1/files/7/preview">')
+    out = tmp_path / "out.jsonl.gz"
+    migrate(pl_repo, tmp_path, {10: question}, "--snapshot", str(out), files={"7": b"png"})
+    assert snapshot_host(out) == "canvas.test"
+    assert [(file_id, content) for file_id, _, content in snapshot_files(out)] == [("7", b"png")]
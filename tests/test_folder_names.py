@@ -0,0 +1,52 @@
+import threading
+from folder_names import FolderNames
+
+
+def test_existing_folders_get_a_suffix(tmp_path):
+    (tmp_path / "Quiz1-Q1").mkdir()
+    (tmp_path / "Quiz1-Q1_1").mkdir()
+    names = FolderNames()
+    assert names.allocate(str(tmp_path), "Quiz1-Q1") == "Quiz1-Q1_2"
+    assert names.allocate(str(tmp_path), "Quiz1-Q2") == "Quiz1-Q2"
+
+
+def test_names_are_not_handed_out_twice(tmp_path):
+    names = FolderNames()
+    allocated = [names.allocate(str(tmp_path), "Q") for _ in range(3)]
+    assert allocated == ["Q", "Q_1", "Q_2"]
+
+
+def test_case_insensitive(tmp_path):
+    (tmp_path / "Question").mkdir()
+    names = FolderNames()
+    assert names.allocate(str(tmp_path), "question") == "question_1"
+    assert names.allocate(str(tmp_path), "QUESTION_1") == "QUESTION_1_1"
+
+
+def test_suffix_does_not_collide_with_a_real_name(tmp_path):
+    names = FolderNames()
+    assert names.allocate(str(tmp_path), "Q_1") == "Q_1"
+    assert names.allocate(str(tmp_path), "Q") == "Q"
+    assert names.allocate(str(tmp_path), "Q") == "Q_2"
+
+
+def test_directories_are_separate(tmp_path):
+    names = FolderNames()
+    assert names.allocate(str(tmp_path / "a"), "Q") == "Q"
+    assert names.allocate(str(tmp_path / "b"), "Q") == "Q"
+
+
+def test_threads_get_distinct_names(tmp_path):
+    names = FolderNames()
+    allocated = []
+
+    def allocate():
+        for _ in range(50):
+            allocated.append(names.allocate(str(tmp_path), "Q"))
+
+    threads = [threading.Thread(target=allocate) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(set(allocated)) == 400
@@ -0,0 +1,55 @@
+import time
+from llm_cache import LLMCache, cache_key
+
+
+def set_times(cache, key, created_at, used_at):
+    cache._db.execute(
+        "UPDATE responses SET created_at = ?, used_at = ? WHERE key = ?",
+        (created_at, used_at, key),
+    )
+    cache._db.commit()
+
+
+def keys(cache):
+    return sorted(key for (key,) in cache._db.execute("SELECT key FROM responses"))
+
+
+def test_round_trip(tmp_path):
+    cache = LLMCache(str(tmp_path / "cache.sqlite"))
+    key = cache_key("gpt-4o", 1, "question")
+    assert cache.get(key) is None
+    cache.put(key, {"lo_slug": "obj_a"})
+    cache.close()
+    cache = LLMCache(str(tmp_path / "cache.sqlite"))
+    assert cache.get(key) == {"lo_slug": "obj_a"}
+    assert (cache.hits, cache.misses) == (1, 0)
+
+
+def test_keys_depend_on_every_part():
+    assert cache_key("gpt-4o", 1, "q") != cache_key("gpt-4o", 2, "q")
+    assert cache_key("gpt-4o", 1, "q") == cache_key("gpt-4o", 1, "q")
+
+
+def test_evict_by_age_of_creation(tmp_path):
+    cache = LLMCache(str(tmp_path / "cache.sqlite"), max_age_days=10)
+    now = time.time()
+    cache.put("old", "a")
+    cache.put("recent", "b")
+    # used recently, but created too long ago
+    set_times(cache, "old", now - 11 * 24 * 3600, now)
+    set_times(cache, "recent", now - 9 * 24 * 3600, now - 9 * 24 * 3600)
+    cache.evict()
+    assert keys(cache) == ["recent"]
+
+
+def test_evict_least_recently_used(tmp_path):
+    # each entry is len(key) + len(json value) = 1 + 5 bytes
+    cache = LLMCache(str(tmp_path / "cache.sqlite"), max_bytes=12)
+    now = time.time()
+    for i, key in enumerate(["a", "b", "c"]):
+        cache.put(key, "xxx")
+        set_times(cache, key, now, now - 100 + i)
+    # reading "a" makes it the most recently used
+    assert cache.get("a") == "xxx"
+    cache.evict()
+    assert keys(cache) == ["a", "c"]
@@ -0,0 +1,40 @@
+from manifest import Manifest, content_hash
+
+
+def test_content_hash_ignores_key_order():
+    assert content_hash({"a": 1, "b": [1, 2]}) == content_hash({"b": [1, 2], "a": 1})
+    assert content_hash({"a": 1}) != content_hash({"a": 2})
+
+
+def test_saved_and_read_back(tmp_path):
+    manifest = Manifest(str(tmp_path))
+    key = Manifest.key(1, 10, 100)
+    manifest.record(key, "Quiz10-Q1-Question", "hash", "uuid", "2024-01-01")
+    manifest.files["456"] = "abc.png"
+    manifest.save()
+
+    manifest = Manifest(str(tmp_path))
+    assert manifest.questions[key] == {
+        "folder": "Quiz10-Q1-Question",
+        "hash": "hash",
+        "uuid": "uuid",
+        "updated_at": "2024-01-01",
+    }
+    assert manifest.files == {"456": "abc.png"}
+
+
+def test_entry_ignored_once_its_folder_is_deleted(tmp_path):
+    manifest = Manifest(str(tmp_path))
+    manifest.record("1/10/100", "Question", "hash", "uuid")
+    assert manifest.get("1/10/100", str(tmp_path)) is None
+    (tmp_path / "Question").mkdir()
+    assert manifest.get("1/10/100", str(tmp_path))["uuid"] == "uuid"
+
+
+def test_shared_folders(tmp_path):
+    manifest = Manifest(str(tmp_path))
+    manifest.record("1/11/200", "Shared", "b", "uuid")
+    manifest.record("1/10/100", "Shared", "a", "uuid")
+    manifest.record("1/12/300", "Own", "c", "uuid2")
+    # in key order, whichever copy was recorded first
+    assert manifest.shared_folders() == {"Shared": ["1/10/100", "1/11/200"]}
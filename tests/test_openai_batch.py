@@ -0,0 +1,67 @@
+import json
+from types import SimpleNamespace
+from llm_cache import LLMCache
+from openai_batch import LocalBatches, batch_folder_names, write_batch_file
+
+
+class Completion:
+    def __init__(self, content):
+        self.content = content
+
+    def model_dump(self):
+        return {"choices": [{"message": {"role": "assistant", "content": self.content}}]}
+
+
+class Client:
+    """Answers every question with the same slug, except for the texts asking to
+    "fail" or to be "garbled" """
+
+    def __init__(self):
+        self.requests = []
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self.create))
+
+    def create(self, **body):
+        self.requests.append(body)
+        text = body["messages"][-1]["content"]
+        if "fail" in text:
+            raise Exception("server error")
+        if "garbled" in text:
+            return Completion("not json")
+        return Completion(json.dumps({"question_slug": "q"}))
+
+
+def test_local_batch_round_trip(tmp_path):
+    client = Client()
+    batches = LocalBatches(client)
+    path = tmp_path / "batch.jsonl"
+    write_batch_file(path, {"a": {"model": "m", "messages": [{"role": "user", "content": "x"}]}})
+    batch_id = batches.submit(path)
+    batch = batches.status(batch_id)
+    assert batch["status"] == "completed"
+    (line,) = batches.output(batch["output_file_id"])
+    result = json.loads(line)
+    assert result["custom_id"] == "a"
+    content = result["response"]["body"]["choices"][0]["message"]["content"]
+    assert json.loads(content) == {"question_slug": "q"}
+
+
+def test_batch_folder_names(tmp_path):
+    client = Client()
+    cache = LLMCache(str(tmp_path / "cache.sqlite"))
+    texts = {"k1": "first", "k2": "second fail", "k3": "third garbled"}
+    results = batch_folder_names(
+        LocalBatches(client), "lec_1/obj_a: x", texts, "gpt-4o", str(tmp_path / "b.jsonl"),
+        poll_seconds=0, cache=cache,
+    )
+    assert results["k1"] == {"question_slug": "q"}
+    assert isinstance(results["k2"], Exception)
+    assert isinstance(results["k3"], ValueError)
+    assert len(client.requests) == 3
+
+    # only the successful response was cached, the others are sent again
+    results = batch_folder_names(
+        LocalBatches(client), "lec_1/obj_a: x", texts, "gpt-4o", str(tmp_path / "b.jsonl"),
+        poll_seconds=0, cache=cache,
+    )
+    assert results["k1"] == {"question_slug": "q"}
+    assert len(client.requests) == 3 + 2
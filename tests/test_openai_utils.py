@@ -0,0 +1,44 @@
+import json
+from openai_utils import parse_folder_names, folder_names_request
+
+RESPONSE = {"lec_slug": "lec_1", "lo_slug": "obj_a", "question_slug": "q", "question_title": "Q"}
+
+
+def reply(*items):
+    return json.dumps({"questions": list(items)})
+
+
+def test_answers_in_question_order():
+    content = reply({"id": 2, **RESPONSE, "question_slug": "b"}, {"id": "1", **RESPONSE})
+    results = parse_folder_names(content, 2)
+    assert results == [RESPONSE, {**RESPONSE, "question_slug": "b"}]
+
+
+def test_missing_and_unknown_ids():
+    results = parse_folder_names(reply({"id": 1, **RESPONSE}, {"id": 5, **RESPONSE}), 2)
+    assert results[0] == RESPONSE
+    assert isinstance(results[1], Exception)
+
+
+def test_duplicated_id():
+    results = parse_folder_names(reply({"id": 1, **RESPONSE}, {"id": 1, **RESPONSE}), 1)
+    assert isinstance(results[0], Exception)
+
+
+def test_invalid_entries():
+    content = reply("not an object", {"id": None, **RESPONSE}, {"id": "x"}, {"id": 2, **RESPONSE})
+    results = parse_folder_names(content, 2)
+    assert isinstance(results[0], Exception)
+    assert results[1] == RESPONSE
+
+
+def test_invalid_json():
+    for content in ["not json", "[]", json.dumps({"questions": {"id": 1}}), json.dumps({})]:
+        assert all(isinstance(result, Exception) for result in parse_folder_names(content, 2))
+
+
+def test_learning_objectives_are_a_stable_prefix():
+    first = folder_names_request("lec_1/obj_a: x", ["one", "two"], "gpt-4o")
+    second = folder_names_request("lec_1/obj_a: x", ["three"], "gpt-4o")
+    assert first["messages"][0] == second["messages"][0]
+    assert '<question id="2"> two </question>' in first["messages"][1]["content"]
@@ -0,0 +1,116 @@
+import time
+import threading
+import pytest
+from pipeline import Pipeline, Stage, _DONE
+
+
+def run(pipeline, source, timeout=5):
+    """pipeline.run in a thread, failing the test instead of hanging"""
+    errors = []
+
+    def target():
+        try:
+            pipeline.run(source)
+        except Exception as e:
+            errors.append(e)
+
+    thread = threading.Thread(target=target, daemon=True)
+    thread.start()
+    thread.join(timeout)
+    assert not thread.is_alive(), "pipeline did not shut down"
+    return errors
+
+
+def counting(n, taken):
+    for i in range(n):
+        taken.append(i)
+        yield i
+
+
+def test_items_flow_through():
+    results = []
+    pipeline = Pipeline(
+        Stage("source", lambda i: [i]),
+        Stage("double", lambda i: [i, i], threads=3, queue_depth=2),
+        Stage("sink", results.append, queue_depth=2),
+    )
+    assert run(pipeline, range(100)) == []
+    assert sorted(results) == sorted(list(range(100)) * 2)
+    assert [stage["items"] for stage in pipeline.summary()] == [100, 100, 200]
+
+
+def test_done_left_for_every_thread():
+    pipeline = Pipeline(
+        Stage("source", lambda i: [i]),
+        Stage("work", lambda i: [i], threads=4),
+        Stage("sink", lambda i: None, threads=3),
+    )
+    assert run(pipeline, range(10)) == []
+    for stage in pipeline.stages[1:]:
+        # the one _DONE is passed from thread to thread and left behind
+        assert stage.input.get_nowait() is _DONE
+        assert stage.input.empty()
+
+
+def fail_on(bad):
+    def func(i):
+        if i == bad:
+            raise ValueError(f"bad item {i}")
+        return [i]
+
+    return func
+
+
+@pytest.mark.parametrize("threads", [1, 4])
+def test_failing_middle_stage(threads):
+    taken = []
+    pipeline = Pipeline(
+        Stage("source", lambda i: [i]),
+        Stage("work", fail_on(5), threads=threads, queue_depth=2),
+        Stage("sink", lambda i: None, queue_depth=2),
+    )
+    (error,) = run(pipeline, counting(10000, taken))
+    assert str(error) == "bad item 5"
+    # the source stopped soon after the error instead of reading everything
+    assert len(taken) < 10000
+
+
+def test_failing_sink():
+    taken = []
+    pipeline = Pipeline(
+        Stage("source", lambda i: [i]),
+        Stage("work", lambda i: [i], threads=2, queue_depth=1),
+        Stage("sink", fail_on(3), threads=2, queue_depth=1),
+    )
+    (error,) = run(pipeline, counting(10000, taken))
+    assert str(error) == "bad item 3"
+    assert len(taken) < 10000
+
+
+def test_failing_source():
+    def source():
+        yield 1
+        raise ValueError("cannot read")
+
+    pipeline = Pipeline(Stage("source", lambda i: [i]), Stage("sink", lambda i: None))
+    (error,) = run(pipeline, source())
+    assert str(error) == "cannot read"
+
+
+def test_bounded_queues_shut_down():
+    """Upstream stages blocked on a full queue still finish after a failure"""
+    depths = []
+
+    def sink(i):
+        depths.append(pipeline.stages[1].input.qsize())
+        time.sleep(0.001)
+        if i == 20:
+            raise ValueError("full disk")
+
+    pipeline = Pipeline(
+        Stage("source", lambda i: [i, i]),
+        Stage("sink", sink, threads=2, queue_depth=3),
+    )
+    (error,) = run(pipeline, range(10000))
+    assert str(error) == "full disk"
+    assert max(depths) <= 3
@@ -0,0 +1,73 @@
+import os
+import zipfile
+import pytest
+from conftest import ROOT
+from qti import QtiExport
+
+FIXTURE = os.path.join(ROOT, "tests", "fixtures", "qti_export")
+
+
+@pytest.fixture
+def export(tmp_path):
+    """The fixture export zipped like Canvas does, read into a new PL repo"""
+    path = tmp_path / "course.imscc"
+    with zipfile.ZipFile(path, "w") as f:
+        for directory, _, names in os.walk(FIXTURE):
+            for name in names:
+                full = os.path.join(directory, name)
+                f.write(full, os.path.relpath(full, FIXTURE).replace(os.sep, "/"))
+    qti_export = QtiExport(str(path), str(tmp_path / "pl"))
+    yield qti_export
+    qti_export.close()
+
+
+def test_quiz(export):
+    ((course, quiz, questions, groups),) = list(export.quizzes())
+    assert course.id == "course"
+    assert (quiz.id, quiz["title"]) == ("gquiz1", "Quiz 1")
+    assert [question.id for question in questions] == ["q1", "q2", "q3", "q4"]
+
+
+def test_correct_responses_skip_not(export):
+    ((_, _, questions, _),) = list(export.quizzes())
+    primes = next(iter(questions))
+    assert primes.type == "multiple_answers_question"
+    assert primes.assessment_question_id == "aq1"
+    assert [(answer.text, answer.weight) for answer in primes.answers] == [
+        ("2", 100),
+        ("4", 0),
+        ("5", 100),
+    ]
+
+
+def test_groups_placed_like_canvas(export):
+    ((_, _, questions, groups),) = list(export.quizzes())
+    assert [(question.id, question.position) for question in questions] == [
+        ("q1", 1),
+        ("q2", 2),
+        ("q3", 2),
+        ("q4", 3),
+    ]
+    assert list(groups) == ["g1"]
+    assert (groups["g1"]["pick_count"], groups["g1"]["position"]) == (1, 2)
+    points = {question.id: question.points for question in questions}
+    assert points == {"q1": 1, "q2": 2, "q3": 2, "q4": 0}
+    short_answers = [answer.text for question in questions for answer in question.answers]
+    assert "Paris" in short_answers and "Rome" in short_answers
+
+
+def test_filebase_files_extracted(export, tmp_path):
+    ((_, _, questions, _),) = list(export.quizzes())
+    cat = list(questions)[-1]
+    (name,) = export.files.values()
+    assert export.files == {"Uploaded Media/cat.png": name}
+    assert f"{{{{options.client_files_course_url}}}}/canvas/{name}" in cat.text
+    assert "Uploaded%20Media/dog.png" in cat.text
+    assert export.missing_files == {"Uploaded Media/dog.png"}
+    stored = tmp_path / "pl" / "clientFilesCourse" / "canvas" / name
+    assert stored.read_bytes() == b"not really a png\n"
+
+
+def test_close(export):
+    export.close()
+    assert export.zip.fp is None
@@ -0,0 +1,32 @@
+import question_text
+from question_text import question_budget, prepare_question_text, _ApproximateEncoding, _shorten
+
+
+def test_unknown_model_keeps_question_tokens(capsys):
+    assert question_budget("lec_1/obj_a: x" * 5000, "some-new-model", 1000) == 1000
+    assert "--context_window" in capsys.readouterr().out
+
+
+def test_context_window_limits_budget():
+    assert question_budget("lec_1/obj_a: x", "some-new-model", 1000, window=600) < 600
+
+
+def test_shorten_keeps_start_and_end():
+    encoding = _ApproximateEncoding()
+    text = "start " + "x" * 400 + " end"
+    shortened = _shorten(text, 20, encoding)
+    assert shortened.startswith("start")
+    assert shortened.endswith("end")
+    assert len(encoding.encode(shortened)) <= 20
+
+
+def test_shorten_budget_smaller_than_marker():
+    assert _shorten("x" * 400, 1, _ApproximateEncoding()) == "[...]"
+
+
+def test_code_dropped_before_stem(monkeypatch):
+    monkeypatch.setitem(question_text._encodings, "test-model", _ApproximateEncoding())
+    html = "<p>What is printed?</p><pre><code>" + "x = 1\n" * 100 + "</code></pre>"
+    text, before, after = prepare_question_text(html, "test-model", 50)
+    assert text == "What is printed? [code omitted]"
+    assert after < before
@@ -0,0 +1,65 @@
+import csv
+import runpy
+from question_model import Question
+from renderers import render_question
+from variants import VARIANTS_FILE
+
+
+def calculated_question():
+    return Question.from_canvas(
+        {
+            "id": 1,
+            "question_type": "calculated_question",
+            "question_name": "Question",
+            "question_text": "What is [x] times [y]?",
+            "variables": [
+                {"name": "x", "min": 1, "max": 9, "scale": 0},
+                {"name": "y", "min": 0.5, "max": 2.5, "scale": 1},
+            ],
+            "formulas": [{"formula": "answer = x * y"}],
+            "formula_decimal_places": 2,
+            "answers": [
+                {
+                    "variables": [{"name": "x", "value": 3}, {"name": "y", "value": 1.5}],
+                    "answer": 4.5,
+                    "weight": 100,
+                }
+            ],
+        }
+    )
+
+
+def test_server_picks_a_variant(tmp_path):
+    (files, warnings) = render_question(calculated_question(), "uuid", variant_pool=10)
+    assert warnings == []
+    for name, contents in files.items():
+        (tmp_path / name).write_text(contents)
+    with open(tmp_path / VARIANTS_FILE) as f:
+        (header, *rows) = list(csv.reader(f))
+    assert header == ["x", "y", "answer"]
+    assert len(rows) == 1 + 10
+    variants = {(int(x), float(y), float(answer)) for x, y, answer in rows}
+    assert (3, 1.5, 4.5) in variants
+
+    generate = runpy.run_path(str(tmp_path / "server.py"))["generate"]
+    for _ in range(50):
+        data = {"params": {}, "correct_answers": {}}
+        generate(data)
+        x = data["params"]["x"]
+        y = data["params"]["y"]
+        answer = data["correct_answers"]["answer"]
+        assert (x, y, answer) in variants
+        assert answer == round(x * y, 2)
+
+
+def test_server_without_variants_draws_variables(tmp_path):
+    question = calculated_question()
+    question.answers = []
+    (files, _) = render_question(question, "uuid")
+    assert VARIANTS_FILE not in files
+    (tmp_path / "server.py").write_text(files["server.py"])
+    generate = runpy.run_path(str(tmp_path / "server.py"))["generate"]
+    data = {"params": {}, "correct_answers": {}}
+    generate(data)
+    assert 1 <= data["params"]["x"] <= 9
+    assert data["correct_answers"]["answer"] == data["params"]["x"] * data["params"]["y"]
@@ -0,0 +1,69 @@
+from question_model import Question
+from variants import canvas_variants, pool_variants
+
+
+def calculated_question(formula, variables, decimal_places=2):
+    return Question.from_canvas(
+        {
+            "id": 1,
+            "question_type": "calculated_question",
+            "question_name": "Question",
+            "question_text": "[x] and [y]",
+            "variables": variables,
+            "formulas": [{"formula": formula}],
+            "formula_decimal_places": decimal_places,
+            "answers": [],
+        }
+    )
+
+
+def test_pool_answers_rounded():
+    question = calculated_question(
+        "answer = x * 1.4",
+        [
+            {"name": "x", "min": 1, "max": 9, "scale": 0},
+            {"name": "y", "min": 0.1, "max": 0.9, "scale": 1},
+        ],
+    )
+    for *values, answer in pool_variants(question, "answer", 50):
+        assert answer == round(values[0] * 1.4, 2)
+        assert len(repr(answer).split(".")[1]) <= 2
+
+
+def test_pool_integers_do_not_wrap():
+    question = calculated_question(
+        "answer = x ** 20",
+        [
+            {"name": "x", "min": 100, "max": 200, "scale": 0},
+            {"name": "y", "min": 1, "max": 2, "scale": 0},
+        ],
+        decimal_places=0,
+    )
+    for *values, answer in pool_variants(question, "answer", 20):
+        assert answer > 0
+        assert abs(answer - values[0] ** 20) <= values[0] ** 20 * 1e-12
+
+
+def test_pool_is_stable():
+    question = calculated_question(
+        "answer = x + y",
+        [
+            {"name": "x", "min": 1, "max": 9, "scale": 0},
+            {"name": "y", "min": 0.1, "max": 0.9, "scale": 1},
+        ],
+    )
+    assert pool_variants(question, "answer", 10) == pool_variants(question, "answer", 10)
+    assert canvas_variants(question) == []
+
+
+def test_pool_formula_functions():
+    question = calculated_question(
+        "answer = max(sqrt(x), abs(y - 5), 1) + round(log(100)) + min(ln(e), 3)",
+        [
+            {"name": "x", "min": 1, "max": 100, "scale": 0},
+            {"name": "y", "min": 0, "max": 9, "scale": 0},
+        ],
+        decimal_places=4,
+    )
+    for x, y, answer in pool_variants(question, "answer", 20):
+        assert answer == round(max(x**0.5, abs(y - 5), 1) + 2 + 1, 4)